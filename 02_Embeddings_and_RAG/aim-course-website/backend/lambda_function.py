@@ -10,9 +10,6 @@ from typing import Dict, Any, List
 import numpy as np
 from base64 import b64decode
 
-# OpenAI imports
-import openai
-
 # Get secrets from AWS Secrets Manager
 def get_secret(secret_name: str, region_name: str = "us-east-1") -> Dict[str, Any]:
     """Retrieve secret from AWS Secrets Manager"""
@@ -32,13 +29,28 @@ def get_secret(secret_name: str, region_name: str = "us-east-1") -> Dict[str, An
     secret = get_secret_value_response['SecretString']
     return json.loads(secret)
 
-# Initialize OpenAI with secret
+# Load the OpenAI key from the secret
+_api_key = None
 try:
     secrets = get_secret("aim-course/openai")
-    openai.api_key = secrets['api_key']
+    _api_key = secrets['api_key']
 except Exception as e:
     print(f"Error loading secrets: {e}")
 
+_client = None
+
+def get_client():
+    """
+    OpenAI client, created once per container (honours OPENAI_BASE_URL).
+    openai is imported here rather than at init, so cold starts and
+    requests that never call the API (preflight, sample queries) skip it.
+    """
+    global _client
+    if _client is None:
+        import openai
+        _client = openai.OpenAI(api_key=_api_key)
+    return _client
+
 # Sample document chunks for demo (in production, these would be in a database)
 SAMPLE_CHUNKS = [
     {
@@ -63,11 +75,11 @@ def cosine_similarity(v1: List[float], v2: List[float]) -> float:
 
 def get_embedding(text: str) -> List[float]:
     """Get embedding from OpenAI"""
-    response = openai.Embedding.create(
+    response = get_client().embeddings.create(
         model="text-embedding-3-small",
         input=text
     )
-    return response['data'][0]['embedding']
+    return response.data[0].embedding
 
 def search_chunks(query: str, k: int = 3) -> List[Dict[str, Any]]:
     """Search for relevant chunks using embeddings"""
@@ -108,7 +120,7 @@ def generate_response(query: str, context: List[Dict[str, Any]]) -> str:
         }
     ]
     
-    response = openai.ChatCompletion.create(
+    response = get_client().chat.completions.create(
         model="gpt-4o-mini",
         messages=messages,
         temperature=0.7,
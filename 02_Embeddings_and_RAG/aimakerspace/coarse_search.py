@@ -0,0 +1,102 @@
+"""
+Coarse-to-fine vector search over Matryoshka-style embeddings.
+Models like text-embedding-3-small/large front-load information into the
+leading dimensions, so a truncated, renormalized prefix is a good proxy for
+the full vector. The prefix matrix is scanned first, then a shortlist is
+re-ranked with the full vectors.
+"""
+
+import numpy as np
+from typing import List, Optional, Sequence, Tuple, Callable
+
+
+def truncate_and_normalize(vectors: np.ndarray, dims: int) -> np.ndarray:
+    """
+    Keep the first `dims` components of each row and rescale to unit length.
+    Works on a single vector or a matrix of row vectors.
+    """
+    prefix = np.asarray(vectors, dtype=np.float32)[..., :dims]
+    norms = np.linalg.norm(prefix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return prefix / norms
+
+
+class CoarseIndex:
+    """
+    Float32 matrix of truncated, renormalized vector prefixes.
+    Built from a snapshot of the database and rebuilt when it changes.
+    """
+
+    def __init__(self, keys: List[str], vectors: Sequence[np.ndarray], prefix_dims: int, version: int = 0):
+        self.keys = keys
+        self.prefix_dims = prefix_dims
+        # Database version the index was built from
+        self.version = version
+        if keys:
+            self.matrix = truncate_and_normalize(np.vstack(vectors), prefix_dims)
+        else:
+            self.matrix = np.empty((0, prefix_dims), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def shortlist(
+        self,
+        query_vector: np.ndarray,
+        n: int,
+        candidate_mask: Optional[np.ndarray] = None,
+    ) -> List[int]:
+        """
+        Return row indices of the `n` best prefix matches by cosine similarity.
+
+        Args:
+            query_vector: Full-length query embedding
+            n: Shortlist size
+            candidate_mask: Optional boolean mask restricting eligible rows
+        """
+        scores = self.matrix @ truncate_and_normalize(query_vector, self.prefix_dims)
+        if candidate_mask is not None:
+            scores = np.where(candidate_mask, scores, -np.inf)
+            n = min(n, int(candidate_mask.sum()))
+        n = min(n, len(scores))
+        if n <= 0:
+            return []
+
+        top = np.argpartition(-scores, n - 1)[:n]
+        return top[np.argsort(-scores[top])].tolist()
+
+    def memory_bytes(self) -> int:
+        return self.matrix.nbytes
+
+
+def coarse_to_fine_search(
+    index: CoarseIndex,
+    vectors: dict,
+    query_vector: np.ndarray,
+    k: int,
+    distance_measure: Callable,
+    shortlist_size: Optional[int] = None,
+    candidate_mask: Optional[np.ndarray] = None,
+) -> List[Tuple[str, float]]:
+    """
+    Two-stage search: prefix scan for a shortlist, full-vector re-rank.
+
+    Args:
+        index: CoarseIndex over the database keys
+        vectors: Mapping of key -> full vector used for re-ranking
+        query_vector: Full-length query embedding
+        k: Number of results to return
+        distance_measure: Similarity function used for the re-rank
+        shortlist_size: Candidates to re-rank (defaults to 10 * k)
+        candidate_mask: Optional boolean mask restricting eligible rows
+
+    Returns:
+        List of (key, score) tuples, best first
+    """
+    query_vector = np.asarray(query_vector)
+    rows = index.shortlist(query_vector, shortlist_size or 10 * k, candidate_mask)
+    scores = [
+        (index.keys[row], distance_measure(query_vector, vectors[index.keys[row]]))
+        for row in rows
+    ]
+    return sorted(scores, key=lambda x: x[1], reverse=True)[:k]
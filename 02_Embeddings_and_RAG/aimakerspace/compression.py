@@ -0,0 +1,178 @@
+"""
+Sentence-level contextual compression for RAG prompts.
+Retrieved chunks are split into sentences, every sentence is scored
+against the query embedding in one matrix product, and only the best
+sentences (plus their neighbours, for coherence) are kept. Sentence
+embeddings are cached, since popular chunks are retrieved again and again.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Sequence, Tuple, Union
+
+import numpy as np
+
+from aimakerspace.context_packing import PackedContext
+from aimakerspace.openai_utils.batching import estimate_tokens
+
+
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split on sentence-ending punctuation and line breaks; chunk edges may leave fragments."""
+    return [sentence.strip() for sentence in _SENTENCE_BREAK.split(text) if sentence.strip()]
+
+
+class SentenceCompressor:
+    """
+    Keep only the sentences of retrieved contexts that bear on the query.
+
+    Example:
+        compressor = SentenceCompressor(vector_db.embedding_model, max_sentences=6)
+        compressed = compressor.compress(question, vector_db.search_by_text(question, k=5))
+    """
+
+    def __init__(
+        self,
+        embedding_model,
+        max_sentences: int = 6,
+        neighbours: int = 1,
+        min_similarity: float = None,
+        max_cached_sentences: int = 50_000,
+    ):
+        """
+        Args:
+            embedding_model: Embeds sentences and queries; use the database's
+                model so scores are comparable
+            max_sentences: Best-scoring sentences kept across all contexts
+            neighbours: Sentences kept on each side of a selected one
+            min_similarity: Also drop selected sentences scoring below this
+                (the single best sentence is always kept)
+            max_cached_sentences: Sentence embeddings kept, least recently used evicted
+        """
+        if max_sentences < 1:
+            raise ValueError("max_sentences must be at least 1")
+        if neighbours < 0:
+            raise ValueError("neighbours must not be negative")
+        self.embedding_model = embedding_model
+        self.max_sentences = max_sentences
+        self.neighbours = neighbours
+        self.min_similarity = min_similarity
+        self.max_cached_sentences = max_cached_sentences
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.statistics = {
+            "compressions": 0,
+            "tokens_in": 0,
+            "tokens_out": 0,
+            "sentences_in": 0,
+            "sentences_kept": 0,
+            "embedded": 0,
+            "cache_hits": 0,
+        }
+
+    def _embed_sentences(self, sentences: List[str]) -> np.ndarray:
+        """Unit-normalized float32 matrix, one row per sentence; only uncached ones are embedded."""
+        # Vectors are collected locally: other threads may evict cache entries meanwhile
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            for sentence in dict.fromkeys(sentences):
+                vector = self._cache.get(sentence)
+                if vector is not None:
+                    self._cache.move_to_end(sentence)
+                    found[sentence] = vector
+            missing = [sentence for sentence in dict.fromkeys(sentences) if sentence not in found]
+            self.statistics["cache_hits"] += len(sentences) - len(missing)
+        if missing:
+            vectors = np.asarray(self.embedding_model.get_embeddings(missing), dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            found.update(zip(missing, vectors / norms))
+            with self._lock:
+                for sentence in missing:
+                    self._cache[sentence] = found[sentence]
+                    self._cache.move_to_end(sentence)
+                self.statistics["embedded"] += len(missing)
+                while len(self._cache) > self.max_cached_sentences:
+                    self._cache.popitem(last=False)
+        return np.stack([found[sentence] for sentence in sentences])
+
+    def _query_vector(self, query: Union[str, np.ndarray]) -> np.ndarray:
+        vector = np.asarray(
+            self.embedding_model.get_embedding(query) if isinstance(query, str) else query,
+            dtype=np.float32,
+        )
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def compress(
+        self,
+        query: Union[str, np.ndarray],
+        contexts: Sequence[Tuple],
+    ) -> PackedContext:
+        """
+        Args:
+            query: Question text, or its embedding to avoid embedding it again
+            contexts: (text, score, ...) tuples, e.g. search results
+
+        Returns:
+            PackedContext of (compressed text, original score) for contexts
+            that kept at least one sentence, in their original order, with
+            tokens_in, tokens_out, sentences_in and sentences_kept
+        """
+        contexts = [(context[0], float(context[1])) for context in contexts]
+        tokens_in = sum(estimate_tokens(text) for text, _ in contexts)
+        split = [split_sentences(text) for text, _ in contexts]
+        sentences = [sentence for chunk in split for sentence in chunk]
+        if not sentences:
+            return PackedContext([], {"tokens_in": tokens_in, "tokens_out": 0, "sentences_in": 0, "sentences_kept": 0})
+
+        # One pass: every sentence against the query
+        scores = self._embed_sentences(sentences) @ self._query_vector(query)
+
+        n_best = min(self.max_sentences, len(sentences))
+        best = np.argpartition(-scores, n_best - 1)[:n_best]
+        if self.min_similarity is not None:
+            best = [i for i in best if scores[i] >= self.min_similarity] or [int(np.argmax(scores))]
+
+        keep = np.zeros(len(sentences), dtype=bool)
+        offsets = np.cumsum([0] + [len(chunk) for chunk in split])
+        for i in best:
+            # Neighbours come from the same context only
+            chunk = int(np.searchsorted(offsets, i, side="right")) - 1
+            keep[max(offsets[chunk], i - self.neighbours):min(offsets[chunk + 1], i + self.neighbours + 1)] = True
+
+        compressed = []
+        for chunk, (_, score) in enumerate(contexts):
+            spans, previous = [], None
+            for i in range(offsets[chunk], offsets[chunk + 1]):
+                if not keep[i]:
+                    continue
+                if previous is not None and i == previous + 1:
+                    spans[-1].append(sentences[i])
+                else:
+                    spans.append([sentences[i]])
+                previous = i
+            if spans:
+                compressed.append((" ... ".join(" ".join(span) for span in spans), score))
+
+        statistics = {
+            "tokens_in": tokens_in,
+            "tokens_out": sum(estimate_tokens(text) for text, _ in compressed),
+            "sentences_in": len(sentences),
+            "sentences_kept": int(keep.sum()),
+        }
+        with self._lock:
+            self.statistics["compressions"] += 1
+            for name, value in statistics.items():
+                self.statistics[name] += value
+        return PackedContext(compressed, statistics)
+
+    def get_statistics(self) -> Dict[str, float]:
+        """Cumulative counters plus the overall compression ratio (tokens in / out)."""
+        with self._lock:
+            stats = dict(self.statistics)
+        stats["compression_ratio"] = stats["tokens_in"] / stats["tokens_out"] if stats["tokens_out"] else 0.0
+        return stats
@@ -0,0 +1,175 @@
+"""
+Concurrency primitives for the vector databases.
+Writers take an exclusive lock and bump a version number; readers search a
+published, immutable snapshot that is refreshed at most once per version.
+Snapshots share structure, so publishing one costs the size of the change,
+not of the database.
+"""
+
+import threading
+from collections.abc import ItemsView, Mapping
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+
+# Marks a key removed in a change set
+DELETED = object()
+_MISSING = object()
+
+
+class ReadWriteLock:
+    """
+    Writer-preferring reader-writer lock.
+    Any number of readers may hold the lock at once; a writer waits for
+    active readers to finish and blocks new readers while it waits.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    def acquire_read(self) -> None:
+        with self._condition:
+            while self._writer or self._waiting_writers:
+                self._condition.wait()
+            self._readers += 1
+
+    def release_read(self) -> None:
+        with self._condition:
+            self._readers -= 1
+            if self._readers == 0:
+                self._condition.notify_all()
+
+    def acquire_write(self) -> None:
+        with self._condition:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._condition.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+
+    def release_write(self) -> None:
+        with self._condition:
+            self._writer = False
+            self._condition.notify_all()
+
+    @contextmanager
+    def read_locked(self) -> Iterator[None]:
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write_locked(self) -> Iterator[None]:
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+class _LayeredItems(ItemsView):
+    def __iter__(self):
+        return self._mapping._iter_items()
+
+
+class LayeredMapping(Mapping):
+    """
+    Immutable mapping stored as a stack of frozen change sets, oldest first.
+
+    `with_changes` returns a new mapping that shares every existing layer
+    and adds one, so publishing a version costs the size of its changes.
+    Layers are merged when the newest outgrows half the one below it,
+    which keeps the stack at O(log n) layers and the merge cost amortized
+    O(log n) per entry. Old mappings are never modified.
+    """
+
+    def __init__(self, layers: Tuple[Dict[str, Any], ...] = (), length: int = 0):
+        self._layers = layers
+        self._length = length
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LayeredMapping":
+        """A single-layer mapping over a private copy of `data`."""
+        return cls((dict(data),) if data else (), len(data))
+
+    def with_changes(self, changes: Dict[str, Any], length: int) -> "LayeredMapping":
+        """
+        Args:
+            changes: key -> new value, or DELETED; not modified afterwards
+            length: Number of live keys once the changes are applied
+        """
+        base = self._layers[0] if self._layers else None
+        layers = list(self._layers)
+        if changes:
+            layers.append(changes)
+        while len(layers) > 1 and len(layers[-2]) <= 2 * len(layers[-1]):
+            layers[-2:] = [{**layers[-2], **layers[-1]}]
+        if layers and layers[0] is not base:
+            # Nothing older left to shadow, so tombstones can go
+            layers[0] = {key: value for key, value in layers[0].items() if value is not DELETED}
+        return LayeredMapping(tuple(layers), length)
+
+    def __getitem__(self, key: str) -> Any:
+        for layer in reversed(self._layers):
+            value = layer.get(key, _MISSING)
+            if value is not _MISSING:
+                if value is DELETED:
+                    break
+                return value
+        raise KeyError(key)
+
+    def __contains__(self, key: object) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def _iter_items(self) -> Iterator[Tuple[str, Any]]:
+        layers = self._layers
+        if len(layers) == 1:
+            yield from layers[0].items()
+            return
+        # Keys each layer must skip because a newer layer overrides them
+        shadowed = [set()] * len(layers)
+        for i in range(len(layers) - 1, 0, -1):
+            shadowed[i - 1] = shadowed[i] | layers[i].keys()
+        for layer, skip in zip(layers, shadowed):
+            for key, value in layer.items():
+                if value is not DELETED and key not in skip:
+                    yield key, value
+
+    def __iter__(self) -> Iterator[str]:
+        return (key for key, _ in self._iter_items())
+
+    def items(self) -> ItemsView:
+        return _LayeredItems(self)
+
+    def __len__(self) -> int:
+        return self._length
+
+
+class Snapshot:
+    """
+    Consistent, read-only view of a database at one version.
+    The containers are never mutated after publication; the vectors and
+    metadata dicts they hold are shared and replaced, never modified, by
+    writers. `reducer` is the dimensionality reducer the stored vectors
+    were projected with, so queries are reduced to match.
+    """
+
+    def __init__(
+        self,
+        version: int,
+        vectors: Mapping,
+        metadata: Optional[Mapping] = None,
+        reducer: Any = None,
+    ):
+        self.version = version
+        self.vectors = vectors
+        self.metadata = metadata if metadata is not None else {}
+        self.reducer = reducer
+
+    def __len__(self) -> int:
+        return len(self.vectors)
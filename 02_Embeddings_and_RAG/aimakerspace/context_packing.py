@@ -0,0 +1,195 @@
+"""
+Token-budgeted context building for RAG prompts.
+Search results below a score threshold are dropped, chunks that were
+adjacent in the source (recognized by the splitter's overlap) are merged
+so the overlap is sent once, and the rest is packed by score into a
+token budget.
+"""
+
+import heapq
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from aimakerspace.openai_utils.batching import estimate_tokens
+
+
+class PackedContext:
+    """What goes into one prompt, and what was left out."""
+
+    def __init__(self, contexts: List[Tuple[str, float]], statistics: Dict[str, int]):
+        # (text, score), best first; merged runs carry their best chunk's score
+        self.contexts = contexts
+        self.statistics = statistics
+
+    def __iter__(self):
+        return iter(self.contexts)
+
+    def __len__(self) -> int:
+        return len(self.contexts)
+
+
+class ContextBuilder:
+    """
+    Turn search results into prompt context under a token budget.
+
+    Example:
+        builder = ContextBuilder.for_splitter(text_splitter, max_tokens=1500, min_score=0.2)
+        packed = builder.build(vector_db.search_by_text(question, k=8))
+        for i, (text, score) in enumerate(packed, 1):
+            ...
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 2000,
+        min_score: Optional[float] = None,
+        chunk_overlap: int = 0,
+        chunk_size: Optional[int] = None,
+    ):
+        """
+        Args:
+            max_tokens: Token budget for all contexts together
+            min_score: Drop results scoring below this
+            chunk_overlap: Characters consecutive chunks share (0 disables merging)
+            chunk_size: Splitter chunk size; only full-size chunks can have a
+                successor, which rules out false matches on short tail chunks
+        """
+        if max_tokens < 1:
+            raise ValueError("max_tokens must be at least 1")
+        self.max_tokens = max_tokens
+        self.min_score = min_score
+        self.chunk_overlap = chunk_overlap
+        self.chunk_size = chunk_size
+        self.statistics = {"builds": 0, "tokens_in": 0, "tokens_out": 0, "tokens_saved": 0}
+
+    @classmethod
+    def for_splitter(cls, splitter, max_tokens: int = 2000, min_score: Optional[float] = None) -> "ContextBuilder":
+        """Builder that merges chunks produced by `splitter` (a CharacterTextSplitter)."""
+        return cls(max_tokens, min_score, splitter.chunk_overlap, splitter.chunk_size)
+
+    def _merge_adjacent(self, results: List[Tuple[str, float]]) -> List[List[Tuple[str, float]]]:
+        """Group chunks into runs where one's tail overlap is the next one's head, in source order."""
+        overlap = self.chunk_overlap
+        if overlap <= 0 or len(results) < 2:
+            return [[result] for result in results]
+
+        heads = {}
+        for i, (text, _) in enumerate(results):
+            if len(text) > overlap:
+                heads.setdefault(text[:overlap], i)
+
+        successor = {}
+        for i, (text, _) in enumerate(results):
+            if self.chunk_size is not None and len(text) != self.chunk_size:
+                continue
+            j = heads.get(text[-overlap:])
+            if j is not None and j != i and j not in successor.values():
+                successor[i] = j
+
+        has_predecessor = set(successor.values())
+        merged = []
+        visited = set()
+        for start in range(len(results)):
+            if start in has_predecessor or start in visited:
+                continue
+            run = [results[start]]
+            visited.add(start)
+            current = start
+            while current in successor and successor[current] not in visited:
+                current = successor[current]
+                visited.add(current)
+                run.append(results[current])
+            merged.append(run)
+        # A cycle (repeated text) has no start; keep its chunks as they are
+        merged.extend([results[i]] for i in range(len(results)) if i not in visited)
+        return merged
+
+    def _join(self, run: List[Tuple[str, float]]) -> Tuple[str, float]:
+        """One context for a run, sending each overlap once; it carries its best chunk's score."""
+        text = run[0][0] + "".join(chunk[self.chunk_overlap:] for chunk, _ in run[1:])
+        return text, max(score for _, score in run)
+
+    def _trim(self, run: List[Tuple[str, float]], budget: int) -> Tuple[int, int]:
+        """
+        Widest window (lo, hi) of `run` around its best chunk whose joined
+        text fits `budget` tokens, growing towards the better neighbour;
+        (lo, lo) if even the best chunk alone doesn't fit.
+        """
+        best = max(range(len(run)), key=lambda i: run[i][1])
+        if estimate_tokens(run[best][0]) > budget:
+            return best, best
+        lo, hi = best, best + 1
+        while lo > 0 or hi < len(run):
+            left = run[lo - 1][1] if lo > 0 else None
+            right = run[hi][1] if hi < len(run) else None
+            if right is None or (left is not None and left >= right):
+                if estimate_tokens(self._join(run[lo - 1:hi])[0]) > budget:
+                    break
+                lo -= 1
+            else:
+                if estimate_tokens(self._join(run[lo:hi + 1])[0]) > budget:
+                    break
+                hi += 1
+        return lo, hi
+
+    def build(self, results: Sequence[Tuple[Any, ...]]) -> PackedContext:
+        """
+        Args:
+            results: (text, score, ...) tuples from VectorDatabase.search or
+                EnhancedVectorDatabase.search
+
+        Returns:
+            PackedContext with per-call statistics: tokens_in (all results),
+            tokens_out, tokens_saved, below_threshold, merged and over_budget
+            (chunk counts)
+        """
+        results = [(result[0], float(result[1])) for result in results]
+        tokens_in = sum(estimate_tokens(text) for text, _ in results)
+
+        kept = [r for r in results if self.min_score is None or r[1] >= self.min_score]
+        below_threshold = len(results) - len(kept)
+
+        runs = self._merge_adjacent(kept)
+        merged = len(kept) - len(runs)
+
+        # Greedy by score; a smaller, lower-scored chunk may still fit
+        queue = [(-self._join(run)[1], order, run) for order, run in enumerate(runs)]
+        heapq.heapify(queue)
+        order = len(queue)
+        contexts = []
+        tokens_out = 0
+        over_budget = 0
+        while queue:
+            _, _, run = heapq.heappop(queue)
+            text, score = self._join(run)
+            tokens = estimate_tokens(text)
+            if tokens_out + tokens <= self.max_tokens:
+                contexts.append((text, score))
+                tokens_out += tokens
+                continue
+            # Too long: keep the part around its best chunk that fits, and
+            # requeue the rest at its own score, so the top hit isn't lost to a merge
+            lo, hi = self._trim(run, self.max_tokens - tokens_out)
+            if lo == hi:
+                over_budget += 1
+                hi = lo + 1
+            else:
+                text, score = self._join(run[lo:hi])
+                contexts.append((text, score))
+                tokens_out += estimate_tokens(text)
+            for rest in (run[:lo], run[hi:]):
+                if rest:
+                    heapq.heappush(queue, (-self._join(rest)[1], order, rest))
+                    order += 1
+
+        statistics = {
+            "tokens_in": tokens_in,
+            "tokens_out": tokens_out,
+            "tokens_saved": tokens_in - tokens_out,
+            "below_threshold": below_threshold,
+            "merged": merged,
+            "over_budget": over_budget,
+        }
+        self.statistics["builds"] += 1
+        for name in ("tokens_in", "tokens_out", "tokens_saved"):
+            self.statistics[name] += statistics[name]
+        return PackedContext(contexts, statistics)
@@ -0,0 +1,255 @@
+"""
+Near-duplicate chunk detection for ingestion.
+Exact duplicates are caught by content hash, near-duplicates by MinHash
+signatures with LSH banding, so repeated boilerplate is embedded only once.
+"""
+
+import hashlib
+import re
+import zlib
+import numpy as np
+from collections import defaultdict
+from typing import List, Dict, Tuple, Optional
+
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase and collapse whitespace so formatting noise doesn't hide duplicates."""
+    return _WHITESPACE.sub(" ", text).strip().lower()
+
+
+def optimal_lsh_params(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """
+    Choose (bands, rows) for LSH banding given a Jaccard threshold.
+    Minimizes the sum of false positive and false negative probability mass.
+    """
+    best, best_error = (1, num_perm), float("inf")
+    below = np.linspace(0.0, threshold, 100)
+    above = np.linspace(threshold, 1.0, 100)
+
+    for bands in range(1, num_perm + 1):
+        rows = num_perm // bands
+        if rows == 0:
+            break
+        false_positive = np.mean(1 - (1 - below ** rows) ** bands) * threshold
+        false_negative = np.mean((1 - above ** rows) ** bands) * (1 - threshold)
+        error = false_positive + false_negative
+        if error < best_error:
+            best, best_error = (bands, rows), error
+
+    return best
+
+
+class MinHasher:
+    """
+    Computes MinHash signatures over character shingles.
+    Signatures of two texts agree in a fraction of positions that estimates
+    the Jaccard similarity of their shingle sets.
+    """
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 5, seed: int = 1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.RandomState(seed)
+        # a, b < 2**32 keeps a * h + b inside uint64 for 32-bit shingle hashes
+        self._a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+    def shingle_hashes(self, text: str) -> np.ndarray:
+        """Hash the set of character shingles of already normalized text."""
+        k = self.shingle_size
+        if len(text) <= k:
+            shingles = {text}
+        else:
+            shingles = {text[i:i + k] for i in range(len(text) - k + 1)}
+        return np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in shingles),
+            dtype=np.uint64,
+            count=len(shingles),
+        )
+
+    def signature(self, text: str) -> np.ndarray:
+        """Compute the MinHash signature of already normalized text."""
+        hashes = self.shingle_hashes(text)
+        permuted = (hashes[:, None] * self._a + self._b) % _MERSENNE_PRIME
+        return np.bitwise_and(permuted, _MAX_HASH).min(axis=0)
+
+    @staticmethod
+    def jaccard(signature_a: np.ndarray, signature_b: np.ndarray) -> float:
+        """Estimate Jaccard similarity from two signatures."""
+        return float(np.mean(signature_a == signature_b))
+
+
+class DeduplicationResult:
+    """
+    Outcome of a deduplication pass.
+
+    Attributes:
+        unique_chunks: Chunks to embed, in first-seen order
+        unique_indices: Position of each unique chunk in the input
+        canonical_index: For every input position, the input position of its
+            kept chunk, or -1 if that chunk was kept by an earlier deduplicate
+            call (find_duplicate returns its text)
+        aliases: Near-duplicate text -> kept text it resolves to
+        exact_duplicates: Number of inputs dropped as exact duplicates
+        near_duplicates: Number of inputs dropped as near-duplicates
+    """
+
+    def __init__(self):
+        self.unique_chunks: List[str] = []
+        self.unique_indices: List[int] = []
+        self.canonical_index: List[int] = []
+        self.aliases: Dict[str, str] = {}
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+
+    def get_statistics(self) -> Dict[str, float]:
+        """Summarize how much the pass removed."""
+        total = len(self.canonical_index)
+        return {
+            "total_chunks": total,
+            "unique_chunks": len(self.unique_chunks),
+            "exact_duplicates": self.exact_duplicates,
+            "near_duplicates": self.near_duplicates,
+            "dedup_ratio": 1 - len(self.unique_chunks) / total if total else 0.0,
+        }
+
+
+class ChunkDeduplicator:
+    """
+    Ingestion-time deduplication of text chunks.
+
+    Takes the output of CharacterTextSplitter.split_texts and keeps the first
+    occurrence of every chunk. Later chunks that are identical after
+    normalization, or whose estimated Jaccard similarity to a kept chunk is
+    at least `threshold`, are recorded as aliases instead.
+
+    State is kept across calls, so several batches can be deduplicated
+    against each other; call reset() to start over.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.9,
+        num_perm: int = 128,
+        shingle_size: int = 5,
+        bands: Optional[int] = None,
+        seed: int = 1,
+    ):
+        """
+        Args:
+            threshold: Minimum estimated Jaccard similarity to treat chunks as duplicates
+            num_perm: Number of hash permutations per signature
+            shingle_size: Character shingle length
+            bands: Number of LSH bands (derived from threshold if omitted)
+            seed: Seed for the permutation family
+        """
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError("threshold must be in (0, 1]")
+
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm, shingle_size, seed)
+        if bands is None:
+            self.bands, self.rows = optimal_lsh_params(threshold, num_perm)
+        else:
+            if bands < 1 or bands > num_perm:
+                raise ValueError(f"bands must be between 1 and {num_perm}")
+            self.bands, self.rows = bands, num_perm // bands
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget every chunk seen so far."""
+        self._exact: Dict[bytes, str] = {}
+        self._signatures: Dict[str, np.ndarray] = {}
+        self._buckets: List[Dict[bytes, List[str]]] = [defaultdict(list) for _ in range(self.bands)]
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [
+            signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            for band in range(self.bands)
+        ]
+
+    def _lookup(self, chunk: str) -> Tuple[Optional[str], Optional[str], bytes, Optional[np.ndarray]]:
+        normalized = normalize_text(chunk)
+        digest = hashlib.sha1(normalized.encode("utf-8")).digest()
+        if digest in self._exact:
+            return self._exact[digest], "exact", digest, None
+
+        signature = self.hasher.signature(normalized)
+        best, best_score = None, self.threshold
+        for band, key in enumerate(self._band_keys(signature)):
+            for candidate in self._buckets[band].get(key, ()):
+                score = MinHasher.jaccard(signature, self._signatures[candidate])
+                if score >= best_score:
+                    best, best_score = candidate, score
+
+        return best, ("near" if best is not None else None), digest, signature
+
+    def _register(self, chunk: str, digest: bytes, signature: np.ndarray) -> None:
+        self._exact[digest] = chunk
+        self._signatures[chunk] = signature
+        for band, key in enumerate(self._band_keys(signature)):
+            self._buckets[band][key].append(chunk)
+
+    def find_duplicate(self, chunk: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Look up a chunk against everything kept so far.
+
+        Returns:
+            (kept chunk, "exact" | "near") if it is a duplicate, else (None, None)
+        """
+        kept, kind, _, _ = self._lookup(chunk)
+        return kept, kind
+
+    def add(self, chunk: str) -> None:
+        """Register a chunk as kept."""
+        normalized = normalize_text(chunk)
+        digest = hashlib.sha1(normalized.encode("utf-8")).digest()
+        self._register(chunk, digest, self.hasher.signature(normalized))
+
+    def deduplicate(self, chunks: List[str]) -> DeduplicationResult:
+        """
+        Split chunks into those to embed and aliases of kept chunks.
+
+        Args:
+            chunks: Text chunks, e.g. from CharacterTextSplitter.split_texts
+
+        Returns:
+            DeduplicationResult describing kept chunks and aliases
+        """
+        result = DeduplicationResult()
+        position: Dict[str, int] = {}
+
+        for i, chunk in enumerate(chunks):
+            kept, kind, digest, signature = self._lookup(chunk)
+            if kept is None:
+                self._register(chunk, digest, signature)
+                position[chunk] = i
+                result.unique_chunks.append(chunk)
+                result.unique_indices.append(i)
+                result.canonical_index.append(i)
+                continue
+
+            # Chunks kept by an earlier call have no position in this input
+            result.canonical_index.append(position.get(kept, -1))
+            if kind == "exact":
+                result.exact_duplicates += 1
+            else:
+                result.near_duplicates += 1
+            if chunk != kept:
+                result.aliases[chunk] = kept
+
+        return result
+
+
+if __name__ == "__main__":
+    from aimakerspace.text_utils import TextFileLoader, CharacterTextSplitter
+
+    documents = TextFileLoader("data/PMarcaBlogs.txt").load_documents()
+    chunks = CharacterTextSplitter().split_texts(documents)
+    result = ChunkDeduplicator(threshold=0.8).deduplicate(chunks)
+    print(result.get_statistics())
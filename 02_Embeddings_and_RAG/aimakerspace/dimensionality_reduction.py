@@ -0,0 +1,173 @@
+"""
+Corpus-trained dimensionality reduction for stored embeddings.
+For models without native truncation, a projection fitted once on a sample
+of the corpus shrinks every vector before it is stored and every query
+before it is scored.
+"""
+
+import numpy as np
+from abc import ABC, abstractmethod
+from typing import Dict, Any, Optional
+
+
+class DimensionalityReducer(ABC):
+    """
+    Base class for fit-once linear projections.
+
+    Subclasses set `components` (n_components x input_dim) and optionally
+    `mean` in fit(); transform() is shared.
+    """
+
+    method = "base"
+
+    def __init__(self, n_components: int, seed: int = 0):
+        self.n_components = n_components
+        self.seed = seed
+        self.input_dim: Optional[int] = None
+        self.components: Optional[np.ndarray] = None
+        self.mean: Optional[np.ndarray] = None
+        self.variance_retained: Optional[float] = None
+
+    @property
+    def is_fitted(self) -> bool:
+        return self.components is not None
+
+    @abstractmethod
+    def fit(self, vectors: np.ndarray) -> "DimensionalityReducer":
+        ...
+
+    def transform(self, vectors: np.ndarray) -> np.ndarray:
+        """Project a single vector or a matrix of row vectors."""
+        if not self.is_fitted:
+            raise ValueError("Reducer must be fitted before transform")
+        vectors = np.asarray(vectors, dtype=np.float64)
+        if self.mean is not None:
+            vectors = vectors - self.mean
+        return vectors @ self.components.T
+
+    def _check_fit_input(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float64)
+        if vectors.ndim != 2 or len(vectors) == 0:
+            raise ValueError("Need a non-empty 2D array of vectors to fit")
+        if self.n_components >= vectors.shape[1]:
+            raise ValueError(
+                f"n_components ({self.n_components}) must be smaller than the "
+                f"vector dimension ({vectors.shape[1]})"
+            )
+        self.input_dim = vectors.shape[1]
+        return vectors
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize to a JSON-compatible dictionary."""
+        return {
+            "method": self.method,
+            "n_components": self.n_components,
+            "seed": self.seed,
+            "input_dim": self.input_dim,
+            "components": self.components.tolist() if self.is_fitted else None,
+            "mean": self.mean.tolist() if self.mean is not None else None,
+            "variance_retained": self.variance_retained,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DimensionalityReducer":
+        """Rebuild a reducer saved with to_dict()."""
+        reducer = create_reducer(data["method"], data["n_components"], data.get("seed", 0))
+        reducer.input_dim = data.get("input_dim")
+        if data.get("components") is not None:
+            reducer.components = np.array(data["components"])
+        if data.get("mean") is not None:
+            reducer.mean = np.array(data["mean"])
+        reducer.variance_retained = data.get("variance_retained")
+        return reducer
+
+
+class PCAReducer(DimensionalityReducer):
+    """
+    PCA computed with randomized SVD (Halko et al.).
+    Needs only a few passes over the sample instead of a full decomposition.
+    """
+
+    method = "pca"
+
+    def __init__(self, n_components: int, seed: int = 0, oversamples: int = 10, power_iterations: int = 4):
+        super().__init__(n_components, seed)
+        self.oversamples = oversamples
+        self.power_iterations = power_iterations
+
+    def _check_fit_input(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = super()._check_fit_input(vectors)
+        # The sample spans at most len(vectors) directions; fewer components
+        # than requested would silently change the output size
+        if self.n_components > len(vectors):
+            raise ValueError(
+                f"PCA needs at least n_components ({self.n_components}) vectors to fit, "
+                f"got {len(vectors)}; lower n_components or use random_projection"
+            )
+        return vectors
+
+    def fit(self, vectors: np.ndarray) -> "PCAReducer":
+        vectors = self._check_fit_input(vectors)
+        rng = np.random.RandomState(self.seed)
+
+        self.mean = vectors.mean(axis=0)
+        centered = vectors - self.mean
+        rank = min(self.n_components + self.oversamples, *centered.shape)
+
+        # Range finder with power iterations to sharpen the spectrum
+        basis = centered @ rng.normal(size=(centered.shape[1], rank))
+        basis, _ = np.linalg.qr(basis)
+        for _ in range(self.power_iterations):
+            basis, _ = np.linalg.qr(centered.T @ basis)
+            basis, _ = np.linalg.qr(centered @ basis)
+
+        _, singular_values, vt = np.linalg.svd(basis.T @ centered, full_matrices=False)
+        self.components = vt[:self.n_components]
+
+        total_variance = np.sum(centered ** 2)
+        kept_variance = np.sum(singular_values[:self.n_components] ** 2)
+        self.variance_retained = float(kept_variance / total_variance) if total_variance > 0 else 1.0
+        return self
+
+
+class RandomProjectionReducer(DimensionalityReducer):
+    """
+    Gaussian random projection.
+    Data-independent apart from the input size; approximately preserves
+    distances and dot products (Johnson-Lindenstrauss).
+    """
+
+    method = "random_projection"
+
+    def fit(self, vectors: np.ndarray) -> "RandomProjectionReducer":
+        vectors = self._check_fit_input(vectors)
+        rng = np.random.RandomState(self.seed)
+        self.components = rng.normal(
+            scale=1.0 / np.sqrt(self.n_components),
+            size=(self.n_components, self.input_dim),
+        )
+
+        # Fraction of squared norm preserved on the sample
+        total = np.sum(vectors ** 2)
+        self.variance_retained = float(np.sum(self.transform(vectors) ** 2) / total) if total > 0 else 1.0
+        return self
+
+
+REDUCERS = {
+    PCAReducer.method: PCAReducer,
+    RandomProjectionReducer.method: RandomProjectionReducer,
+}
+
+
+def create_reducer(method: str, n_components: int, seed: int = 0) -> DimensionalityReducer:
+    """
+    Create an unfitted reducer by name.
+
+    Raises:
+        ValueError: If the method name is not recognized
+    """
+    if method not in REDUCERS:
+        available = ", ".join(REDUCERS.keys())
+        raise ValueError(f"Unknown reduction method: {method}. Available methods: {available}")
+
+    return REDUCERS[method](n_components, seed=seed)
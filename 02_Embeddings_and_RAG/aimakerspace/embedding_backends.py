@@ -0,0 +1,174 @@
+"""
+Pluggable embedding backends.
+EmbeddingBackend is the interface the vector databases and pipelines rely
+on; HashingEmbeddingModel is a deterministic, offline implementation for
+benchmarks, tests and air-gapped runs.
+"""
+
+import re
+import zlib
+import numpy as np
+from abc import ABC, abstractmethod
+from typing import List, Tuple
+
+
+class EmbeddingBackend(ABC):
+    """
+    Interface for anything that turns text into vectors.
+
+    Subclasses implement get_embeddings, returning a float32 matrix with
+    one row per text; the single-text and async variants default to it.
+    """
+
+    @abstractmethod
+    def get_embeddings(self, list_of_text: List[str]) -> np.ndarray:
+        ...
+
+    def get_embedding(self, text: str) -> np.ndarray:
+        return self.get_embeddings([text])[0]
+
+    async def async_get_embeddings(self, list_of_text: List[str]) -> np.ndarray:
+        return self.get_embeddings(list_of_text)
+
+    async def async_get_embedding(self, text: str) -> np.ndarray:
+        return self.get_embedding(text)
+
+
+_WORD = re.compile(r"\w+")
+_POLY_BASE = np.uint64(1099511628211)
+
+
+def _mix(hashes: np.ndarray) -> np.ndarray:
+    """Finalize 64-bit hashes (splitmix64) so low bits are well distributed."""
+    hashes = hashes ^ (hashes >> np.uint64(30))
+    hashes = hashes * np.uint64(0xBF58476D1CE4E5B9)
+    hashes = hashes ^ (hashes >> np.uint64(27))
+    hashes = hashes * np.uint64(0x94D049BB133111EB)
+    return hashes ^ (hashes >> np.uint64(31))
+
+
+class HashingEmbeddingModel(EmbeddingBackend):
+    """
+    Deterministic local embeddings from feature hashing.
+
+    Word n-grams and character n-grams are hashed into `n_features` signed
+    buckets, weighted with log(1 + tf), projected with a fixed Gaussian
+    matrix to `dimensions` and L2-normalized. Texts sharing vocabulary get
+    similar vectors, which is enough to exercise retrieval end to end.
+    Everything is vectorized in NumPy and needs no network access.
+    """
+
+    def __init__(
+        self,
+        dimensions: int = 384,
+        n_features: int = 4096,
+        word_ngrams: Tuple[int, int] = (1, 2),
+        char_ngrams: Tuple[int, int] = (3, 5),
+        seed: int = 0,
+    ):
+        """
+        Args:
+            dimensions: Output vector size
+            n_features: Number of hash buckets before projection
+            word_ngrams: Inclusive range of word n-gram lengths
+            char_ngrams: Inclusive range of character n-gram lengths
+            seed: Seed for the projection matrix
+        """
+        self.dimensions = dimensions
+        self.n_features = n_features
+        self.word_ngrams = word_ngrams
+        self.char_ngrams = char_ngrams
+        self.seed = seed
+        self.embeddings_model_name = f"hashing-{dimensions}"
+        rng = np.random.RandomState(seed)
+        self.projection = (
+            rng.standard_normal((n_features, dimensions)) / np.sqrt(dimensions)
+        ).astype(np.float32)
+
+    def _char_ngram_hashes(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Polynomial hashes of every byte n-gram, computed for the whole batch at once."""
+        encoded = [text.encode("utf-8") for text in texts]
+        lengths = np.array([len(b) for b in encoded], dtype=np.int64)
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint64)
+        doc_ids = np.repeat(np.arange(len(texts)), lengths)
+
+        rows, hashes = [], []
+        for n in range(self.char_ngrams[0], self.char_ngrams[1] + 1):
+            if len(data) < n:
+                continue
+            windows = len(data) - n + 1
+            h = np.full(windows, np.uint64(n), dtype=np.uint64)
+            for offset in range(n):
+                h = h * _POLY_BASE + data[offset:offset + windows]
+            # Drop windows that straddle two documents
+            valid = doc_ids[:windows] == doc_ids[n - 1:]
+            rows.append(doc_ids[:windows][valid])
+            hashes.append(h[valid])
+
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint64)
+        return np.concatenate(rows), np.concatenate(hashes)
+
+    def _word_ngram_hashes(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        rows, hashes = [], []
+        for doc_id, text in enumerate(texts):
+            words = np.array([zlib.crc32(w.encode("utf-8")) for w in _WORD.findall(text)], dtype=np.uint64)
+            for n in range(self.word_ngrams[0], self.word_ngrams[1] + 1):
+                if len(words) < n:
+                    continue
+                windows = len(words) - n + 1
+                # Salted so word features don't collide with char features
+                h = np.full(windows, np.uint64(0x9E3779B97F4A7C15) + np.uint64(n), dtype=np.uint64)
+                for offset in range(n):
+                    h = h * _POLY_BASE + words[offset:offset + windows]
+                rows.append(np.full(windows, doc_id, dtype=np.int64))
+                hashes.append(h)
+
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint64)
+        return np.concatenate(rows), np.concatenate(hashes)
+
+    def embed(self, list_of_text: List[str], batch_size: int = 256) -> np.ndarray:
+        """Embed texts into a float32 matrix of unit-length rows."""
+        if not list_of_text:
+            return np.empty((0, self.dimensions), dtype=np.float32)
+        # Bound the dense (batch x n_features) bucket matrix
+        return np.vstack([
+            self._embed_batch([text.lower() for text in list_of_text[i:i + batch_size]])
+            for i in range(0, len(list_of_text), batch_size)
+        ])
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        with np.errstate(over="ignore"):
+            char_rows, char_hashes = self._char_ngram_hashes(texts)
+            word_rows, word_hashes = self._word_ngram_hashes(texts)
+            rows = np.concatenate([char_rows, word_rows])
+            hashes = _mix(np.concatenate([char_hashes, word_hashes]))
+
+        buckets = (hashes >> np.uint64(1)) % np.uint64(self.n_features)
+        signs = 1.0 - 2.0 * (hashes & np.uint64(1)).astype(np.float32)
+        counts = np.bincount(
+            rows * self.n_features + buckets.astype(np.int64),
+            weights=signs,
+            minlength=len(texts) * self.n_features,
+        ).reshape(len(texts), self.n_features)
+
+        features = (np.sign(counts) * np.log1p(np.abs(counts))).astype(np.float32)
+        vectors = features @ self.projection
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def get_embeddings(self, list_of_text: List[str]) -> np.ndarray:
+        return self.embed(list_of_text)
+
+
+if __name__ == "__main__":
+    import time
+
+    model = HashingEmbeddingModel()
+    chunks = [f"Chunk {i} about startups, hiring executives and bananas. " * 20 for i in range(2000)]
+    start = time.perf_counter()
+    model.get_embeddings(chunks)
+    elapsed = time.perf_counter() - start
+    print(f"{len(chunks) / elapsed:.0f} chunks/second")
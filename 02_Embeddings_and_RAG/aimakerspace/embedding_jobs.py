@@ -0,0 +1,256 @@
+"""
+Checkpointed, resumable bulk embedding.
+An EmbeddingJob embeds a corpus in fixed batches, appending each finished
+batch to a float32 block file and recording it in a progress index, so a
+crashed or interrupted run picks up from the batches already paid for.
+Finished jobs are written straight into the vector databases' binary
+store format.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from aimakerspace.persistence import commit_vectors, create_vectors, write_index, write_json_atomic
+
+
+BLOCKS_FILE = "blocks.f32"
+PROGRESS_FILE = "progress.json"
+
+
+def corpus_fingerprint(texts: List[str], model_name: str = "", dimensions: Optional[int] = None) -> str:
+    """Stable digest of the corpus and embedding settings a checkpoint belongs to."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{model_name}|{dimensions}|{len(texts)}".encode("utf-8"))
+    for text in texts:
+        encoded = text.encode("utf-8")
+        digest.update(len(encoded).to_bytes(8, "little"))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+class EmbeddingCheckpoint:
+    """
+    Append-only float32 block file plus a JSON progress index.
+
+    Each completed batch is appended to `blocks.f32` and fsynced before
+    `progress.json` is atomically replaced to record its row offset, so
+    the index never points at data that didn't make it to disk. Rows past
+    the last recorded batch (a crash between the two writes) are truncated
+    on open.
+    """
+
+    def __init__(self, directory: str, fingerprint: str, n_items: int, batch_size: int):
+        """
+        Raises:
+            ValueError: If the directory holds a checkpoint for a different
+                corpus, model or batch size
+        """
+        self.directory = directory
+        self.n_items = n_items
+        self.batch_size = batch_size
+        os.makedirs(directory, exist_ok=True)
+        self._blocks_path = os.path.join(directory, BLOCKS_FILE)
+        self._progress_path = os.path.join(directory, PROGRESS_FILE)
+
+        self.progress = {
+            "fingerprint": fingerprint,
+            "n_items": n_items,
+            "batch_size": batch_size,
+            "dim": None,
+            "rows_written": 0,
+            "batches": {},
+        }
+        if os.path.exists(self._progress_path):
+            with open(self._progress_path) as f:
+                saved = json.load(f)
+            if (saved["fingerprint"], saved["batch_size"]) != (fingerprint, batch_size):
+                raise ValueError(
+                    f"Checkpoint in {directory} belongs to a different corpus or batch size; "
+                    "use a new directory or delete it"
+                )
+            self.progress = saved
+
+        # Drop anything appended after the last recorded batch
+        with open(self._blocks_path, "ab") as f:
+            f.truncate(self.progress["rows_written"] * (self.progress["dim"] or 0) * 4)
+
+    @property
+    def n_batches(self) -> int:
+        return (self.n_items + self.batch_size - 1) // self.batch_size
+
+    def batch_range(self, batch_id: int) -> Tuple[int, int]:
+        start = batch_id * self.batch_size
+        return start, min(start + self.batch_size, self.n_items)
+
+    def is_complete(self, batch_id: int) -> bool:
+        return str(batch_id) in self.progress["batches"]
+
+    def pending_batches(self) -> List[int]:
+        return [b for b in range(self.n_batches) if not self.is_complete(b)]
+
+    def append(self, batch_id: int, embeddings: np.ndarray) -> None:
+        """Durably record one finished batch."""
+        embeddings = np.ascontiguousarray(embeddings, dtype="<f4")
+        if self.progress["dim"] is None:
+            self.progress["dim"] = embeddings.shape[1]
+
+        with open(self._blocks_path, "ab") as f:
+            f.write(embeddings.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+        self.progress["batches"][str(batch_id)] = self.progress["rows_written"]
+        self.progress["rows_written"] += len(embeddings)
+        write_json_atomic(self._progress_path, self.progress)
+
+    def blocks(self) -> np.ndarray:
+        """All written rows, memory-mapped, in completion order."""
+        dim = self.progress["dim"] or 0
+        if not self.progress["rows_written"]:
+            return np.empty((0, dim), dtype=np.float32)
+        return np.memmap(self._blocks_path, dtype="<f4", mode="r", shape=(self.progress["rows_written"], dim))
+
+    def iter_batches(self) -> Iterator[Tuple[int, np.ndarray]]:
+        """Yield (first input index, rows) for every batch, in input order."""
+        blocks = self.blocks()
+        for batch_id in range(self.n_batches):
+            start, end = self.batch_range(batch_id)
+            offset = self.progress["batches"][str(batch_id)]
+            yield start, blocks[offset:offset + end - start]
+
+
+class EmbeddingJob:
+    """
+    Resumable bulk embedding of a fixed corpus.
+
+    Example:
+        job = EmbeddingJob(EmbeddingModel(), "checkpoints/pmarca", batch_size=1024, parallelism=8)
+        await job.run(chunks)            # safe to interrupt and re-run
+        job.write_database(chunks, "stores/pmarca")
+        db = EnhancedVectorDatabase.load_binary("stores/pmarca")
+    """
+
+    def __init__(
+        self,
+        embedding_model,
+        checkpoint_dir: str,
+        batch_size: int = 1024,
+        parallelism: int = 4,
+    ):
+        """
+        Args:
+            embedding_model: Anything with async_get_embeddings(list_of_text)
+            checkpoint_dir: Where blocks and progress are kept
+            batch_size: Texts per checkpointed batch
+            parallelism: Batches embedded concurrently
+        """
+        if batch_size < 1 or parallelism < 1:
+            raise ValueError("batch_size and parallelism must be at least 1")
+        self.embedding_model = embedding_model
+        self.checkpoint_dir = checkpoint_dir
+        self.batch_size = batch_size
+        self.parallelism = parallelism
+        self.checkpoint: Optional[EmbeddingCheckpoint] = None
+        self.statistics: Dict[str, Any] = {}
+
+    def _fingerprint(self, texts: List[str]) -> str:
+        return corpus_fingerprint(
+            texts,
+            getattr(self.embedding_model, "embeddings_model_name", type(self.embedding_model).__name__),
+            getattr(self.embedding_model, "dimensions", None),
+        )
+
+    def _open(self, texts: List[str]) -> EmbeddingCheckpoint:
+        return EmbeddingCheckpoint(self.checkpoint_dir, self._fingerprint(texts), len(texts), self.batch_size)
+
+    async def run(self, texts: List[str]) -> EmbeddingCheckpoint:
+        """
+        Embed every batch not already in the checkpoint.
+
+        If a batch fails, batches already finished stay checkpointed and
+        the error is raised; re-running resumes from there.
+        """
+        checkpoint = self._open(texts)
+        self.checkpoint = checkpoint
+        pending = checkpoint.pending_batches()
+        queue: asyncio.Queue = asyncio.Queue()
+        for batch_id in pending:
+            queue.put_nowait(batch_id)
+
+        async def work():
+            while not queue.empty():
+                batch_id = queue.get_nowait()
+                start, end = checkpoint.batch_range(batch_id)
+                embeddings = await self.embedding_model.async_get_embeddings(texts[start:end])
+                # Appends happen on the event loop thread, one at a time
+                checkpoint.append(batch_id, np.asarray(embeddings, dtype=np.float32))
+
+        started = time.perf_counter()
+        workers = [asyncio.ensure_future(work()) for _ in range(min(self.parallelism, len(pending)))]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            seconds = time.perf_counter() - started
+            embedded = len(pending) - len(checkpoint.pending_batches())
+            self.statistics = {
+                "batches": checkpoint.n_batches,
+                "batches_resumed": checkpoint.n_batches - len(pending),
+                "batches_embedded": embedded,
+                "seconds": seconds,
+                "items_per_second": sum(
+                    min(self.batch_size, len(texts) - b * self.batch_size)
+                    for b in pending if checkpoint.is_complete(b)
+                ) / seconds if seconds > 0 else 0.0,
+            }
+        return checkpoint
+
+    def write_database(
+        self,
+        texts: List[str],
+        directory: str,
+        metadata_list: Optional[List[Dict[str, Any]]] = None,
+        distance_metric: str = "cosine",
+    ) -> str:
+        """
+        Stream a finished checkpoint, in input order, into a binary store
+        loadable with EnhancedVectorDatabase.load_binary (or
+        VectorDatabase.load_binary). Keys are the texts; metadata gets the
+        input `index` like abuild_from_list.
+
+        Raises:
+            ValueError: If the checkpoint still has unembedded batches, or
+                was built from different texts
+        """
+        checkpoint = self.checkpoint
+        if checkpoint is None:
+            checkpoint = self._open(texts)
+        elif checkpoint.progress["fingerprint"] != self._fingerprint(texts):
+            raise ValueError(
+                "Texts don't match the corpus the last run embedded; pass the same list or run the job on these texts"
+            )
+        if checkpoint.pending_batches():
+            raise ValueError(f"{len(checkpoint.pending_batches())} batches still pending; run the job first")
+
+        matrix = create_vectors(directory, len(texts), checkpoint.progress["dim"] or 0)
+        for start, rows in checkpoint.iter_batches():
+            matrix[start:start + len(rows)] = rows
+        commit_vectors(directory, matrix)
+
+        metadata_list = metadata_list or [{}] * len(texts)
+        write_index(directory, {
+            "keys": texts,
+            "metadata": [{**metadata_list[i], "index": i} for i in range(len(texts))],
+            "aliases": {},
+            "distance_metric": distance_metric,
+            "coarse_dims": None,
+            "reducer": None,
+        })
+        return directory
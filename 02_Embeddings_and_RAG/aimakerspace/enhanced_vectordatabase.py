@@ -4,11 +4,21 @@ Enhanced Vector Database with metadata support and multiple distance metrics.
 
 import numpy as np
 from collections import defaultdict
-from typing import List, Tuple, Dict, Any, Optional, Callable
+from typing import List, Tuple, Dict, Any, Optional, Callable, Iterable, AsyncIterable, Union
 from datetime import datetime
 import json
+import sys
+import threading
+import time
 
 from aimakerspace.openai_utils.embedding import EmbeddingModel
+from aimakerspace.deduplication import ChunkDeduplicator
+from aimakerspace.coarse_search import CoarseIndex, coarse_to_fine_search
+from aimakerspace.dimensionality_reduction import DimensionalityReducer, create_reducer
+from aimakerspace.streaming import StreamingEmbedder, aiterate
+from aimakerspace.statistics import MetadataStatistics, metadata_nbytes
+from aimakerspace.concurrency import DELETED, LayeredMapping, ReadWriteLock, Snapshot
+from aimakerspace.persistence import read_store, write_store
 from aimakerspace.distance_metrics import (
     cosine_similarity, 
     get_distance_metric,
@@ -25,14 +35,65 @@ class EnhancedVectorDatabase:
     - Metadata storage and filtering
     - Timestamp tracking
     - Source attribution
+    - Aliases for deduplicated chunks
+    - Coarse-to-fine search over truncated vector prefixes
+    - Corpus-trained dimensionality reduction (PCA / random projection)
+    - Constant-time statistics maintained on insert and delete
+    - Snapshot isolation: searches never block on concurrent writes
     """
     
-    def __init__(self, embedding_model: EmbeddingModel = None, distance_metric: str = "cosine"):
+    def __init__(
+        self,
+        embedding_model: EmbeddingModel = None,
+        distance_metric: str = "cosine",
+        coarse_dims: Optional[int] = None,
+    ):
         self.vectors = defaultdict(np.array)
         self.metadata = defaultdict(dict)
+        self.aliases = {}
         self.embedding_model = embedding_model or EmbeddingModel()
         self.distance_metric_name = distance_metric
         self.distance_measure = get_distance_metric(distance_metric)
+        # Prefix length for coarse-to-fine search; None scans full vectors
+        self.coarse_dims = coarse_dims
+        self._coarse_index = None
+        self.reducer: Optional[DimensionalityReducer] = None
+        self._reducer_fit_seconds = 0.0
+        self.build_statistics: Dict[str, Any] = {}
+        self._stats = MetadataStatistics()
+        self._vector_dim = 0
+        self._memory = {"vectors": 0, "keys": 0, "metadata": 0}
+        # Writers mutate the live dicts under the lock, record what they
+        # changed and bump the version; searches read an immutable snapshot
+        # republished once per version from the previous one plus the changes.
+        # Metadata dicts are replaced rather than mutated once stored.
+        self._lock = ReadWriteLock()
+        self._publish_lock = threading.Lock()
+        self._version = 0
+        self._snapshot = Snapshot(0, LayeredMapping(), LayeredMapping())
+        self._vector_changes: Dict[str, Any] = {}
+        self._metadata_changes: Dict[str, Any] = {}
+        # Set when the live dicts were filled without recording changes
+        self._rebuild_snapshot = False
+        
+    def _track_add(self, key: str) -> None:
+        """Account for a stored entry in the running statistics."""
+        vector = self.vectors[key]
+        metadata = self.metadata.get(key, {})
+        self._stats.add(metadata)
+        self._vector_dim = len(vector)
+        self._memory["vectors"] += vector.nbytes
+        self._memory["keys"] += sys.getsizeof(key)
+        self._memory["metadata"] += metadata_nbytes(metadata)
+        
+    def _track_remove(self, key: str) -> None:
+        """Undo _track_add for an entry about to be replaced or deleted."""
+        vector = self.vectors[key]
+        metadata = self.metadata.get(key, {})
+        self._stats.remove(metadata)
+        self._memory["vectors"] -= vector.nbytes
+        self._memory["keys"] -= sys.getsizeof(key)
+        self._memory["metadata"] -= metadata_nbytes(metadata)
         
     def insert(self, key: str, vector: np.array, metadata: Optional[Dict[str, Any]] = None) -> None:
         """
@@ -43,7 +104,29 @@ class EnhancedVectorDatabase:
             vector: The embedding vector
             metadata: Optional metadata dictionary
         """
+        with self._lock.write_locked():
+            self._insert(key, vector, metadata)
+            self._version += 1
+    
+    def insert_many(self, items: Iterable[Tuple[str, np.array, Optional[Dict[str, Any]]]]) -> None:
+        """
+        Insert (key, vector, metadata) tuples as a single write.
+        
+        Readers see either none or all of the batch, and the snapshot is
+        republished once instead of once per entry.
+        """
+        with self._lock.write_locked():
+            for key, vector, metadata in items:
+                self._insert(key, vector, metadata)
+            self._version += 1
+    
+    def _insert(self, key: str, vector: np.array, metadata: Optional[Dict[str, Any]]) -> None:
+        """Insert without locking; callers hold the write lock."""
+        vector = self._reduce(np.asarray(vector), self.reducer)
+        if key in self.vectors:
+            self._track_remove(key)
         self.vectors[key] = vector
+        self._coarse_index = None
         
         # Add default metadata
         default_metadata = {
@@ -56,13 +139,144 @@ class EnhancedVectorDatabase:
             default_metadata.update(metadata)
             
         self.metadata[key] = default_metadata
+        self._track_add(key)
+        self._vector_changes[key] = vector
+        self._metadata_changes[key] = default_metadata
+    
+    def delete(self, key: str) -> bool:
+        """
+        Remove an entry and any aliases pointing to it.
+        
+        Returns:
+            True if the entry existed
+        """
+        with self._lock.write_locked():
+            if key not in self.vectors:
+                return False
+                
+            self._track_remove(key)
+            del self.vectors[key]
+            self.metadata.pop(key, None)
+            self._vector_changes[key] = DELETED
+            self._metadata_changes[key] = DELETED
+            self.aliases = {alias: target for alias, target in self.aliases.items() if target != key}
+            self._coarse_index = None
+            self._version += 1
+            return True
+    
+    def snapshot(self) -> Snapshot:
+        """
+        Return a consistent view of vectors, metadata and reducer for
+        lock-free reads. Publishing a new version costs the size of the
+        changes since the last one, not of the database.
+        """
+        snapshot = self._snapshot
+        if snapshot.version == self._version:
+            return snapshot
+            
+        with self._lock.read_locked(), self._publish_lock:
+            snapshot = self._snapshot
+            if snapshot.version == self._version:
+                return snapshot
+            if self._rebuild_snapshot:
+                vectors = LayeredMapping.from_dict(self.vectors)
+                metadata = LayeredMapping.from_dict(self.metadata)
+            else:
+                vectors = snapshot.vectors.with_changes(self._vector_changes, len(self.vectors))
+                metadata = snapshot.metadata.with_changes(self._metadata_changes, len(self.metadata))
+            self._vector_changes, self._metadata_changes, self._rebuild_snapshot = {}, {}, False
+            snapshot = Snapshot(self._version, vectors, metadata, self.reducer)
+            self._snapshot = snapshot
+        return snapshot
+    
+    @staticmethod
+    def _reduce(vector: np.array, reducer: Optional[DimensionalityReducer]) -> np.array:
+        """Project a full-size vector if `reducer` is fitted; pass others through."""
+        if reducer is not None and len(vector) == reducer.input_dim:
+            # Keep the caller's precision (float32 embeddings stay float32)
+            return reducer.transform(vector).astype(vector.dtype, copy=False)
+        return vector
+    
+    def fit_reducer(
+        self,
+        method: str = "pca",
+        n_components: int = 256,
+        sample_size: int = 10000,
+        seed: int = 0,
+    ) -> DimensionalityReducer:
+        """
+        Fit a dimensionality reducer on a sample of stored vectors.
+        
+        Every stored vector is projected immediately; later inserts and
+        queries of the original dimension are projected automatically.
+        
+        Args:
+            method: "pca" (randomized SVD) or "random_projection"
+            n_components: Target dimension
+            sample_size: Maximum number of stored vectors to fit on
+            seed: Seed for sampling and the projection
+        """
+        with self._lock.write_locked():
+            reducer = self._fit_reducer(method, n_components, sample_size, seed)
+            self._version += 1
+        return reducer
+    
+    def _fit_reducer(self, method: str, n_components: int, sample_size: int, seed: int) -> DimensionalityReducer:
+        if self.reducer is not None:
+            raise ValueError("A reducer is already fitted; rebuild the database to refit")
+        if len(self.vectors) == 0:
+            raise ValueError("Cannot fit a reducer on an empty database")
+            
+        keys = list(self.vectors.keys())
+        rng = np.random.RandomState(seed)
+        if len(keys) > sample_size:
+            sample_keys = [keys[i] for i in rng.choice(len(keys), sample_size, replace=False)]
+        else:
+            sample_keys = keys
+            
+        start = time.perf_counter()
+        reducer = create_reducer(method, n_components, seed)
+        reducer.fit(np.vstack([self.vectors[key] for key in sample_keys]))
+        self._reducer_fit_seconds = time.perf_counter() - start
+        
+        stored = np.vstack([self.vectors[key] for key in keys])
+        projected = reducer.transform(stored).astype(stored.dtype, copy=False)
+        for key, vector in zip(keys, projected):
+            self._track_remove(key)
+            self.vectors[key] = vector
+            self.metadata[key] = {**self.metadata[key], "vector_dim": n_components}
+            self._track_add(key)
+            self._vector_changes[key] = vector
+            self._metadata_changes[key] = self.metadata[key]
+        self.reducer = reducer
+        self._coarse_index = None
+        return reducer
+    
+    def add_alias(self, alias: str, key: str) -> None:
+        """Record `alias` as a duplicate of the stored entry `key`."""
+        with self._lock.write_locked():
+            self.aliases[alias] = self.resolve_alias(key)
+
+    def resolve_alias(self, key: str) -> str:
+        """Return the stored key that `key` is an alias of (or `key` itself)."""
+        return self.aliases.get(key, key)
+
+    def _get_coarse_index(self, prefix_dims: int, snapshot: Snapshot) -> CoarseIndex:
+        index = self._coarse_index
+        if index is None or index.prefix_dims != prefix_dims or index.version != snapshot.version:
+            keys = list(snapshot.vectors.keys())
+            index = CoarseIndex(keys, [snapshot.vectors[key] for key in keys], prefix_dims, snapshot.version)
+            self._coarse_index = index
+        return index
     
     def search(
         self,
         query_vector: np.array,
         k: int,
         distance_measure: Optional[Callable] = None,
-        metadata_filter: Optional[Dict[str, Any]] = None
+        metadata_filter: Optional[Dict[str, Any]] = None,
+        coarse_dims: Optional[int] = None,
+        shortlist_size: Optional[int] = None,
     ) -> List[Tuple[str, float, Dict[str, Any]]]:
         """
         Search for similar vectors with optional metadata filtering.
@@ -72,24 +286,45 @@ class EnhancedVectorDatabase:
             k: Number of results to return
             distance_measure: Optional custom distance measure
             metadata_filter: Optional metadata constraints
+            coarse_dims: Scan only this many leading dimensions, then
+                re-rank a shortlist with the full vectors
+            shortlist_size: Candidates to re-rank (defaults to 10 * k)
             
         Returns:
             List of tuples (text, score, metadata)
         """
         if distance_measure is None:
             distance_measure = self.distance_measure
+        snapshot = self.snapshot()
+        # The snapshot's reducer, so the query matches the vectors it is scored against
+        query_vector = self._reduce(np.asarray(query_vector), snapshot.reducer)
+        metadata = snapshot.metadata
+            
+        coarse_dims = coarse_dims or self.coarse_dims
+        if coarse_dims:
+            index = self._get_coarse_index(coarse_dims, snapshot)
+            mask = None
+            if metadata_filter:
+                mask = np.array([
+                    self._matches_filter(metadata[key], metadata_filter)
+                    for key in index.keys
+                ], dtype=bool)
+            results = coarse_to_fine_search(
+                index, snapshot.vectors, query_vector, k, distance_measure, shortlist_size, mask
+            )
+            return [(key, score, metadata[key]) for key, score in results]
             
         # Apply metadata filter if provided
-        candidates = self.vectors.items()
+        candidates = snapshot.vectors.items()
         if metadata_filter:
             candidates = [
                 (key, vector) for key, vector in candidates
-                if self._matches_filter(self.metadata[key], metadata_filter)
+                if self._matches_filter(metadata[key], metadata_filter)
             ]
         
         # Calculate scores
         scores = [
-            (key, distance_measure(query_vector, vector), self.metadata[key])
+            (key, distance_measure(query_vector, vector), metadata[key])
             for key, vector in candidates
         ]
         
@@ -103,12 +338,13 @@ class EnhancedVectorDatabase:
         distance_measure: Optional[Callable] = None,
         metadata_filter: Optional[Dict[str, Any]] = None,
         return_as_text: bool = False,
+        coarse_dims: Optional[int] = None,
     ) -> List[Tuple[str, float, Dict[str, Any]]]:
         """
         Search by text query with optional metadata filtering.
         """
         query_vector = self.embedding_model.get_embedding(query_text)
-        results = self.search(query_vector, k, distance_measure, metadata_filter)
+        results = self.search(query_vector, k, distance_measure, metadata_filter, coarse_dims)
         
         if return_as_text:
             return [(result[0], result[2]) for result in results]
@@ -157,36 +393,86 @@ class EnhancedVectorDatabase:
     
     def update_metadata(self, key: str, metadata_update: Dict[str, Any]) -> None:
         """Update metadata for an existing entry."""
-        if key in self.metadata:
-            self.metadata[key].update(metadata_update)
-            self.metadata[key]["last_updated"] = datetime.now().isoformat()
+        with self._lock.write_locked():
+            if key in self.metadata:
+                self._track_remove(key)
+                # Copy-on-write so snapshots keep the old dict intact
+                updated = dict(self.metadata[key])
+                updated.update(metadata_update)
+                updated["last_updated"] = datetime.now().isoformat()
+                self.metadata[key] = updated
+                self._track_add(key)
+                self._metadata_changes[key] = updated
+                self._version += 1
     
     def get_statistics(self) -> Dict[str, Any]:
-        """Get database statistics."""
-        total_vectors = len(self.vectors)
-        
-        # Metadata statistics
-        metadata_keys = set()
-        sources = set()
+        """
+        Get database statistics.
         
-        for meta in self.metadata.values():
-            metadata_keys.update(meta.keys())
-            if "source" in meta:
-                sources.add(meta["source"])
+        Runs in constant time: field counts and distinct values are
+        maintained on insert/delete. Fields with more than 1000 distinct
+        values are tracked with a HyperLogLog sketch, in which case their
+        value list is None and the distinct count is approximate.
+        """
+        with self._lock.read_locked():
+            return self._get_statistics()
+    
+    def _get_statistics(self) -> Dict[str, Any]:
+        total_vectors = len(self.vectors)
         
         return {
             "total_vectors": total_vectors,
             "distance_metric": self.distance_metric_name,
             "available_metrics": list(DISTANCE_METRICS.keys()),
-            "metadata_fields": list(metadata_keys),
-            "unique_sources": list(sources),
-            "vector_dimensions": self.vectors[next(iter(self.vectors))].shape[0] if total_vectors > 0 else 0
+            "metadata_fields": self._stats.field_names(),
+            "unique_sources": self._stats.values("source"),
+            "unique_source_count": self._stats.distinct("source"),
+            "field_statistics": self._stats.summary(),
+            "vector_dimensions": self._vector_dim if total_vectors > 0 else 0,
+            "memory_bytes": self._memory_statistics(),
+            "dimensionality_reduction": self._reduction_statistics(),
+        }
+    
+    def _memory_statistics(self) -> Dict[str, int]:
+        """Approximate memory footprint per component."""
+        memory = dict(self._memory)
+        memory["aliases"] = sys.getsizeof(self.aliases)
+        memory["coarse_index"] = self._coarse_index.memory_bytes() if self._coarse_index is not None else 0
+        memory["reducer"] = self.reducer.components.nbytes if self.reducer is not None else 0
+        memory["statistics"] = self._stats.memory_bytes()
+        memory["total"] = sum(memory.values())
+        return memory
+    
+    def _reduction_statistics(self) -> Optional[Dict[str, Any]]:
+        """Variance retained and estimated savings of the fitted reducer."""
+        if self.reducer is None:
+            return None
+            
+        original_dim = self.reducer.input_dim
+        reduced_dim = self.reducer.n_components
+        # Projection keeps each vector's dtype, so full-size vectors would take
+        # the stored bytes scaled back up by the dimension ratio
+        reduced_bytes = self._memory["vectors"]
+        original_bytes = reduced_bytes * original_dim // reduced_dim
+        
+        return {
+            "method": self.reducer.method,
+            "original_dimensions": original_dim,
+            "reduced_dimensions": reduced_dim,
+            "variance_retained": self.reducer.variance_retained,
+            "vector_memory_bytes_before": original_bytes,
+            "vector_memory_bytes_after": reduced_bytes,
+            "memory_savings": 1 - reduced_bytes / original_bytes if original_bytes else 0.0,
+            # Scans are linear in the dimension, so this is the expected speedup
+            "estimated_scan_speedup": original_dim / reduced_dim,
+            "fit_seconds": self._reducer_fit_seconds,
         }
     
     async def abuild_from_list(
         self, 
         list_of_text: List[str],
-        metadata_list: Optional[List[Dict[str, Any]]] = None
+        metadata_list: Optional[List[Dict[str, Any]]] = None,
+        deduplicator: Optional[ChunkDeduplicator] = None,
     ) -> "EnhancedVectorDatabase":
         """
         Build database from text list with optional metadata.
@@ -194,25 +480,113 @@ class EnhancedVectorDatabase:
         Args:
             list_of_text: List of text documents
             metadata_list: Optional list of metadata dictionaries
+            deduplicator: Optional ChunkDeduplicator; duplicates are stored
+                as aliases of the kept chunk instead of being embedded
+        """
+        if metadata_list is None:
+            metadata_list = [{}] * len(list_of_text)
+            
+        indices = range(len(list_of_text))
+        if deduplicator is not None:
+            result = deduplicator.deduplicate(list_of_text)
+            indices = result.unique_indices
+            for alias, key in result.aliases.items():
+                self.add_alias(alias, key)
+            
+        texts = [list_of_text[i] for i in indices]
+        embeddings = await self.embedding_model.async_get_embeddings(texts)
+            
+        def entries():
+            for i, text, embedding in zip(indices, texts, embeddings):
+                metadata = metadata_list[i].copy() if i < len(metadata_list) else {}
+                metadata["index"] = i
+                yield text, np.asarray(embedding, dtype=np.float32), metadata
+                
+        self.insert_many(entries())
+        return self
+    
+    async def abuild_from_iter(
+        self,
+        items: Union[Iterable[Any], AsyncIterable[Any]],
+        batch_size: int = 256,
+        max_concurrency: int = 4,
+    ) -> "EnhancedVectorDatabase":
         """
-        embeddings = await self.embedding_model.async_get_embeddings(list_of_text)
+        Build database from a stream of texts with bounded memory.
+        
+        Batches are embedded by `max_concurrency` workers and inserted as
+        they complete, so the corpus never has to fit in memory at once.
+        Throughput is recorded in `build_statistics`.
         
+        Args:
+            items: Sync or async iterable of texts or (text, metadata) tuples
+            batch_size: Texts per embeddings request
+            max_concurrency: Number of concurrent embedding requests
+        """
+        async def numbered():
+            # Number items as they are read since batches finish out of order
+            index = 0
+            async for item in aiterate(items):
+                text, metadata = (item, {}) if isinstance(item, str) else item
+                yield text, metadata, index
+                index += 1
+
+        embedder = StreamingEmbedder(self.embedding_model, batch_size, max_concurrency)
+        async for batch, embeddings in embedder.stream(numbered(), text_of=lambda item: item[0]):
+            self.insert_many(
+                (text, np.asarray(embedding, dtype=np.float32), {**metadata, "index": index})
+                for (text, metadata, index), embedding in zip(batch, embeddings)
+            )
+                
+        self.build_statistics = embedder.statistics
+        return self
+    
+    def build_from_batch(
+        self,
+        list_of_text: List[str],
+        directory: str,
+        metadata_list: Optional[List[Dict[str, Any]]] = None,
+        transport=None,
+        poll_interval: float = 60.0,
+        timeout: Optional[float] = None,
+    ) -> "EnhancedVectorDatabase":
+        """
+        Build database through the embeddings Batch API (see
+        EmbeddingModel.batch_embed), bulk-inserting each request file's
+        results as soon as its batch completes.
+        
+        Args:
+            list_of_text: List of text documents
+            directory: Where batch request files are written
+            metadata_list: Optional list of metadata dictionaries
+            transport: BatchTransport; defaults to the real Batch API
+            poll_interval: Seconds between status polls
+            timeout: Give up after this many seconds
+        """
         if metadata_list is None:
             metadata_list = [{}] * len(list_of_text)
             
-        for i, (text, embedding) in enumerate(zip(list_of_text, embeddings)):
-            metadata = metadata_list[i].copy() if i < len(metadata_list) else {}
-            metadata["index"] = i
-            self.insert(text, np.array(embedding), metadata)
+        started = time.perf_counter()
+        results = self.embedding_model.batch_embed(list_of_text, directory, transport, poll_interval, timeout)
+        for start, embeddings in results:
+            self.insert_many(
+                (list_of_text[i], embedding, {**(metadata_list[i] if i < len(metadata_list) else {}), "index": i})
+                for i, embedding in enumerate(embeddings, start)
+            )
             
+        self.build_statistics = {"items": len(list_of_text), "seconds": time.perf_counter() - started}
         return self
     
     def save_to_json(self, filepath: str) -> None:
         """Save the database to a JSON file."""
+        snapshot = self.snapshot()
         data = {
-            "vectors": {k: v.tolist() for k, v in self.vectors.items()},
-            "metadata": dict(self.metadata),
-            "distance_metric": self.distance_metric_name
+            "vectors": {k: v.tolist() for k, v in snapshot.vectors.items()},
+            "metadata": dict(snapshot.metadata.items()),
+            "aliases": self.aliases,
+            "distance_metric": self.distance_metric_name,
+            "coarse_dims": self.coarse_dims,
+            "reducer": self.reducer.to_dict() if self.reducer is not None else None,
         }
         
         with open(filepath, 'w') as f:
@@ -224,11 +598,58 @@ class EnhancedVectorDatabase:
         with open(filepath, 'r') as f:
             data = json.load(f)
         
-        db = cls(embedding_model, data.get("distance_metric", "cosine"))
+        db = cls(embedding_model, data.get("distance_metric", "cosine"), data.get("coarse_dims"))
         
         for key, vector_list in data["vectors"].items():
             db.vectors[key] = np.array(vector_list)
             
         db.metadata = defaultdict(dict, data["metadata"])
+        for key in db.vectors:
+            db._track_add(key)
+        db.aliases = data.get("aliases", {})
+        if data.get("reducer"):
+            db.reducer = DimensionalityReducer.from_dict(data["reducer"])
+        db._rebuild_snapshot = True
+        db._version += 1
+        
+        return db
+    
+    def save_binary(self, directory: str) -> None:
+        """Save the database as a binary store (float32 matrix + JSON index)."""
+        snapshot = self.snapshot()
+        write_store(directory, snapshot.vectors, {
+            "metadata": [snapshot.metadata.get(key, {}) for key in snapshot.vectors],
+            "aliases": self.aliases,
+            "distance_metric": self.distance_metric_name,
+            "coarse_dims": self.coarse_dims,
+            "reducer": self.reducer.to_dict() if self.reducer is not None else None,
+        })
+    
+    @classmethod
+    def load_binary(
+        cls,
+        directory: str,
+        embedding_model: EmbeddingModel = None,
+        mmap: bool = True,
+    ) -> "EnhancedVectorDatabase":
+        """
+        Load a database saved with save_binary (or written by an EmbeddingJob).
+        With `mmap`, vectors stay on disk and are paged in as searched.
+        """
+        vectors, index = read_store(directory, mmap)
+        
+        db = cls(embedding_model, index.get("distance_metric", "cosine"), index.get("coarse_dims"))
+        metadata_list = index.get("metadata") or [{}] * len(index["keys"])
+        for row, (key, metadata) in enumerate(zip(index["keys"], metadata_list)):
+            db.vectors[key] = vectors[row]
+            db.metadata[key] = metadata
+            
+        for key in db.vectors:
+            db._track_add(key)
+        db.aliases = index.get("aliases", {})
+        if index.get("reducer"):
+            db.reducer = DimensionalityReducer.from_dict(index["reducer"])
+        db._rebuild_snapshot = True
+        db._version += 1
         
         return db
\ No newline at end of file
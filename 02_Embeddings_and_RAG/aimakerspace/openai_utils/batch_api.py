@@ -0,0 +1,312 @@
+"""
+Offline bulk embedding through the OpenAI Batch API.
+Texts are written to batch request JSONL files (split automatically to
+stay under the per-file limits), submitted through a pluggable
+BatchTransport, polled, and decoded file by file as each batch finishes.
+LocalBatchTransport stands in for the service in tests and offline runs.
+"""
+
+import base64
+import json
+import os
+import shutil
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from aimakerspace.embedding_backends import HashingEmbeddingModel
+from aimakerspace.openai_utils.batching import estimate_tokens
+
+
+# Published Batch API limits
+MAX_REQUESTS_PER_FILE = 50_000
+MAX_EMBEDDING_INPUTS_PER_FILE = 50_000
+MAX_FILE_BYTES = 200 * 1024 * 1024
+
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+class BatchTransport(ABC):
+    """Where batch files go to be processed."""
+
+    @abstractmethod
+    def submit(self, path: str, endpoint: str = "/v1/embeddings") -> str:
+        """Upload a request file and start a batch; returns the batch id."""
+
+    @abstractmethod
+    def status(self, batch_id: str) -> str:
+        """One of validating, in_progress, finalizing, completed, failed, expired, cancelled."""
+
+    @abstractmethod
+    def results(self, batch_id: str) -> Iterator[str]:
+        """Output (and error) JSONL lines of a finished batch."""
+
+
+class OpenAIBatchTransport(BatchTransport):
+    """The real Batch API (24h completion window, roughly half the price)."""
+
+    def __init__(self, client, completion_window: str = "24h"):
+        """
+        Args:
+            client: openai.OpenAI client
+            completion_window: Batch completion window
+        """
+        self.client = client
+        self.completion_window = completion_window
+
+    def submit(self, path: str, endpoint: str = "/v1/embeddings") -> str:
+        with open(path, "rb") as f:
+            uploaded = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint=endpoint,
+            completion_window=self.completion_window,
+        )
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        return self.client.batches.retrieve(batch_id).status
+
+    def results(self, batch_id: str) -> Iterator[str]:
+        batch = self.client.batches.retrieve(batch_id)
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                yield from self.client.files.content(file_id).text.splitlines()
+
+
+class LocalBatchTransport(BatchTransport):
+    """
+    File-based stand-in for the Batch API.
+
+    Submitted files are copied into `directory` and processed with a local
+    embedding backend the first time their status is polled after `delay`
+    seconds, producing output files in the Batch API's format.
+    """
+
+    def __init__(self, directory: str, embedding_backend=None, delay: float = 0.0, default_dimensions: int = 1536):
+        """
+        Args:
+            directory: Where submitted and output files are kept
+            embedding_backend: Backend with get_embeddings; defaults to
+                HashingEmbeddingModel at the requested dimensions
+            delay: Seconds before a submitted batch completes
+            default_dimensions: Output size when a request doesn't set one
+        """
+        self.directory = directory
+        self.embedding_backend = embedding_backend
+        self.delay = delay
+        self.default_dimensions = default_dimensions
+        self._backends: Dict[int, HashingEmbeddingModel] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, batch_id: str) -> Tuple[str, str, str]:
+        base = os.path.join(self.directory, batch_id)
+        return f"{base}.input.jsonl", f"{base}.output.jsonl", f"{base}.state.json"
+
+    def _backend(self, dimensions: int):
+        if self.embedding_backend is not None:
+            return self.embedding_backend
+        if dimensions not in self._backends:
+            self._backends[dimensions] = HashingEmbeddingModel(dimensions=dimensions)
+        return self._backends[dimensions]
+
+    def submit(self, path: str, endpoint: str = "/v1/embeddings") -> str:
+        if endpoint != "/v1/embeddings":
+            raise ValueError(f"LocalBatchTransport only supports /v1/embeddings, got {endpoint}")
+        batch_id = f"batch_local_{uuid.uuid4().hex[:12]}"
+        input_path, _, state_path = self._paths(batch_id)
+        shutil.copyfile(path, input_path)
+        with open(state_path, "w") as f:
+            json.dump({"status": "in_progress", "submitted": time.time()}, f)
+        return batch_id
+
+    def _process(self, batch_id: str) -> None:
+        input_path, output_path, _ = self._paths(batch_id)
+        with open(input_path) as requests, open(output_path, "w") as output:
+            for line in requests:
+                request = json.loads(line)
+                body = request["body"]
+                vectors = np.asarray(
+                    self._backend(body.get("dimensions") or self.default_dimensions).get_embeddings(body["input"]),
+                    dtype="<f4",
+                )
+                data = [
+                    {"object": "embedding", "index": i, "embedding": base64.b64encode(vector.tobytes()).decode("ascii")}
+                    for i, vector in enumerate(vectors)
+                ]
+                output.write(json.dumps({
+                    "id": f"batch_req_{uuid.uuid4().hex[:12]}",
+                    "custom_id": request["custom_id"],
+                    "response": {"status_code": 200, "body": {"object": "list", "data": data, "model": body["model"]}},
+                    "error": None,
+                }) + "\n")
+
+    def status(self, batch_id: str) -> str:
+        _, _, state_path = self._paths(batch_id)
+        with open(state_path) as f:
+            state = json.load(f)
+        if state["status"] == "in_progress" and time.time() - state["submitted"] >= self.delay:
+            self._process(batch_id)
+            state["status"] = "completed"
+            with open(state_path, "w") as f:
+                json.dump(state, f)
+        return state["status"]
+
+    def results(self, batch_id: str) -> Iterator[str]:
+        _, output_path, _ = self._paths(batch_id)
+        with open(output_path) as f:
+            for line in f:
+                yield line.rstrip("\n")
+
+
+class BatchFile:
+    """One request file: a contiguous range of inputs and how they were planned."""
+
+    def __init__(self, path: str, start: int, end: int, plan):
+        self.path = path
+        self.start = start
+        self.end = end
+        self.plan = plan
+        self.batch_id: Optional[str] = None
+
+
+def split_input_ranges(
+    list_of_text: List[str],
+    max_input_tokens: int,
+    max_inputs: int = MAX_EMBEDDING_INPUTS_PER_FILE,
+    max_bytes: int = MAX_FILE_BYTES,
+) -> List[Tuple[int, int]]:
+    """
+    Contiguous (start, end) input ranges that each fit one batch file.
+    Oversized texts count as the number of pieces they will be split into;
+    bytes are the UTF-8 size plus per-input overhead, with headroom for
+    JSON escaping.
+    """
+    ranges, start, count, size = [], 0, 0, 0
+    budget = int(max_bytes * 0.8)
+    for i, text in enumerate(list_of_text):
+        pieces = max(1, -(-estimate_tokens(text) // max_input_tokens))
+        text_bytes = len(text.encode("utf-8")) + 8 * pieces
+        if i > start and (count + pieces > max_inputs or size + text_bytes > budget):
+            ranges.append((start, i))
+            start, count, size = i, 0, 0
+        count += pieces
+        size += text_bytes
+    if start < len(list_of_text):
+        ranges.append((start, len(list_of_text)))
+    return ranges
+
+
+def write_batch_files(embedding_model, list_of_text: List[str], directory: str) -> List[BatchFile]:
+    """
+    Write Batch API request files for `list_of_text`.
+
+    Each file covers a contiguous input range and is planned on its own
+    (deduplication, splitting of oversized inputs, token packing), so it
+    can be decoded independently as soon as its batch completes.
+    """
+    os.makedirs(directory, exist_ok=True)
+    files = []
+    ranges = split_input_ranges(list_of_text, embedding_model.max_input_tokens)
+    for file_number, (start, end) in enumerate(ranges):
+        plan = embedding_model._plan(list_of_text[start:end])
+        path = os.path.join(directory, f"embeddings_{file_number:05d}.jsonl")
+        with open(path, "w") as f:
+            for batch in plan.batches:
+                body = {
+                    **embedding_model._request_kwargs(),
+                    "input": [plan.pieces[i] for i in batch],
+                }
+                # Pieces of a request are contiguous, so the id is their range
+                f.write(json.dumps({
+                    "custom_id": f"pieces-{batch[0]}-{batch[-1] + 1}",
+                    "method": "POST",
+                    "url": "/v1/embeddings",
+                    "body": body,
+                }) + "\n")
+        # Only the bookkeeping is needed to decode results
+        plan.pieces = []
+        files.append(BatchFile(path, start, end, plan))
+    return files
+
+
+def decode_batch_results(embedding_model, batch_file: BatchFile, lines: Iterator[str]) -> np.ndarray:
+    """
+    Decode a finished batch into a float32 matrix, one row per input of the file.
+
+    Raises:
+        RuntimeError: If any request in the batch failed or is missing
+    """
+    plan = batch_file.plan
+    n_pieces = len(plan.token_counts)
+    out: Optional[np.ndarray] = None
+    filled = 0
+    failures: List[str] = []
+
+    for line in lines:
+        if not line:
+            continue
+        result: Dict[str, Any] = json.loads(line)
+        response = result.get("response") or {}
+        if result.get("error") or response.get("status_code") != 200:
+            failures.append(f"{result.get('custom_id')}: {result.get('error') or response.get('body')}")
+            continue
+
+        first = int(result["custom_id"].split("-")[1])
+        for item in response["body"]["data"]:
+            vector = embedding_model._decode(item["embedding"])
+            if out is None:
+                out = np.empty((n_pieces, len(vector)), dtype=np.float32)
+            out[first + item["index"]] = vector
+            filled += 1
+
+    if failures or filled != n_pieces:
+        detail = failures[0] if failures else f"{n_pieces - filled} embeddings missing"
+        raise RuntimeError(
+            f"Batch {batch_file.batch_id} ({batch_file.path}) incomplete: "
+            f"{len(failures)} failed requests; {detail}"
+        )
+    return embedding_model._combine(out, plan)
+
+
+def run_batch_embedding(
+    embedding_model,
+    list_of_text: List[str],
+    directory: str,
+    transport: BatchTransport,
+    poll_interval: float = 60.0,
+    timeout: Optional[float] = None,
+) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Write, submit and poll batch files, yielding (first input index,
+    embeddings) for each file as its batch completes.
+
+    Raises:
+        RuntimeError: If a batch ends in failed, expired or cancelled
+        TimeoutError: If `timeout` seconds pass before everything finishes
+    """
+    files = write_batch_files(embedding_model, list_of_text, directory)
+    for batch_file in files:
+        batch_file.batch_id = transport.submit(batch_file.path)
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    pending = list(files)
+    while pending:
+        for batch_file in list(pending):
+            status = transport.status(batch_file.batch_id)
+            if status not in TERMINAL_STATUSES:
+                continue
+            pending.remove(batch_file)
+            if status != "completed":
+                raise RuntimeError(f"Batch {batch_file.batch_id} ({batch_file.path}) ended as {status}")
+            yield batch_file.start, decode_batch_results(
+                embedding_model, batch_file, transport.results(batch_file.batch_id)
+            )
+
+        if pending:
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f"{len(pending)} batches still running after {timeout}s")
+            time.sleep(poll_interval)
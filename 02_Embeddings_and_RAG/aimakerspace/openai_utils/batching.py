@@ -0,0 +1,210 @@
+"""
+Token-aware request batching for the embeddings API.
+Texts are sized with a fast local token estimate and packed into requests
+that stay under the per-request token and item limits; inputs longer than
+the per-input limit are split into pieces. MicroBatcher coalesces
+concurrent single-text calls into batched requests.
+"""
+
+import asyncio
+import math
+import re
+from typing import Any, Awaitable, Callable, List, Optional, Set, Tuple
+
+
+# Published limits for the text-embedding-3 / ada-002 models
+MAX_INPUT_TOKENS = 8191
+MAX_REQUEST_TOKENS = 300_000
+MAX_REQUEST_ITEMS = 2048
+
+_PIECE = re.compile(r"\w+|[^\w\s]")
+_WORD = re.compile(r"\S+\s*")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap upper-leaning estimate of the BPE token count.
+
+    Takes the larger of the number of words plus punctuation marks and
+    UTF-8 bytes / 4, which tracks cl100k closely for prose and errs high
+    for code, numbers and non-Latin scripts.
+    """
+    if not text:
+        return 0
+    return max(len(_PIECE.findall(text)), math.ceil(len(text.encode("utf-8")) / 4))
+
+
+def split_by_tokens(text: str, max_tokens: int) -> List[str]:
+    """
+    Split text at whitespace into pieces of at most `max_tokens` estimated
+    tokens. Single words longer than the limit are cut by characters.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return [text]
+
+    pieces, current, current_tokens = [], [], 0
+    for word in _WORD.findall(text):
+        tokens = estimate_tokens(word)
+        if tokens > max_tokens:
+            # Degenerate input (e.g. base64 blobs): hard cut by characters,
+            # which never estimate above one token each
+            step = max_tokens
+            parts = [word[i:i + step] for i in range(0, len(word), step)]
+            if current:
+                pieces.append("".join(current))
+                current, current_tokens = [], 0
+            pieces.extend(parts[:-1])
+            word, tokens = parts[-1], estimate_tokens(parts[-1])
+        if current and current_tokens + tokens > max_tokens:
+            pieces.append("".join(current))
+            current, current_tokens = [], 0
+        current.append(word)
+        current_tokens += tokens
+
+    if current:
+        pieces.append("".join(current))
+    return pieces
+
+
+def dedupe(items: List[str]) -> Tuple[List[str], List[int]]:
+    """
+    Collapse identical items, keeping first-seen order.
+
+    Returns:
+        (unique items, index into the unique items for every original position)
+    """
+    positions = {}
+    inverse = [positions.setdefault(item, len(positions)) for item in items]
+    return list(positions), inverse
+
+
+def pack_batches(token_counts: List[int], max_batch_tokens: int, max_batch_items: int) -> List[List[int]]:
+    """
+    Greedily pack items, in order, into batches under both limits.
+
+    Returns:
+        Lists of item indices, one per request
+    """
+    batches, current, current_tokens = [], [], 0
+    for i, tokens in enumerate(token_counts):
+        if current and (current_tokens + tokens > max_batch_tokens or len(current) >= max_batch_items):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+
+    if current:
+        batches.append(current)
+    return batches
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-item calls into batched calls.
+
+    Items submitted within `max_wait_ms` of the first pending item (or
+    until `max_batch_size` are pending) go out as one call to
+    `process_batch`, and each caller's future is resolved with its own
+    result. When a batch fails, its items are retried one by one so a bad
+    item only fails its own caller; errors that would hit every item
+    alike (see `is_shared_failure`) fail the whole batch at once.
+    """
+
+    def __init__(
+        self,
+        process_batch: Callable[[List[Any]], Awaitable[List[Any]]],
+        max_batch_size: int = 64,
+        max_wait_ms: float = 5.0,
+        validate: Optional[Callable[[Any], None]] = None,
+        is_shared_failure: Optional[Callable[[Exception], bool]] = None,
+    ):
+        """
+        Args:
+            process_batch: Async callable mapping a list of items to results in order
+            max_batch_size: Flush as soon as this many items are pending
+            max_wait_ms: Longest an item waits for company before flushing
+            validate: Raises for an item that must not join a batch; the
+                error goes to that caller only
+            is_shared_failure: True for batch errors not caused by any one
+                item (rate limits, outages, bad credentials), which are not
+                retried item by item
+        """
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.validate = validate
+        self.is_shared_failure = is_shared_failure
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.statistics = {"calls": 0, "batches": 0, "isolated_batches": 0}
+
+    async def submit(self, item: Any) -> Any:
+        """Queue one item and wait for its result."""
+        if self.validate is not None:
+            self.validate(item)
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Anything pending belonged to a loop that has since gone away
+            self._loop, self._pending, self._timer = loop, [], None
+
+        future = loop.create_future()
+        self._pending.append((item, future))
+        self.statistics["calls"] += 1
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_ms / 1000, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        self.statistics["batches"] += 1
+        task = self._loop.create_task(self._run(batch))
+        # Hold a reference so the task isn't garbage collected mid-flight
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        try:
+            results = await self.process_batch([item for item, _ in batch])
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            if len(batch) == 1 or (self.is_shared_failure is not None and self.is_shared_failure(e)):
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            await self._run_isolated(batch)
+            return
+
+        for (_, future), result in zip(batch, results):
+            # Callers that gave up (cancelled) are skipped
+            if not future.done():
+                future.set_result(result)
+
+    async def _run_isolated(self, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        """Retry a failed batch one item per call, so only bad items fail."""
+        self.statistics["isolated_batches"] += 1
+        pending = [(item, future) for item, future in batch if not future.done()]
+        outcomes = await asyncio.gather(
+            *[self.process_batch([item]) for item, _ in pending], return_exceptions=True
+        )
+        for (_, future), outcome in zip(pending, outcomes):
+            if future.done():
+                continue
+            if isinstance(outcome, BaseException):
+                future.set_exception(outcome)
+            else:
+                future.set_result(outcome[0])
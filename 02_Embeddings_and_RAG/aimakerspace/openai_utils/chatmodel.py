@@ -1,27 +1,296 @@
-from openai import OpenAI
-from dotenv import load_dotenv
-import os
+import asyncio
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
 
-load_dotenv()
+from aimakerspace.openai_utils.batching import estimate_tokens
+from aimakerspace.openai_utils.clients import get_async_client, get_client, pool_settings, resolve_api_key
+from aimakerspace.openai_utils.response_cache import ResponseCache, cache_key
+from aimakerspace.openai_utils.scheduler import RequestScheduler, default_scheduler
+
+
+class StreamStatistics:
+    """Time to first token and generation speed of one streamed completion."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.chunks = 0
+        # Reported by the server in the final chunk (stream_options.include_usage)
+        self.completion_tokens: Optional[int] = None
+
+    def record(self, chunk: Any) -> str:
+        """Account for one ChatCompletionChunk and return its text delta."""
+        if getattr(chunk, "usage", None) is not None:
+            self.completion_tokens = chunk.usage.completion_tokens
+        if not chunk.choices:
+            return ""
+        delta = chunk.choices[0].delta.content or ""
+        if delta:
+            if self.first_token_at is None:
+                self.first_token_at = time.perf_counter()
+            self.chunks += 1
+        return delta
+
+    def finish(self) -> None:
+        self.finished_at = time.perf_counter()
+
+    def as_dict(self) -> Dict[str, Optional[float]]:
+        """
+        Returns:
+            time_to_first_token and duration in seconds, completion_tokens
+            (usage if reported, else content chunks, about one token each)
+            and tokens_per_second after the first token
+        """
+        finished = self.finished_at or time.perf_counter()
+        tokens = self.completion_tokens if self.completion_tokens is not None else self.chunks
+        ttft = None if self.first_token_at is None else self.first_token_at - self.started
+        generating = None if self.first_token_at is None else finished - self.first_token_at
+        return {
+            "time_to_first_token": ttft,
+            "duration": finished - self.started,
+            "completion_tokens": tokens,
+            "tokens_per_second": tokens / generating if generating else None,
+        }
+
+
+class ChatStream:
+    """
+    Text deltas of a streamed completion, requested when iteration starts.
+    `statistics` is filled in as the stream is consumed and `text` holds
+    everything received so far. Iterating again sends a new request and
+    starts both over.
+    """
+
+    def __init__(self, open_stream: Callable[[], Any]):
+        self._open_stream = open_stream
+        self.statistics = StreamStatistics()
+        self._parts = []
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+    def __iter__(self) -> Iterator[str]:
+        self.statistics = StreamStatistics()
+        self._parts = []
+        response = self._open_stream()
+        try:
+            for chunk in response:
+                delta = self.statistics.record(chunk)
+                if delta:
+                    self._parts.append(delta)
+                    yield delta
+        finally:
+            # Also frees the connection when the caller stops early
+            response.close()
+            self.statistics.finish()
+
+
+class AsyncChatStream(ChatStream):
+    """ChatStream for `async for`."""
+
+    def __iter__(self):
+        raise TypeError("AsyncChatStream must be consumed with `async for`")
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        self.statistics = StreamStatistics()
+        self._parts = []
+        response = await self._open_stream()
+        try:
+            async for chunk in response:
+                delta = self.statistics.record(chunk)
+                if delta:
+                    self._parts.append(delta)
+                    yield delta
+        finally:
+            await response.close()
+            self.statistics.finish()
 
 
 class ChatOpenAI:
-    def __init__(self, model_name: str = "gpt-4o-mini"):
+    def __init__(
+        self,
+        model_name: str = "gpt-4o-mini",
+        base_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        scheduler: Optional[RequestScheduler] = None,
+        cache: Optional[ResponseCache] = None,
+    ):
         self.model_name = model_name
-        self.openai_api_key = os.getenv("OPENAI_API_KEY")
-        if self.openai_api_key is None:
-            raise ValueError("OPENAI_API_KEY is not set")
+        # Any OpenAI-compatible endpoint, e.g. benchmarks.openai_stub
+        self.base_url = base_url
+        # Resolved (with .env) on the first request
+        self._openai_api_key = api_key
+        # Rate limits and retries, shared with EmbeddingModel by default
+        self.scheduler = scheduler or default_scheduler()
+        # Opt-in exact-match cache for run/arun (deterministic calls by default)
+        self.cache = cache
 
-    def run(self, messages, text_only: bool = True, **kwargs):
+    @property
+    def openai_api_key(self) -> str:
+        """
+        Raises:
+            ValueError: If no key was given and OPENAI_API_KEY is not set
+        """
+        self._openai_api_key = resolve_api_key(self._openai_api_key)
+        return self._openai_api_key
+
+    @staticmethod
+    def _estimate_tokens(messages, kwargs) -> int:
+        """Prompt tokens plus the completion budget, as counted against TPM limits."""
+        prompt = sum(estimate_tokens(str(message.get("content") or "")) for message in messages)
+        return prompt + (kwargs.get("max_tokens") or kwargs.get("max_completion_tokens") or 0)
+
+    @staticmethod
+    def _check_messages(messages) -> None:
         if not isinstance(messages, list):
             raise ValueError("messages must be a list")
 
-        client = OpenAI()
-        response = client.chat.completions.create(
-            model=self.model_name, messages=messages, **kwargs
+    def _cache_key(self, messages, kwargs) -> Optional[str]:
+        if self.cache is None or not self.cache.accepts(kwargs):
+            return None
+        return cache_key(self.model_name, messages, kwargs, self.base_url)
+
+    @staticmethod
+    def _from_cache(cached: Dict[str, Any], text_only: bool):
+        if text_only:
+            return cached["choices"][0]["message"]["content"]
+        from openai.types.chat import ChatCompletion
+
+        # A fresh object per call, so callers can't alter the cached copy
+        return ChatCompletion.model_validate(cached)
+
+    def run(self, messages, text_only: bool = True, **kwargs):
+        self._check_messages(messages)
+        key = self._cache_key(messages, kwargs)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return self._from_cache(cached, text_only)
+
+        client = get_client(self.openai_api_key, self.base_url)
+        response = self.scheduler.run_sync(
+            lambda: client.chat.completions.create(
+                model=self.model_name, messages=messages, **kwargs
+            ),
+            tokens=self._estimate_tokens(messages, kwargs),
         )
+        if key is not None:
+            self.cache.put(key, response.model_dump())
 
         if text_only:
             return response.choices[0].message.content
 
         return response
+
+    async def arun(self, messages, text_only: bool = True, **kwargs):
+        """Async run, on the pooled async client and the shared scheduler."""
+        self._check_messages(messages)
+        key = self._cache_key(messages, kwargs)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return self._from_cache(cached, text_only)
+
+        response = await self.scheduler.run(
+            lambda: get_async_client(self.openai_api_key, self.base_url).chat.completions.create(
+                model=self.model_name, messages=messages, **kwargs
+            ),
+            tokens=self._estimate_tokens(messages, kwargs),
+        )
+        if key is not None:
+            self.cache.put(key, response.model_dump())
+
+        if text_only:
+            return response.choices[0].message.content
+
+        return response
+
+    async def abatch(
+        self,
+        list_of_messages: List[list],
+        max_concurrency: Optional[int] = None,
+        text_only: bool = True,
+        **kwargs,
+    ) -> List[Any]:
+        """
+        Run many completions concurrently under the shared rate limits.
+
+        Args:
+            list_of_messages: One message list per completion
+            max_concurrency: Most completions this call keeps in flight;
+                defaults to the connection pool size. The scheduler's own
+                max_concurrency and RPM/TPM limits still apply, so give the
+                model a roomier scheduler for large evals
+            text_only: As for run
+            **kwargs: Passed to every completion
+
+        Returns:
+            Results in input order; an item that failed (after the
+            scheduler's retries) holds its exception instead
+        """
+        if max_concurrency is not None and max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        for messages in list_of_messages:
+            self._check_messages(messages)
+
+        # Queueing far more requests than the pool has connections makes
+        # httpcore's request assignment quadratic, so hold the rest back here
+        limit = asyncio.Semaphore(max_concurrency or pool_settings().max_connections)
+
+        async def complete(messages):
+            async with limit:
+                return await self.arun(messages, text_only, **kwargs)
+
+        # One failure doesn't cancel the rest
+        return await asyncio.gather(*[complete(messages) for messages in list_of_messages], return_exceptions=True)
+
+    def _stream_kwargs(self, messages, kwargs) -> Dict[str, Any]:
+        # Ask for usage in the final chunk so tokens/sec uses real token counts
+        return {
+            "model": self.model_name,
+            "messages": messages,
+            "stream": True,
+            "stream_options": {"include_usage": True},
+            **kwargs,
+        }
+
+    def stream(self, messages, **kwargs) -> ChatStream:
+        """
+        Stream a completion.
+
+        Example:
+            response = llm.stream(messages)
+            for delta in response:
+                print(delta, end="", flush=True)
+            print(response.statistics.as_dict()["time_to_first_token"])
+
+        Returns:
+            ChatStream yielding text deltas as they arrive; the request is
+            sent (and retried, until the first byte) when iteration starts
+        """
+        self._check_messages(messages)
+        request = self._stream_kwargs(messages, kwargs)
+
+        def open_stream():
+            client = get_client(self.openai_api_key, self.base_url)
+            return self.scheduler.run_sync(
+                lambda: client.chat.completions.create(**request),
+                tokens=self._estimate_tokens(messages, kwargs),
+            )
+
+        return ChatStream(open_stream)
+
+    def astream(self, messages, **kwargs) -> AsyncChatStream:
+        """Like stream, consumed with `async for`."""
+        self._check_messages(messages)
+        request = self._stream_kwargs(messages, kwargs)
+
+        def open_stream():
+            return self.scheduler.run(
+                lambda: get_async_client(self.openai_api_key, self.base_url).chat.completions.create(**request),
+                tokens=self._estimate_tokens(messages, kwargs),
+            )
+
+        return AsyncChatStream(open_stream)
@@ -0,0 +1,240 @@
+"""
+Process-wide, lazily created OpenAI clients with shared connection pools.
+Every EmbeddingModel and ChatOpenAI talking to the same endpoint with the
+same key reuses one client (and its keep-alive connections) instead of
+paying for a new pool and TLS handshake per instance or per call.
+openai and httpx are only imported once the first client is built.
+"""
+
+import asyncio
+import functools
+import os
+import threading
+import weakref
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import httpx
+    import openai
+
+
+class PoolSettings:
+    """Connection pool configuration applied to newly created clients."""
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        http2: bool = False,
+    ):
+        """
+        Args:
+            max_connections: Open connections per client
+            max_keepalive_connections: Idle connections kept for reuse
+            keepalive_expiry: Seconds an idle connection is kept
+            http2: Negotiate HTTP/2 (requires the `h2` package)
+        """
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = http2
+
+    def limits(self) -> "httpx.Limits":
+        import httpx
+
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+
+class _PoolCounters:
+    """Request counters shared by a client's transport."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.requests = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+
+    def started(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+            self.requests += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def finished(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+
+@functools.lru_cache(maxsize=None)
+def _transport_classes() -> Tuple[type, type]:
+    """Counting sync and async transports, defined on first use to keep httpx out of import time."""
+    import httpx
+
+    class _CountingTransport(httpx.HTTPTransport):
+        def __init__(self, counters: _PoolCounters, **kwargs: Any):
+            super().__init__(**kwargs)
+            self.counters = counters
+
+        def handle_request(self, request: httpx.Request) -> httpx.Response:
+            self.counters.started()
+            try:
+                return super().handle_request(request)
+            finally:
+                self.counters.finished()
+
+    class _AsyncCountingTransport(httpx.AsyncHTTPTransport):
+        def __init__(self, counters: _PoolCounters, **kwargs: Any):
+            super().__init__(**kwargs)
+            self.counters = counters
+
+        async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+            self.counters.started()
+            try:
+                return await super().handle_async_request(request)
+            finally:
+                self.counters.finished()
+
+    return _CountingTransport, _AsyncCountingTransport
+
+
+class _PooledClient:
+    """An OpenAI client together with its counting transport."""
+
+    def __init__(self, client: Any, transport: Any, base_url: Optional[str], kind: str):
+        self.client = client
+        self.transport = transport
+        self.base_url = base_url
+        self.kind = kind
+
+    def statistics(self, settings: PoolSettings) -> Dict[str, Any]:
+        counters = self.transport.counters
+        # httpcore's pool is the only place connection state lives
+        connections = list(getattr(getattr(self.transport, "_pool", None), "connections", []))
+        idle = sum(1 for connection in connections if connection.is_idle())
+        busy = len(connections) - idle
+        return {
+            "kind": self.kind,
+            "base_url": self.base_url or str(self.client.base_url),
+            "requests": counters.requests,
+            "in_flight": counters.in_flight,
+            "peak_in_flight": counters.peak_in_flight,
+            "connections": len(connections),
+            "idle_connections": idle,
+            "max_connections": settings.max_connections,
+            "utilization": busy / settings.max_connections if settings.max_connections else 0.0,
+        }
+
+
+_settings = PoolSettings()
+_lock = threading.Lock()
+_sync_clients: Dict[Tuple[Optional[str], Optional[str]], _PooledClient] = {}
+# Async connections are bound to the event loop that opened them
+_async_clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_dotenv_loaded = False
+
+
+def _prune_closed_loops() -> None:
+    # The clients reference their loop, so weak keys alone never let go
+    for loop in [loop for loop in _async_clients if loop.is_closed()]:
+        del _async_clients[loop]
+
+
+def resolve_api_key(api_key: Optional[str] = None) -> str:
+    """
+    `api_key`, or else OPENAI_API_KEY from the environment or a .env file.
+
+    Raises:
+        ValueError: If no key is configured
+    """
+    global _dotenv_loaded
+    if api_key:
+        return api_key
+    if not _dotenv_loaded:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        _dotenv_loaded = True
+    api_key = os.getenv("OPENAI_API_KEY")
+    if api_key is None:
+        raise ValueError(
+            "OPENAI_API_KEY environment variable is not set. Please set it to your OpenAI API key."
+        )
+    return api_key
+
+
+def configure_clients(**settings: Any) -> PoolSettings:
+    """
+    Change pool settings (see PoolSettings) for clients created from now on.
+    Existing clients are dropped from the registry so the next request
+    picks up the change. They are not closed: other threads may still have
+    requests (or unread streamed responses) on them, and their connections
+    are released once the last reference goes away.
+    """
+    global _settings
+    with _lock:
+        _settings = PoolSettings(**{**vars(_settings), **settings})
+        _sync_clients.clear()
+        _async_clients.clear()
+        return _settings
+
+
+def pool_settings() -> PoolSettings:
+    """Settings new clients are created with."""
+    return _settings
+
+
+def get_client(api_key: Optional[str] = None, base_url: Optional[str] = None) -> "openai.OpenAI":
+    """Shared sync client for (api_key, base_url), created on first use."""
+    key = (api_key, base_url)
+    with _lock:
+        if key not in _sync_clients:
+            import openai
+
+            counting_transport, _ = _transport_classes()
+            transport = counting_transport(_PoolCounters(), limits=_settings.limits(), http2=_settings.http2)
+            # Retries are the scheduler's job
+            client = openai.OpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                max_retries=0,
+                http_client=openai.DefaultHttpxClient(transport=transport),
+            )
+            _sync_clients[key] = _PooledClient(client, transport, base_url, "sync")
+        return _sync_clients[key].client
+
+
+def get_async_client(api_key: Optional[str] = None, base_url: Optional[str] = None) -> "openai.AsyncOpenAI":
+    """Shared async client for (api_key, base_url) on the running event loop."""
+    loop = asyncio.get_running_loop()
+    key = (api_key, base_url)
+    with _lock:
+        _prune_closed_loops()
+        clients = _async_clients.setdefault(loop, {})
+        if key not in clients:
+            import openai
+
+            _, counting_transport = _transport_classes()
+            transport = counting_transport(_PoolCounters(), limits=_settings.limits(), http2=_settings.http2)
+            client = openai.AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                max_retries=0,
+                http_client=openai.DefaultAsyncHttpxClient(transport=transport),
+            )
+            clients[key] = _PooledClient(client, transport, base_url, "async")
+        return clients[key].client
+
+
+def pool_statistics() -> List[Dict[str, Any]]:
+    """Requests, in-flight count and connection usage for every live shared client."""
+    with _lock:
+        _prune_closed_loops()
+        pooled = list(_sync_clients.values())
+        for clients in _async_clients.values():
+            pooled.extend(clients.values())
+        return [p.statistics(_settings) for p in pooled]
@@ -1,61 +1,313 @@
-from dotenv import load_dotenv
-from openai import AsyncOpenAI, OpenAI
-import openai
-from typing import List
-import os
+from typing import TYPE_CHECKING, Iterator, List, Optional, Tuple
 import asyncio
+import base64
+import numpy as np
 
+from aimakerspace.embedding_backends import EmbeddingBackend
+from aimakerspace.openai_utils.batching import (
+    MAX_INPUT_TOKENS,
+    MAX_REQUEST_ITEMS,
+    MAX_REQUEST_TOKENS,
+    MicroBatcher,
+    dedupe,
+    estimate_tokens,
+    pack_batches,
+    split_by_tokens,
+)
+from aimakerspace.openai_utils.batch_api import BatchTransport, OpenAIBatchTransport, run_batch_embedding
+from aimakerspace.openai_utils.clients import get_async_client, get_client, resolve_api_key
+from aimakerspace.openai_utils.scheduler import RequestScheduler, default_scheduler, retryable_errors
 
-class EmbeddingModel:
-    def __init__(self, embeddings_model_name: str = "text-embedding-3-small"):
-        load_dotenv()
-        self.openai_api_key = os.getenv("OPENAI_API_KEY")
-        self.async_client = AsyncOpenAI()
-        self.client = OpenAI()
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, OpenAI
+
+# Keep packed requests below the hard limits to absorb estimation error
+_TOKEN_HEADROOM = 0.9
+
+
+class _Plan:
+    """How one embeddings call maps onto API requests."""
+
+    def __init__(self, n_unique: int, inverse: Optional[List[int]]):
+        self.n_unique = n_unique
+        # Original position -> unique row, or None when there were no duplicates
+        self.inverse = inverse
+        self.pieces: List[str] = []
+        self.owners: List[int] = []
+        self.token_counts: List[int] = []
+        self.batches: List[List[int]] = []
+
+
+def _is_shared_failure(error: Exception) -> bool:
+    """Errors that say nothing about a particular input, so retrying inputs one by one won't help."""
+    import openai
+
+    return isinstance(
+        error,
+        retryable_errors() + (openai.AuthenticationError, openai.PermissionDeniedError, openai.NotFoundError),
+    )
+
+
+class EmbeddingModel(EmbeddingBackend):
+    def __init__(
+        self,
+        embeddings_model_name: str = "text-embedding-3-small",
+        dimensions: Optional[int] = None,
+        base_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        max_batch_tokens: int = MAX_REQUEST_TOKENS,
+        max_batch_size: int = MAX_REQUEST_ITEMS,
+        max_input_tokens: int = MAX_INPUT_TOKENS,
+        oversized_inputs: str = "split",
+        scheduler: Optional[RequestScheduler] = None,
+        micro_batch_size: int = 64,
+        micro_batch_wait_ms: float = 5.0,
+    ):
+        """
+        Args:
+            embeddings_model_name: OpenAI embedding model
+            dimensions: Shortened output size (text-embedding-3-* only)
+            base_url: Any OpenAI-compatible endpoint
+            api_key: Overrides OPENAI_API_KEY (read, with .env, on the first request)
+            max_batch_tokens: Per-request token limit used to pack batches
+            max_batch_size: Per-request input limit
+            max_input_tokens: Per-input token limit
+            oversized_inputs: "split" to embed longer inputs in pieces and
+                average them, or "error" to reject them
+            scheduler: Rate limiter / retry policy; shared process-wide by default
+            micro_batch_size: Most concurrent async_get_embedding calls sent
+                as one request; 1 disables micro-batching
+            micro_batch_wait_ms: Longest a call waits for others to batch with
+        """
+        if oversized_inputs not in ("split", "error"):
+            raise ValueError(f"Unknown oversized_inputs policy: {oversized_inputs}. Available policies: split, error")
+
+        # Resolved on first use, so loading and searching a saved store needs no key
+        self._openai_api_key = api_key
+        # Any OpenAI-compatible endpoint, e.g. benchmarks.openai_stub
+        self.base_url = base_url
+        self.scheduler = scheduler or default_scheduler()
 
-        if self.openai_api_key is None:
-            raise ValueError(
-                "OPENAI_API_KEY environment variable is not set. Please set it to your OpenAI API key."
-            )
-        openai.api_key = self.openai_api_key
         self.embeddings_model_name = embeddings_model_name
+        # Shortened output size for models that support it (text-embedding-3-*)
+        self.dimensions = dimensions
+        self.max_batch_tokens = int(max_batch_tokens * _TOKEN_HEADROOM)
+        self.max_batch_size = max_batch_size
+        self.max_input_tokens = int(max_input_tokens * _TOKEN_HEADROOM)
+        self.oversized_inputs = oversized_inputs
+        self.statistics = {"inputs": 0, "unique_inputs": 0}
+        self.micro_batcher = MicroBatcher(
+            self.async_get_embeddings,
+            micro_batch_size,
+            micro_batch_wait_ms,
+            validate=self._check_input,
+            is_shared_failure=_is_shared_failure,
+        )
+
+    @property
+    def openai_api_key(self) -> str:
+        """
+        Raises:
+            ValueError: If no key was given and OPENAI_API_KEY is not set
+        """
+        self._openai_api_key = resolve_api_key(self._openai_api_key)
+        return self._openai_api_key
+
+    @property
+    def client(self) -> "OpenAI":
+        """Process-wide pooled client for this endpoint and key."""
+        return get_client(self.openai_api_key, self.base_url)
+
+    @property
+    def async_client(self) -> "AsyncOpenAI":
+        """Pooled async client for this endpoint and key on the running loop."""
+        return get_async_client(self.openai_api_key, self.base_url)
+
+    def _request_kwargs(self) -> dict:
+        # base64 float32 is ~4x smaller than JSON floats and decodes without Python objects
+        kwargs = {"model": self.embeddings_model_name, "encoding_format": "base64"}
+        if self.dimensions is not None:
+            kwargs["dimensions"] = self.dimensions
+        return kwargs
+
+    def _check_input(self, text: str) -> None:
+        """
+        Reject an input the API would refuse before it is batched with others.
+
+        Raises:
+            ValueError: If the text is empty, or over max_input_tokens and
+                oversized_inputs is "error"
+        """
+        if not text:
+            raise ValueError("Cannot embed an empty string")
+        if self.oversized_inputs == "error":
+            tokens = estimate_tokens(text)
+            if tokens > self.max_input_tokens:
+                raise ValueError(f"Input is about {tokens} tokens, over the {self.max_input_tokens} token limit")
+
+    def _plan(self, list_of_text: List[str]) -> "_Plan":
+        """
+        Collapse duplicate inputs, split oversized ones and pack the pieces
+        into requests.
+
+        Raises:
+            ValueError: If an input is over max_input_tokens and oversized_inputs is "error"
+        """
+        unique_texts, inverse = dedupe(list_of_text)
+        self.statistics["inputs"] += len(list_of_text)
+        self.statistics["unique_inputs"] += len(unique_texts)
+
+        plan = _Plan(len(unique_texts), inverse if len(unique_texts) < len(list_of_text) else None)
+        for i, text in enumerate(unique_texts):
+            tokens = estimate_tokens(text)
+            if tokens <= self.max_input_tokens:
+                parts = [text]
+            elif self.oversized_inputs == "error":
+                raise ValueError(
+                    f"Input {inverse.index(i)} is about {tokens} tokens, over the {self.max_input_tokens} token limit"
+                )
+            else:
+                parts = split_by_tokens(text, self.max_input_tokens)
+            for part in parts:
+                plan.pieces.append(part)
+                plan.owners.append(i)
+                # Every input costs at least one token
+                plan.token_counts.append(max(1, estimate_tokens(part)))
+
+        plan.batches = pack_batches(plan.token_counts, self.max_batch_tokens, self.max_batch_size)
+        return plan
+
+    @staticmethod
+    def _decode(data: str) -> np.ndarray:
+        return np.frombuffer(base64.b64decode(data), dtype="<f4")
+
+    def _fill(self, out: Optional[np.ndarray], rows: List[int], response, n_rows: int) -> np.ndarray:
+        """
+        Decode a response into `rows` of the output matrix, allocating it
+        (float32, n_rows x dim) on first use.
+        """
+        for row, item in zip(rows, sorted(response.data, key=lambda item: item.index)):
+            vector = self._decode(item.embedding)
+            if out is None:
+                out = np.empty((n_rows, len(vector)), dtype=np.float32)
+            out[row] = vector
+        return out
+
+    @staticmethod
+    def _combine(embeddings: np.ndarray, plan: "_Plan") -> np.ndarray:
+        """
+        Fold split inputs back together (token-weighted mean, re-normalized)
+        and fan unique rows back out to every original position.
+        """
+        if len(embeddings) != plan.n_unique:
+            pieces = embeddings * np.asarray(plan.token_counts, dtype=np.float32)[:, None]
+            combined = np.zeros((plan.n_unique, embeddings.shape[1]), dtype=np.float32)
+            np.add.at(combined, plan.owners, pieces)
+            norms = np.linalg.norm(combined, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            embeddings = combined / norms
+
+        if plan.inverse is not None:
+            embeddings = embeddings[plan.inverse]
+        return embeddings
+
+    def get_statistics(self) -> dict:
+        """Cumulative input deduplication and micro-batching counts."""
+        inputs = self.statistics["inputs"]
+        return {
+            **self.statistics,
+            "dedup_ratio": 1 - self.statistics["unique_inputs"] / inputs if inputs else 0.0,
+            "micro_batch_calls": self.micro_batcher.statistics["calls"],
+            "micro_batches": self.micro_batcher.statistics["batches"],
+        }
+
+    async def async_get_embeddings(self, list_of_text: List[str]) -> np.ndarray:
+        """Embed texts into a float32 matrix, one row per input."""
+        if not list_of_text:
+            return np.empty((0, self.dimensions or 0), dtype=np.float32)
+        plan = self._plan(list_of_text)
+        out = None
 
-    async def async_get_embeddings(self, list_of_text: List[str]) -> List[List[float]]:
-        batch_size = 1024
-        batches = [list_of_text[i:i + batch_size] for i in range(0, len(list_of_text), batch_size)]
-        
         async def process_batch(batch):
-            embedding_response = await self.async_client.embeddings.create(
-                input=batch, model=self.embeddings_model_name
+            nonlocal out
+            embedding_response = await self.scheduler.run(
+                lambda: self.async_client.embeddings.create(
+                    input=[plan.pieces[i] for i in batch], **self._request_kwargs()
+                ),
+                tokens=sum(plan.token_counts[i] for i in batch),
             )
-            return [embeddings.embedding for embeddings in embedding_response.data]
-        
-        # Use asyncio.gather to process all batches concurrently
-        results = await asyncio.gather(*[process_batch(batch) for batch in batches])
-        
-        # Flatten the results
-        return [embedding for batch_result in results for embedding in batch_result]
-
-    async def async_get_embedding(self, text: str) -> List[float]:
-        embedding = await self.async_client.embeddings.create(
-            input=text, model=self.embeddings_model_name
-        )
+            out = self._fill(out, batch, embedding_response, len(plan.pieces))
 
-        return embedding.data[0].embedding
+        # Batches run concurrently up to the scheduler's limits, each retried on its own
+        await asyncio.gather(*[process_batch(batch) for batch in plan.batches])
 
-    def get_embeddings(self, list_of_text: List[str]) -> List[List[float]]:
-        embedding_response = self.client.embeddings.create(
-            input=list_of_text, model=self.embeddings_model_name
+        return self._combine(out, plan)
+
+    async def async_get_embedding(self, text: str) -> np.ndarray:
+        # Concurrent callers share one request; oversized texts are split there too
+        if self.micro_batcher.max_batch_size > 1 or estimate_tokens(text) > self.max_input_tokens:
+            return await self.micro_batcher.submit(text)
+
+        embedding = await self.scheduler.run(
+            lambda: self.async_client.embeddings.create(input=text, **self._request_kwargs()),
+            tokens=estimate_tokens(text),
         )
 
-        return [embeddings.embedding for embeddings in embedding_response.data]
+        return self._decode(embedding.data[0].embedding)
+
+    def get_embeddings(self, list_of_text: List[str]) -> np.ndarray:
+        """Embed texts into a float32 matrix, one row per input."""
+        if not list_of_text:
+            return np.empty((0, self.dimensions or 0), dtype=np.float32)
+        plan = self._plan(list_of_text)
+
+        out = None
+        for batch in plan.batches:
+            embedding_response = self.scheduler.run_sync(
+                lambda: self.client.embeddings.create(
+                    input=[plan.pieces[i] for i in batch], **self._request_kwargs()
+                ),
+                tokens=sum(plan.token_counts[i] for i in batch),
+            )
+            out = self._fill(out, batch, embedding_response, len(plan.pieces))
+
+        return self._combine(out, plan)
+
+    def get_embedding(self, text: str) -> np.ndarray:
+        if estimate_tokens(text) > self.max_input_tokens:
+            return self.get_embeddings([text])[0]
 
-    def get_embedding(self, text: str) -> List[float]:
-        embedding = self.client.embeddings.create(
-            input=text, model=self.embeddings_model_name
+        embedding = self.scheduler.run_sync(
+            lambda: self.client.embeddings.create(input=text, **self._request_kwargs()),
+            tokens=estimate_tokens(text),
         )
 
-        return embedding.data[0].embedding
+        return self._decode(embedding.data[0].embedding)
+
+    def batch_embed(
+        self,
+        list_of_text: List[str],
+        directory: str,
+        transport: Optional[BatchTransport] = None,
+        poll_interval: float = 60.0,
+        timeout: Optional[float] = None,
+    ) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Embed through the Batch API: cheaper, but completes within hours.
+
+        Args:
+            list_of_text: Texts to embed
+            directory: Where request files are written
+            transport: Defaults to the real Batch API on the shared client
+            poll_interval: Seconds between status polls
+            timeout: Give up after this many seconds
+
+        Returns:
+            Iterator of (first input index, float32 embeddings) per request
+            file, in completion order
+        """
+        transport = transport or OpenAIBatchTransport(self.client)
+        return run_batch_embedding(self, list_of_text, directory, transport, poll_interval, timeout)
 
 
 if __name__ == "__main__":
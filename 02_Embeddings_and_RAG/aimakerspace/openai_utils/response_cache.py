@@ -0,0 +1,147 @@
+"""
+Exact-match cache for chat completions.
+Responses are keyed by a stable hash of the model, messages and request
+kwargs, kept in an in-memory LRU and optionally persisted one JSON file
+per key, so repeated deterministic calls across runs and batch jobs are
+answered without a request.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from aimakerspace.persistence import write_json_atomic
+
+
+# Request options that don't change the completion
+_IGNORED_KWARGS = ("timeout", "extra_headers")
+
+
+def cache_key(model: str, messages: list, kwargs: Dict[str, Any], base_url: Optional[str] = None) -> str:
+    """
+    Stable SHA-256 of everything that determines a completion, including
+    the endpoint, so a stub or local server never answers for the real API.
+    """
+    request = {
+        "base_url": base_url,
+        "model": model,
+        "messages": messages,
+        **{name: value for name, value in kwargs.items() if name not in _IGNORED_KWARGS},
+    }
+    encoded = json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=repr)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def is_deterministic(kwargs: Dict[str, Any]) -> bool:
+    """True for greedy, single-choice requests (temperature 0)."""
+    return kwargs.get("temperature") == 0 and kwargs.get("n", 1) == 1 and not kwargs.get("stream")
+
+
+class ResponseCache:
+    """
+    Two-tier completion cache: an in-memory LRU in front of an optional
+    directory of JSON files that survives restarts and is shared by
+    processes pointing at the same directory.
+
+    Example:
+        llm = ChatOpenAI(cache=ResponseCache(directory=".cache/completions"))
+        llm.run(messages, temperature=0)   # request
+        llm.run(messages, temperature=0)   # cached
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        directory: Optional[str] = None,
+        deterministic_only: bool = True,
+    ):
+        """
+        Args:
+            max_entries: Responses kept in memory
+            directory: Where the on-disk tier lives; None for memory only
+            deterministic_only: Only cache temperature-0, single-choice
+                requests; sampled completions are meant to vary
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.directory = directory
+        self.deterministic_only = deterministic_only
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.statistics = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def accepts(self, kwargs: Dict[str, Any]) -> bool:
+        # A stream is consumed by the caller, so there is no response to store
+        if kwargs.get("stream"):
+            return False
+        return not self.deterministic_only or is_deterministic(kwargs)
+
+    def _path(self, key: str) -> str:
+        # Two-level fan-out keeps directories small
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _remember(self, key: str, response: Dict[str, Any]) -> None:
+        """Put a response in the memory tier; the caller holds the lock."""
+        self._memory[key] = response
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """The cached response as a dict (ChatCompletion.model_dump()), or None."""
+        with self._lock:
+            response = self._memory.get(key)
+            if response is not None:
+                self._memory.move_to_end(key)
+                self.statistics["memory_hits"] += 1
+                return response
+
+        if self.directory is not None:
+            try:
+                with open(self._path(key)) as f:
+                    response = json.load(f)
+            except (OSError, ValueError):
+                # Missing, or a torn file from another writer: treat as a miss
+                response = None
+            if response is not None:
+                with self._lock:
+                    self._remember(key, response)
+                    self.statistics["disk_hits"] += 1
+                return response
+
+        with self._lock:
+            self.statistics["misses"] += 1
+        return None
+
+    def put(self, key: str, response: Dict[str, Any]) -> None:
+        with self._lock:
+            self._remember(key, response)
+            self.statistics["stores"] += 1
+        if self.directory is not None:
+            os.makedirs(os.path.dirname(self._path(key)), exist_ok=True)
+            write_json_atomic(self._path(key), response)
+
+    def clear(self, disk: bool = False) -> None:
+        """Empty the memory tier, and the on-disk tier too if `disk`."""
+        with self._lock:
+            self._memory.clear()
+        if disk and self.directory is not None:
+            for root, _, files in os.walk(self.directory):
+                for name in files:
+                    if name.endswith(".json"):
+                        os.remove(os.path.join(root, name))
+
+    def get_statistics(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.statistics)
+            stats["memory_entries"] = len(self._memory)
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        lookups = hits + stats["misses"]
+        stats["hit_rate"] = hits / lookups if lookups else 0.0
+        return stats
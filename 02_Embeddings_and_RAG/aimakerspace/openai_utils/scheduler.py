@@ -0,0 +1,219 @@
+"""
+Rate-limit-aware request scheduling for OpenAI calls.
+A RequestScheduler combines requests-per-minute and tokens-per-minute
+token buckets, a concurrency cap and jittered exponential backoff that
+honours Retry-After. EmbeddingModel and ChatOpenAI share one by default.
+"""
+
+import asyncio
+import random
+import threading
+import time
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+
+T = TypeVar("T")
+
+
+def retryable_errors() -> Tuple[type, ...]:
+    """Errors worth retrying: 429s, 5xx and transport failures (including timeouts)."""
+    # Imported here so the scheduler loads without openai; any error from a
+    # request means openai is already imported
+    import openai
+
+    return (openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError)
+
+
+def __getattr__(name: str) -> Any:
+    if name == "RETRYABLE_ERRORS":
+        return retryable_errors()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at `per_minute / 60` per second.
+
+    Callers reserve capacity up front and are told how long to wait before
+    using it, so waiting requests queue up fairly instead of polling.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        """
+        Args:
+            per_minute: Sustained rate
+            capacity: Burst size; defaults to one minute's worth
+        """
+        if per_minute <= 0:
+            raise ValueError("per_minute must be positive")
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` (going into debt if needed) and return seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # A single request bigger than the burst size could otherwise never run
+            self._tokens -= min(amount, self.capacity)
+            return max(0.0, -self._tokens / self.rate)
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Server-requested delay from Retry-After / retry-after-ms headers, if any."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:
+        # HTTP-date form; fall back to our own backoff
+        return None
+    return None
+
+
+class RequestScheduler:
+    """
+    Shared gate for API requests.
+
+    Every request reserves one request and its estimated tokens from the
+    RPM/TPM buckets, runs under the concurrency cap and is retried on
+    rate-limit, server and connection errors with full-jitter exponential
+    backoff (or exactly the server's Retry-After when given). Each request
+    is retried on its own, so one failing batch doesn't sink a whole build.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        max_concurrency: int = 8,
+        max_retries: int = 5,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+    ):
+        """
+        Args:
+            requests_per_minute: RPM limit, or None for unlimited
+            tokens_per_minute: TPM limit, or None for unlimited
+            max_concurrency: Requests in flight at once (per event loop for
+                async calls, across threads for sync calls)
+            max_retries: Retries per request before the error is raised
+            base_delay: First backoff delay in seconds
+            max_delay: Backoff ceiling in seconds
+        """
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._thread_semaphore = threading.BoundedSemaphore(max_concurrency)
+        # asyncio primitives belong to one loop, so keep one semaphore per loop
+        self._loop_semaphores: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self._stats_lock = threading.Lock()
+        self.statistics = {"requests": 0, "retries": 0, "rate_limited": 0, "failures": 0, "throttled_seconds": 0.0}
+
+    def _record(self, **increments: float) -> None:
+        with self._stats_lock:
+            for name, value in increments.items():
+                self.statistics[name] += value
+
+    def _reserve(self, tokens: int) -> float:
+        wait = 0.0
+        if self.requests:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens and tokens:
+            wait = max(wait, self.tokens.reserve(tokens))
+        if wait:
+            self._record(throttled_seconds=wait)
+        return wait
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if loop not in self._loop_semaphores:
+            self._loop_semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return self._loop_semaphores[loop]
+
+    def _backoff(self, error: Exception, attempt: int) -> Optional[float]:
+        """Delay before the next attempt, or None if the error should be raised."""
+        errors = retryable_errors()
+        if not isinstance(error, errors) or attempt >= self.max_retries:
+            self._record(failures=1)
+            return None
+        if isinstance(error, errors[0]):  # RateLimitError
+            self._record(rate_limited=1)
+        self._record(retries=1)
+
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def run(self, request: Callable[[], Awaitable[T]], tokens: int = 0) -> T:
+        """
+        Run an async request under the limits, retrying as needed.
+
+        Args:
+            request: Zero-argument callable returning a fresh awaitable per attempt
+            tokens: Estimated tokens the request consumes
+
+        Raises:
+            The last error once retries are exhausted, or any non-retryable error
+        """
+        attempt = 0
+        while True:
+            await asyncio.sleep(self._reserve(tokens))
+            async with self._semaphore():
+                self._record(requests=1)
+                try:
+                    return await request()
+                except Exception as e:
+                    delay = self._backoff(e, attempt)
+                    if delay is None:
+                        raise
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def run_sync(self, request: Callable[[], T], tokens: int = 0) -> T:
+        """Blocking counterpart of run()."""
+        attempt = 0
+        while True:
+            time.sleep(self._reserve(tokens))
+            with self._thread_semaphore:
+                self._record(requests=1)
+                try:
+                    return request()
+                except Exception as e:
+                    delay = self._backoff(e, attempt)
+                    if delay is None:
+                        raise
+            time.sleep(delay)
+            attempt += 1
+
+    def get_statistics(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return dict(self.statistics)
+
+
+_default_scheduler: Optional[RequestScheduler] = None
+_default_lock = threading.Lock()
+
+
+def default_scheduler() -> RequestScheduler:
+    """Process-wide scheduler shared by clients that aren't given their own."""
+    global _default_scheduler
+    with _default_lock:
+        if _default_scheduler is None:
+            _default_scheduler = RequestScheduler()
+        return _default_scheduler
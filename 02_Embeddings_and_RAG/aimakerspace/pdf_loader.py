@@ -1,7 +1,6 @@
 """PDF document loader for RAG system"""
 import os
 from typing import List
-from pypdf import PdfReader
 from .text_utils import TextFileLoader
 
 
@@ -23,6 +22,9 @@ class PDFLoader(TextFileLoader):
     
     def load_pdf_file(self):
         """Load a single PDF file"""
+        # pypdf is only imported when a PDF is actually read
+        from pypdf import PdfReader
+
         try:
             reader = PdfReader(self.path)
             text = ""
@@ -41,6 +43,8 @@ class PDFLoader(TextFileLoader):
             
     def load_directory(self):
         """Load all PDF files from a directory"""
+        from pypdf import PdfReader
+
         for root, _, files in os.walk(self.path):
             for file in files:
                 if file.lower().endswith(".pdf"):
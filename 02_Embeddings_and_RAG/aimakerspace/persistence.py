@@ -0,0 +1,91 @@
+"""
+Binary persistence for the vector databases.
+A store is a directory holding `vectors.npy` (one float32 row per key, in
+key order) and `index.json` (keys plus whatever else the database needs).
+Vectors are memory-mapped on load, so opening a large store is cheap.
+"""
+
+import json
+import os
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+
+VECTORS_FILE = "vectors.npy"
+INDEX_FILE = "index.json"
+FORMAT_VERSION = 1
+
+
+def create_vectors(directory: str, n_rows: int, dim: int) -> np.memmap:
+    """
+    Allocate the on-disk float32 matrix for a store, to be filled row by row
+    and then published with commit_vectors. It is written beside the live
+    `vectors.npy`, which a loaded store may still be memory-mapping.
+    """
+    os.makedirs(directory, exist_ok=True)
+    return np.lib.format.open_memmap(
+        os.path.join(directory, f"{VECTORS_FILE}.tmp"), mode="w+", dtype=np.float32, shape=(n_rows, dim)
+    )
+
+
+def commit_vectors(directory: str, matrix: np.memmap) -> None:
+    """Flush a matrix from create_vectors and atomically replace the store's `vectors.npy` with it."""
+    matrix.flush()
+    tmp = matrix.filename
+    del matrix
+    with open(tmp, "rb+") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(directory, VECTORS_FILE))
+
+
+def write_json_atomic(path: str, data: Dict[str, Any]) -> None:
+    """Write JSON so readers see either the old file or the new one, never half of one."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def write_index(directory: str, index: Dict[str, Any]) -> None:
+    write_json_atomic(os.path.join(directory, INDEX_FILE), {"format_version": FORMAT_VERSION, **index})
+
+
+def write_store(directory: str, vectors: Dict[str, np.ndarray], index: Dict[str, Any]) -> None:
+    """
+    Write a store from a key -> vector mapping.
+
+    Raises:
+        ValueError: If the vectors don't all have the same length
+    """
+    keys = list(vectors)
+    dims = {len(vectors[key]) for key in keys}
+    if len(dims) > 1:
+        raise ValueError(f"Binary persistence needs equal-length vectors, found lengths {sorted(dims)}")
+
+    matrix = create_vectors(directory, len(keys), dims.pop() if dims else 0)
+    for row, key in enumerate(keys):
+        matrix[row] = vectors[key]
+    commit_vectors(directory, matrix)
+    write_index(directory, {**index, "keys": keys})
+
+
+def read_store(directory: str, mmap: bool = True) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """
+    Read a store.
+
+    Returns:
+        (vectors matrix, index dict); the matrix is read-only and memory-mapped if `mmap`
+
+    Raises:
+        ValueError: If the store was written by a newer format version
+    """
+    with open(os.path.join(directory, INDEX_FILE)) as f:
+        index = json.load(f)
+    if index.get("format_version", 1) > FORMAT_VERSION:
+        raise ValueError(f"Unsupported store format version: {index['format_version']}")
+
+    vectors = np.load(os.path.join(directory, VECTORS_FILE), mmap_mode="r" if mmap else None)
+    return vectors, index
@@ -0,0 +1,227 @@
+"""
+Semantic answer cache for RAG pipelines.
+Questions are embedded into a dedicated VectorDatabase; a new question
+close enough to a cached one gets the cached answer instead of a
+retrieval + LLM round trip. Entries expire after a TTL, the least
+recently used are evicted past a size limit, and everything is dropped
+when the watched document database changes.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from aimakerspace.embedding_jobs import corpus_fingerprint
+from aimakerspace.vectordatabase import VectorDatabase
+
+
+# Cached questions checked per lookup, most similar first
+_LOOKUP_CANDIDATES = 4
+
+
+class CacheEntry:
+    """A cached answer and what it cost to produce."""
+
+    def __init__(self, question: str, answer: Any, latency: float, created: float):
+        self.question = question
+        self.answer = answer
+        # Seconds the original answer took; saved again on every hit
+        self.latency = latency
+        self.created = created
+        self.hits = 0
+
+
+class SemanticCache:
+    """
+    Answer cache keyed by question meaning rather than exact text.
+
+    Example:
+        cache = SemanticCache(EmbeddingModel(), similarity_threshold=0.92, documents=vector_db)
+        answer = cache.answer(question, pipeline.query)
+        print(cache.get_statistics()["hit_rate"])
+    """
+
+    def __init__(
+        self,
+        embedding_model=None,
+        similarity_threshold: float = 0.92,
+        ttl_seconds: Optional[float] = 3600.0,
+        max_entries: int = 1000,
+        documents=None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            embedding_model: Embeds questions; EmbeddingModel by default
+            similarity_threshold: Cosine similarity a cached question needs to count as a hit
+            ttl_seconds: Entry lifetime; None keeps entries until evicted
+            max_entries: Entries kept before least recently used ones are evicted
+            documents: Vector database the answers come from; any change to its
+                keys invalidates the whole cache
+            clock: Time source for TTLs
+        """
+        if not 0.0 < similarity_threshold <= 1.0:
+            raise ValueError("similarity_threshold must be in (0, 1]")
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+
+        self.questions = VectorDatabase(embedding_model)
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.documents = documents
+        self.clock = clock
+        # Question -> entry, least recently used first
+        self.entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._documents_version: Optional[int] = None
+        self._documents_fingerprint: Optional[str] = None
+        self._last_embedding: Optional[Tuple[str, np.ndarray]] = None
+        self.statistics = {
+            "lookups": 0,
+            "hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "evicted": 0,
+            "invalidated": 0,
+            "saved_seconds": 0.0,
+        }
+
+    def _embed(self, question: str) -> np.ndarray:
+        # lookup then store for the same question embeds it once
+        last = self._last_embedding
+        if last is not None and last[0] == question:
+            return last[1]
+        vector = np.asarray(self.questions.embedding_model.get_embedding(question), dtype=np.float32)
+        self._last_embedding = (question, vector)
+        return vector
+
+    def embed(self, questions: List[str]) -> np.ndarray:
+        """
+        Embed several questions in one call, one row each, to pass to
+        lookup and store as `vector`.
+        """
+        return np.asarray(self.questions.embedding_model.get_embeddings(questions), dtype=np.float32)
+
+    def _remove(self, question: str) -> None:
+        """Drop one entry; the caller holds the lock."""
+        self.entries.pop(question, None)
+        self.questions.delete(question)
+
+    def _check_documents(self) -> None:
+        """Clear the cache if the watched document set changed since the last check."""
+        if self.documents is None:
+            return
+        snapshot = self.documents.snapshot()
+        if snapshot.version == self._documents_version:
+            return
+
+        fingerprint = corpus_fingerprint(sorted(snapshot.vectors))
+        with self._lock:
+            if self._documents_fingerprint is not None and fingerprint != self._documents_fingerprint:
+                self.statistics["invalidated"] += len(self.entries)
+                for question in list(self.entries):
+                    self._remove(question)
+            self._documents_version = snapshot.version
+            self._documents_fingerprint = fingerprint
+
+    def _expired(self, entry: CacheEntry, now: float) -> bool:
+        return self.ttl_seconds is not None and now - entry.created > self.ttl_seconds
+
+    def lookup(self, question: str, vector: Optional[np.ndarray] = None) -> Optional[CacheEntry]:
+        """
+        Args:
+            question: Question text
+            vector: Its embedding, if already computed (see embed)
+
+        Returns:
+            The entry for the most similar cached question at or above the
+            threshold, or None on a miss
+        """
+        self._check_documents()
+        if vector is None:
+            vector = self._embed(question)
+        # A few neighbours, so an expired nearest entry doesn't hide a valid one behind it
+        results = self.questions.search(vector, k=_LOOKUP_CANDIDATES)
+        now = self.clock()
+
+        with self._lock:
+            self.statistics["lookups"] += 1
+            entry = None
+            for key, score in results:
+                if score < self.similarity_threshold:
+                    break
+                candidate = self.entries.get(key)
+                if candidate is None:
+                    continue
+                if self._expired(candidate, now):
+                    self.statistics["expired"] += 1
+                    self._remove(candidate.question)
+                    continue
+                entry = candidate
+                break
+            if entry is None:
+                self.statistics["misses"] += 1
+                return None
+
+            self.entries.move_to_end(entry.question)
+            entry.hits += 1
+            self.statistics["hits"] += 1
+            self.statistics["saved_seconds"] += entry.latency
+            return entry
+
+    def store(
+        self,
+        question: str,
+        answer: Any,
+        latency: float = 0.0,
+        vector: Optional[np.ndarray] = None,
+    ) -> CacheEntry:
+        """
+        Cache an answer, evicting least recently used entries past max_entries.
+        Pass the question's `vector` if already computed (see embed).
+        """
+        self._check_documents()
+        if vector is None:
+            vector = self._embed(question)
+        entry = CacheEntry(question, answer, latency, self.clock())
+
+        with self._lock:
+            self.entries[question] = entry
+            self.entries.move_to_end(question)
+            self.questions.insert(question, vector)
+            while len(self.entries) > self.max_entries:
+                oldest = next(iter(self.entries))
+                self._remove(oldest)
+                self.statistics["evicted"] += 1
+        return entry
+
+    def answer(self, question: str, generate: Callable[[str], Any]) -> Any:
+        """Cached answer for `question`, or `generate(question)` timed and cached."""
+        entry = self.lookup(question)
+        if entry is not None:
+            return entry.answer
+
+        started = time.perf_counter()
+        answer = generate(question)
+        self.store(question, answer, time.perf_counter() - started)
+        return answer
+
+    def clear(self) -> None:
+        with self._lock:
+            self.statistics["invalidated"] += len(self.entries)
+            for question in list(self.entries):
+                self._remove(question)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Counters plus hit rate and mean LLM latency saved per hit."""
+        with self._lock:
+            stats = dict(self.statistics)
+            stats["entries"] = len(self.entries)
+        lookups = stats["lookups"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        stats["mean_saved_seconds"] = stats["saved_seconds"] / stats["hits"] if stats["hits"] else 0.0
+        return stats
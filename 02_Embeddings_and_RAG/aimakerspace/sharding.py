@@ -0,0 +1,385 @@
+"""
+Scatter-gather sharding for EnhancedVectorDatabase.
+A coordinator partitions a database into N shard index files, serves each
+from a separate worker process over a multiprocessing pipe, fans searches
+out to every shard and merges the top-k with a heap. Shards that miss the
+deadline are skipped and the result is marked partial.
+"""
+
+import hashlib
+import heapq
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from aimakerspace.enhanced_vectordatabase import EnhancedVectorDatabase
+
+
+def shard_for_key(key: str, n_shards: int) -> int:
+    """Stable shard placement for a key (independent of PYTHONHASHSEED)."""
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % n_shards
+
+
+class _ShardEmbeddingModel:
+    """Placeholder for shard processes, which only ever search by vector."""
+
+    def get_embedding(self, text: str):
+        raise RuntimeError("Shard servers search by vector; embed queries in the coordinator")
+
+    async def async_get_embeddings(self, list_of_text: List[str]):
+        raise RuntimeError("Shard servers search by vector; embed queries in the coordinator")
+
+
+def partition_database(db: EnhancedVectorDatabase, n_shards: int, directory: str) -> List[str]:
+    """
+    Split a database into shard index files.
+
+    Args:
+        db: Database to partition
+        n_shards: Number of shards
+        directory: Where to write shard_<i>.json files
+
+    Returns:
+        Paths of the written shard files, in shard order
+    """
+    if n_shards < 1:
+        raise ValueError("n_shards must be at least 1")
+    os.makedirs(directory, exist_ok=True)
+
+    snapshot = db.snapshot()
+    placement: List[List[str]] = [[] for _ in range(n_shards)]
+    for key in snapshot.vectors:
+        placement[shard_for_key(key, n_shards)].append(key)
+
+    paths = []
+    for shard_id, keys in enumerate(placement):
+        shard = EnhancedVectorDatabase(_ShardEmbeddingModel(), db.distance_metric_name, db.coarse_dims)
+        shard.insert_many((key, snapshot.vectors[key], snapshot.metadata.get(key)) for key in keys)
+        shard.reducer = db.reducer
+        kept = set(keys)
+        shard.aliases = {alias: target for alias, target in db.aliases.items() if target in kept}
+
+        path = os.path.join(directory, f"shard_{shard_id}.json")
+        shard.save_to_json(path)
+        paths.append(path)
+
+    return paths
+
+
+def _serve_shard(path: str, connection) -> None:
+    """Worker process loop: load one shard file and answer requests."""
+    db = EnhancedVectorDatabase.load_from_json(path, _ShardEmbeddingModel())
+    connection.send({"id": None, "ready": True})
+
+    while True:
+        try:
+            request = connection.recv()
+        except EOFError:
+            return
+
+        op = request.get("op")
+        if op == "shutdown":
+            return
+        try:
+            if op == "search":
+                results = db.search(
+                    np.asarray(request["query"]),
+                    request["k"],
+                    metadata_filter=request.get("metadata_filter"),
+                    coarse_dims=request.get("coarse_dims"),
+                )
+                payload = {"results": [(key, float(score), meta) for key, score, meta in results]}
+            elif op == "stats":
+                payload = {"results": db.get_statistics()}
+            else:
+                payload = {"error": f"Unknown operation: {op}"}
+        except Exception as e:
+            payload = {"error": f"{type(e).__name__}: {e}"}
+
+        payload["id"] = request.get("id")
+        connection.send(payload)
+
+
+class ShardClient:
+    """
+    Coordinator-side handle to one shard worker process.
+
+    Requests are pipelined: any number of threads may have requests in
+    flight on the same shard, and a reader thread matches replies to them
+    by id.
+    """
+
+    def __init__(self, shard_id: int, path: str, context, startup_timeout: float = 60.0):
+        self.shard_id = shard_id
+        self.path = path
+        self._connection, child_connection = context.Pipe()
+        self.process = context.Process(target=_serve_shard, args=(path, child_connection), daemon=True)
+        self.process.start()
+        child_connection.close()
+        self._send_lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        # Request id -> future for its reply
+        self._pending: Dict[int, Future] = {}
+        self._ids = itertools.count()
+
+        if not self._connection.poll(startup_timeout):
+            self.close()
+            raise TimeoutError(f"Shard {shard_id} did not start within {startup_timeout}s")
+        self._connection.recv()
+
+        self._reader = threading.Thread(target=self._read_replies, name=f"shard-{shard_id}-reader", daemon=True)
+        self._reader.start()
+
+    def _read_replies(self) -> None:
+        """Reader thread: resolve each request's future as its reply arrives."""
+        while True:
+            try:
+                reply = self._connection.recv()
+            except (EOFError, OSError):
+                break
+            with self._pending_lock:
+                future = self._pending.pop(reply.get("id"), None)
+            # Replies to requests that timed out have no future any more
+            if future is not None:
+                try:
+                    future.set_result(reply)
+                except InvalidStateError:
+                    pass
+
+        # The worker is gone; fail whatever is still waiting
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            try:
+                future.set_exception(ConnectionError(f"Shard {self.shard_id} connection closed"))
+            except InvalidStateError:
+                pass
+
+    def _forget(self, request_id: int) -> None:
+        with self._pending_lock:
+            self._pending.pop(request_id, None)
+
+    def submit(self, payload: Dict[str, Any]) -> Future:
+        """Send a request without waiting; the future resolves to the raw reply."""
+        future = Future()
+        with self._pending_lock:
+            request_id = next(self._ids)
+            self._pending[request_id] = future
+        # A cancelled (timed-out) request stops being tracked right away
+        future.add_done_callback(lambda _, request_id=request_id: self._forget(request_id))
+        try:
+            with self._send_lock:
+                self._connection.send({**payload, "id": request_id})
+        except (OSError, ValueError) as e:
+            try:
+                future.set_exception(ConnectionError(f"Shard {self.shard_id}: {e}"))
+            except InvalidStateError:
+                pass
+        return future
+
+    def wait(self, future: Future, timeout: float) -> Any:
+        """
+        Wait up to `timeout` seconds for a submitted request.
+
+        Raises:
+            TimeoutError: If no reply arrives in time
+            RuntimeError: If the shard reports an error
+        """
+        try:
+            reply = future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            raise TimeoutError(f"Shard {self.shard_id} timed out after {timeout:.3g}s") from None
+
+        if "error" in reply:
+            raise RuntimeError(f"Shard {self.shard_id}: {reply['error']}")
+        return reply["results"]
+
+    def request(self, payload: Dict[str, Any], timeout: float) -> Any:
+        """Send a request and wait for its reply; raises as `wait`."""
+        return self.wait(self.submit(payload), timeout)
+
+    def close(self) -> None:
+        try:
+            with self._send_lock:
+                self._connection.send({"op": "shutdown"})
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout=5)
+        # The worker's exit ends the reader with EOF
+        reader = getattr(self, "_reader", None)
+        if reader is not None:
+            reader.join(timeout=5)
+        self._connection.close()
+
+
+class ShardedVectorDatabase:
+    """
+    Coordinator for an EnhancedVectorDatabase split across worker processes.
+
+    Exposes search and search_by_text with the same result shape as
+    EnhancedVectorDatabase. Information about the last fan-out (which
+    shards answered, whether the result is partial) is kept in
+    `last_search_info`.
+    """
+
+    def __init__(
+        self,
+        shard_paths: List[str],
+        embedding_model=None,
+        timeout: float = 5.0,
+        start_method: str = "spawn",
+    ):
+        """
+        Args:
+            shard_paths: Shard index files, one worker process each
+            embedding_model: Used to embed queries in search_by_text
+            timeout: Default per-shard deadline in seconds
+            start_method: multiprocessing start method for workers
+        """
+        if not shard_paths:
+            raise ValueError("At least one shard path is required")
+
+        self.embedding_model = embedding_model
+        self.timeout = timeout
+        self._context = multiprocessing.get_context(start_method)
+        self.shards = [ShardClient(i, path, self._context) for i, path in enumerate(shard_paths)]
+        self.last_search_info: Dict[str, Any] = {}
+
+    @classmethod
+    def from_database(
+        cls,
+        db: EnhancedVectorDatabase,
+        n_shards: int,
+        directory: str,
+        **kwargs,
+    ) -> "ShardedVectorDatabase":
+        """Partition `db` into `n_shards` files under `directory` and serve them."""
+        paths = partition_database(db, n_shards, directory)
+        return cls(paths, embedding_model=kwargs.pop("embedding_model", db.embedding_model), **kwargs)
+
+    def _fan_out(self, payload: Dict[str, Any], timeout: float) -> Tuple[List[Any], Dict[int, str]]:
+        # One deadline for the whole fan-out, however long earlier shards took
+        deadline = time.monotonic() + timeout
+        submitted = [(shard, shard.submit(payload)) for shard in self.shards]
+        responses, failures = [], {}
+        for shard, future in submitted:
+            try:
+                responses.append(shard.wait(future, max(0.0, deadline - time.monotonic())))
+            except Exception as e:
+                failures[shard.shard_id] = str(e)
+        return responses, failures
+
+    def search(
+        self,
+        query_vector: np.array,
+        k: int,
+        metadata_filter: Optional[Dict[str, Any]] = None,
+        coarse_dims: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> List[Tuple[str, float, Dict[str, Any]]]:
+        """
+        Search every shard and merge the top-k.
+
+        Shards that time out or fail are left out; see `last_search_info`.
+        """
+        payload = {
+            "op": "search",
+            "query": np.asarray(query_vector).tolist(),
+            "k": k,
+            "metadata_filter": metadata_filter,
+            "coarse_dims": coarse_dims,
+        }
+        responses, failures = self._fan_out(payload, timeout or self.timeout)
+
+        self.last_search_info = {
+            "shards": len(self.shards),
+            "shards_responded": len(responses),
+            "failures": failures,
+            "partial": bool(failures),
+        }
+        return heapq.nlargest(
+            k, itertools.chain.from_iterable(responses), key=lambda result: result[1]
+        )
+
+    def search_by_text(
+        self,
+        query_text: str,
+        k: int,
+        metadata_filter: Optional[Dict[str, Any]] = None,
+        return_as_text: bool = False,
+        timeout: Optional[float] = None,
+    ) -> List[Tuple[str, float, Dict[str, Any]]]:
+        """Embed the query once in the coordinator, then fan out by vector."""
+        if self.embedding_model is None:
+            raise ValueError("search_by_text needs an embedding_model")
+
+        query_vector = self.embedding_model.get_embedding(query_text)
+        results = self.search(query_vector, k, metadata_filter, timeout=timeout)
+
+        if return_as_text:
+            return [(result[0], result[2]) for result in results]
+        return results
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """Per-shard statistics plus totals."""
+        deadline = time.monotonic() + self.timeout
+        submitted = [(shard, shard.submit({"op": "stats"})) for shard in self.shards]
+        per_shard = {}
+        for shard, future in submitted:
+            try:
+                per_shard[shard.shard_id] = shard.wait(future, max(0.0, deadline - time.monotonic()))
+            except Exception as e:
+                per_shard[shard.shard_id] = {"error": str(e)}
+
+        return {
+            "num_shards": len(self.shards),
+            "total_vectors": sum(stats.get("total_vectors", 0) for stats in per_shard.values()),
+            "shard_paths": [shard.path for shard in self.shards],
+            "shards": per_shard,
+        }
+
+    def rebalance(self, n_shards: int, directory: str) -> List[str]:
+        """
+        Re-partition the saved shard files into `n_shards` new files and
+        restart the workers on them.
+
+        Returns:
+            Paths of the new shard files
+        """
+        parts = [
+            EnhancedVectorDatabase.load_from_json(shard.path, _ShardEmbeddingModel())
+            for shard in self.shards
+        ]
+        merged = EnhancedVectorDatabase(_ShardEmbeddingModel(), parts[0].distance_metric_name, parts[0].coarse_dims)
+        merged.reducer = parts[0].reducer
+        for part in parts:
+            snapshot = part.snapshot()
+            merged.insert_many((key, snapshot.vectors[key], snapshot.metadata.get(key)) for key in snapshot.vectors)
+            merged.aliases.update(part.aliases)
+
+        paths = partition_database(merged, n_shards, directory)
+        self.close()
+        self.shards = [ShardClient(i, path, self._context) for i, path in enumerate(paths)]
+        return paths
+
+    def close(self) -> None:
+        """Stop every worker process."""
+        for shard in self.shards:
+            shard.close()
+
+    def __enter__(self) -> "ShardedVectorDatabase":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,175 @@
+"""
+Incrementally maintained metadata statistics.
+Per-field counters and distinct-value sketches are updated on every insert
+and delete, so summary statistics never require a scan of the database.
+"""
+
+import hashlib
+import json
+import sys
+import numpy as np
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+
+def _hashable(value: Any) -> Any:
+    """Map unhashable metadata values (lists, dicts) to a stable string."""
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return json.dumps(value, sort_keys=True, default=str)
+
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct-count sketch.
+    Uses 2**precision one-byte registers; the standard error is about
+    1.04 / sqrt(2**precision), i.e. ~1.6% at the default precision.
+    """
+
+    def __init__(self, precision: int = 12):
+        if not 4 <= precision <= 16:
+            raise ValueError("precision must be between 4 and 16")
+        self.precision = precision
+        self.num_registers = 1 << precision
+        self.registers = np.zeros(self.num_registers, dtype=np.uint8)
+
+    def add(self, value: Any) -> None:
+        digest = hashlib.blake2b(repr(value).encode("utf-8"), digest_size=8).digest()
+        hashed = int.from_bytes(digest, "big")
+        register = hashed >> (64 - self.precision)
+        remaining = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - remaining.bit_length() + 1
+        if rank > self.registers[register]:
+            self.registers[register] = rank
+
+    def count(self) -> int:
+        m = self.num_registers
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+
+        # Small-range correction: linear counting while registers are sparse
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros > 0:
+            estimate = m * np.log(m / zeros)
+
+        return int(round(estimate))
+
+    def memory_bytes(self) -> int:
+        return self.registers.nbytes
+
+
+class FieldStatistics:
+    """
+    Statistics for a single metadata field.
+
+    Distinct values are counted exactly until `exact_limit` is exceeded, then
+    tracked with a HyperLogLog sketch. The exact tier supports deletes; the
+    sketch cannot forget values, so after deletes it is an upper bound.
+    """
+
+    def __init__(self, exact_limit: int = 1000, precision: int = 12):
+        self.count = 0
+        self.exact_limit = exact_limit
+        self.precision = precision
+        self.value_counts: Optional[Counter] = Counter()
+        self.sketch: Optional[HyperLogLog] = None
+
+    @property
+    def is_exact(self) -> bool:
+        return self.sketch is None
+
+    def add(self, value: Any) -> None:
+        self.count += 1
+        value = _hashable(value)
+        if self.sketch is not None:
+            self.sketch.add(value)
+            return
+
+        self.value_counts[value] += 1
+        if len(self.value_counts) > self.exact_limit:
+            # Promote to a sketch and drop the exact counts
+            self.sketch = HyperLogLog(self.precision)
+            for seen in self.value_counts:
+                self.sketch.add(seen)
+            self.value_counts = None
+
+    def remove(self, value: Any) -> None:
+        self.count -= 1
+        if self.sketch is not None:
+            return
+
+        value = _hashable(value)
+        self.value_counts[value] -= 1
+        if self.value_counts[value] <= 0:
+            del self.value_counts[value]
+
+    def distinct(self) -> int:
+        return len(self.value_counts) if self.is_exact else self.sketch.count()
+
+    def values(self) -> Optional[List[Any]]:
+        """Distinct values, or None once the field is tracked by a sketch."""
+        return list(self.value_counts) if self.is_exact else None
+
+    def memory_bytes(self) -> int:
+        if self.is_exact:
+            return sys.getsizeof(self.value_counts) + sum(sys.getsizeof(v) for v in self.value_counts)
+        return self.sketch.memory_bytes()
+
+
+class MetadataStatistics:
+    """Per-field counters and distinct-value sketches over metadata dicts."""
+
+    def __init__(self, exact_limit: int = 1000, precision: int = 12):
+        self.exact_limit = exact_limit
+        self.precision = precision
+        self.fields: Dict[str, FieldStatistics] = {}
+
+    def add(self, metadata: Dict[str, Any]) -> None:
+        for field, value in metadata.items():
+            if field not in self.fields:
+                self.fields[field] = FieldStatistics(self.exact_limit, self.precision)
+            self.fields[field].add(value)
+
+    def remove(self, metadata: Dict[str, Any]) -> None:
+        for field, value in metadata.items():
+            stats = self.fields.get(field)
+            if stats is None:
+                continue
+            stats.remove(value)
+            if stats.count <= 0:
+                del self.fields[field]
+
+    def field_names(self) -> List[str]:
+        return list(self.fields)
+
+    def values(self, field: str) -> Optional[List[Any]]:
+        """Distinct values of a field; None if the field is sketched."""
+        stats = self.fields.get(field)
+        return stats.values() if stats is not None else []
+
+    def distinct(self, field: str) -> int:
+        stats = self.fields.get(field)
+        return stats.distinct() if stats is not None else 0
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Count, distinct count and tracking mode for every field."""
+        return {
+            field: {
+                "count": stats.count,
+                "distinct": stats.distinct(),
+                "exact": stats.is_exact,
+            }
+            for field, stats in self.fields.items()
+        }
+
+    def memory_bytes(self) -> int:
+        return sum(stats.memory_bytes() for stats in self.fields.values())
+
+
+def metadata_nbytes(metadata: Dict[str, Any]) -> int:
+    """Approximate in-memory size of a flat metadata dictionary."""
+    return sys.getsizeof(metadata) + sum(
+        sys.getsizeof(key) + sys.getsizeof(value) for key, value in metadata.items()
+    )
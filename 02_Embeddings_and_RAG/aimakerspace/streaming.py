@@ -0,0 +1,130 @@
+"""
+Streaming, bounded-memory embedding pipeline.
+Chunks are pulled from a sync or async iterable, embedded by a fixed pool
+of workers and handed back batch by batch, so only a bounded number of
+batches is ever held in memory.
+"""
+
+import asyncio
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Tuple, Union, AsyncIterable
+
+
+_DONE = object()
+
+
+async def aiterate(items: Union[Iterable[Any], AsyncIterable[Any]]) -> AsyncIterator[Any]:
+    """Iterate a sync or async iterable uniformly."""
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+class StreamingEmbedder:
+    """
+    Embeds a stream of items with bounded concurrency.
+
+    At most `max_concurrency` batches are queued for embedding, being
+    embedded, and waiting to be consumed respectively, which caps peak
+    memory at roughly 3 * max_concurrency * batch_size items regardless of
+    corpus size.
+    """
+
+    def __init__(self, embedding_model, batch_size: int = 256, max_concurrency: int = 4):
+        """
+        Args:
+            embedding_model: Anything with async_get_embeddings(list_of_text)
+            batch_size: Items per embeddings request
+            max_concurrency: Number of concurrent embedding workers
+        """
+        if batch_size < 1 or max_concurrency < 1:
+            raise ValueError("batch_size and max_concurrency must be positive")
+
+        self.embedding_model = embedding_model
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.statistics: Dict[str, Any] = {}
+
+    async def stream(
+        self,
+        items: Union[Iterable[Any], AsyncIterable[Any]],
+        text_of: Callable[[Any], str] = lambda item: item,
+    ) -> AsyncIterator[Tuple[List[Any], List[List[float]]]]:
+        """
+        Yield (batch_items, embeddings) as batches complete.
+
+        Batches may complete out of input order. Throughput numbers are
+        available in `statistics` once the stream is exhausted.
+
+        Args:
+            items: Sync or async iterable of items to embed
+            text_of: Extracts the text to embed from an item
+        """
+        pending: asyncio.Queue = asyncio.Queue(maxsize=self.max_concurrency)
+        completed: asyncio.Queue = asyncio.Queue(maxsize=self.max_concurrency)
+
+        async def produce():
+            try:
+                batch = []
+                async for item in aiterate(items):
+                    batch.append(item)
+                    if len(batch) == self.batch_size:
+                        await pending.put(batch)
+                        batch = []
+                if batch:
+                    await pending.put(batch)
+                for _ in range(self.max_concurrency):
+                    await pending.put(_DONE)
+            except Exception as e:
+                await completed.put(e)
+
+        async def work():
+            while True:
+                batch = await pending.get()
+                if batch is _DONE:
+                    await completed.put(_DONE)
+                    return
+                try:
+                    embeddings = await self.embedding_model.async_get_embeddings(
+                        [text_of(item) for item in batch]
+                    )
+                except Exception as e:
+                    await completed.put(e)
+                    return
+                await completed.put((batch, embeddings))
+
+        start = time.perf_counter()
+        total_items = total_batches = 0
+        tasks = [asyncio.ensure_future(produce())]
+        tasks += [asyncio.ensure_future(work()) for _ in range(self.max_concurrency)]
+
+        try:
+            finished_workers = 0
+            while finished_workers < self.max_concurrency:
+                result = await completed.get()
+                if result is _DONE:
+                    finished_workers += 1
+                    continue
+                if isinstance(result, Exception):
+                    raise result
+                total_items += len(result[0])
+                total_batches += 1
+                yield result
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+            elapsed = time.perf_counter() - start
+            self.statistics = {
+                "items": total_items,
+                "batches": total_batches,
+                "seconds": elapsed,
+                "items_per_second": total_items / elapsed if elapsed > 0 else 0.0,
+                "batch_size": self.batch_size,
+                "max_concurrency": self.max_concurrency,
+                "max_items_in_memory": 3 * self.max_concurrency * self.batch_size,
+            }
@@ -1,8 +1,14 @@
 import numpy as np
 from collections import defaultdict
-from typing import List, Tuple, Callable
+from typing import List, Tuple, Callable, Optional, Iterable, AsyncIterable, Union, Dict
 from aimakerspace.openai_utils.embedding import EmbeddingModel
+from aimakerspace.deduplication import ChunkDeduplicator
+from aimakerspace.coarse_search import CoarseIndex, coarse_to_fine_search
+from aimakerspace.streaming import StreamingEmbedder
+from aimakerspace.concurrency import DELETED, LayeredMapping, ReadWriteLock, Snapshot
+from aimakerspace.persistence import read_store, write_store
 import asyncio
+import threading
 
 
 def cosine_similarity(vector_a: np.array, vector_b: np.array) -> float:
@@ -14,22 +20,103 @@ def cosine_similarity(vector_a: np.array, vector_b: np.array) -> float:
 
 
 class VectorDatabase:
-    def __init__(self, embedding_model: EmbeddingModel = None):
+    def __init__(
+        self,
+        embedding_model: EmbeddingModel = None,
+        coarse_dims: Optional[int] = None,
+    ):
         self.vectors = defaultdict(np.array)
+        self.aliases = {}
         self.embedding_model = embedding_model or EmbeddingModel()
+        # Prefix length for coarse-to-fine search; None scans full vectors
+        self.coarse_dims = coarse_dims
+        self._coarse_index = None
+        self.build_statistics = {}
+        # Writers mutate self.vectors under the lock, record what they changed
+        # and bump the version; searches read an immutable snapshot
+        # republished once per version from the previous one plus the changes
+        self._lock = ReadWriteLock()
+        self._publish_lock = threading.Lock()
+        self._version = 0
+        self._snapshot = Snapshot(0, LayeredMapping())
+        self._changes = {}
 
     def insert(self, key: str, vector: np.array) -> None:
-        self.vectors[key] = vector
+        with self._lock.write_locked():
+            self.vectors[key] = vector
+            self._changes[key] = vector
+            self._version += 1
+
+    def insert_many(self, items: Iterable[Tuple[str, np.array]]) -> None:
+        """Insert (key, vector) pairs as a single write."""
+        with self._lock.write_locked():
+            for key, vector in items:
+                self.vectors[key] = vector
+                self._changes[key] = vector
+            self._version += 1
+
+    def delete(self, key: str) -> bool:
+        """
+        Remove an entry and any aliases pointing to it.
+
+        Returns:
+            True if the entry existed
+        """
+        with self._lock.write_locked():
+            if key not in self.vectors:
+                return False
+
+            del self.vectors[key]
+            self._changes[key] = DELETED
+            self.aliases = {alias: target for alias, target in self.aliases.items() if target != key}
+            self._version += 1
+            return True
+
+    def snapshot(self) -> Snapshot:
+        """Return a consistent view of the database for lock-free reads."""
+        snapshot = self._snapshot
+        if snapshot.version == self._version:
+            return snapshot
+
+        with self._lock.read_locked(), self._publish_lock:
+            snapshot = self._snapshot
+            if snapshot.version != self._version:
+                snapshot = Snapshot(self._version, snapshot.vectors.with_changes(self._changes, len(self.vectors)))
+                self._changes = {}
+                self._snapshot = snapshot
+        return snapshot
+
+    def _get_coarse_index(self, prefix_dims: int, snapshot: Snapshot) -> CoarseIndex:
+        index = self._coarse_index
+        if index is None or index.prefix_dims != prefix_dims or index.version != snapshot.version:
+            keys = list(snapshot.vectors.keys())
+            index = CoarseIndex(keys, [snapshot.vectors[key] for key in keys], prefix_dims, snapshot.version)
+            self._coarse_index = index
+        return index
 
     def search(
         self,
         query_vector: np.array,
         k: int,
         distance_measure: Callable = cosine_similarity,
+        coarse_dims: Optional[int] = None,
+        shortlist_size: Optional[int] = None,
     ) -> List[Tuple[str, float]]:
+        snapshot = self.snapshot()
+        coarse_dims = coarse_dims or self.coarse_dims
+        if coarse_dims:
+            return coarse_to_fine_search(
+                self._get_coarse_index(coarse_dims, snapshot),
+                snapshot.vectors,
+                query_vector,
+                k,
+                distance_measure,
+                shortlist_size,
+            )
+
         scores = [
             (key, distance_measure(query_vector, vector))
-            for key, vector in self.vectors.items()
+            for key, vector in snapshot.vectors.items()
         ]
         return sorted(scores, key=lambda x: x[1], reverse=True)[:k]
 
@@ -39,20 +126,66 @@ class VectorDatabase:
         k: int,
         distance_measure: Callable = cosine_similarity,
         return_as_text: bool = False,
+        coarse_dims: Optional[int] = None,
     ) -> List[Tuple[str, float]]:
         query_vector = self.embedding_model.get_embedding(query_text)
-        results = self.search(query_vector, k, distance_measure)
+        results = self.search(query_vector, k, distance_measure, coarse_dims)
         return [result[0] for result in results] if return_as_text else results
 
     def retrieve_from_key(self, key: str) -> np.array:
-        return self.vectors.get(key, None)
+        return self.snapshot().vectors.get(self.aliases.get(key, key), None)
+
+    async def abuild_from_list(
+        self,
+        list_of_text: List[str],
+        deduplicator: Optional[ChunkDeduplicator] = None,
+    ) -> "VectorDatabase":
+        if deduplicator is not None:
+            result = deduplicator.deduplicate(list_of_text)
+            self.aliases.update(result.aliases)
+            list_of_text = result.unique_chunks
 
-    async def abuild_from_list(self, list_of_text: List[str]) -> "VectorDatabase":
         embeddings = await self.embedding_model.async_get_embeddings(list_of_text)
-        for text, embedding in zip(list_of_text, embeddings):
-            self.insert(text, np.array(embedding))
+        self.insert_many(
+            (text, np.asarray(embedding, dtype=np.float32)) for text, embedding in zip(list_of_text, embeddings)
+        )
+        return self
+
+    async def abuild_from_iter(
+        self,
+        texts: Union[Iterable[str], AsyncIterable[str]],
+        batch_size: int = 256,
+        max_concurrency: int = 4,
+    ) -> "VectorDatabase":
+        embedder = StreamingEmbedder(self.embedding_model, batch_size, max_concurrency)
+        async for batch, embeddings in embedder.stream(texts):
+            self.insert_many(
+                (text, np.asarray(embedding, dtype=np.float32)) for text, embedding in zip(batch, embeddings)
+            )
+        self.build_statistics = embedder.statistics
         return self
 
+    def save_binary(self, directory: str) -> None:
+        """Save vectors and aliases as a binary store (float32 matrix + JSON index)."""
+        write_store(directory, self.snapshot().vectors, {
+            "aliases": self.aliases,
+            "coarse_dims": self.coarse_dims,
+        })
+
+    @classmethod
+    def load_binary(
+        cls,
+        directory: str,
+        embedding_model: EmbeddingModel = None,
+        mmap: bool = True,
+    ) -> "VectorDatabase":
+        """Load a store written by save_binary or an EmbeddingJob; vectors are memory-mapped by default."""
+        vectors, index = read_store(directory, mmap)
+        db = cls(embedding_model, index.get("coarse_dims"))
+        db.insert_many((key, vectors[row]) for row, key in enumerate(index["keys"]))
+        db.aliases = index.get("aliases", {})
+        return db
+
 
 if __name__ == "__main__":
     list_of_text = [
@@ -0,0 +1 @@
+"""Offline performance benchmarks for the aimakerspace RAG stack."""
@@ -0,0 +1,3 @@
+from benchmarks.vector_search import main
+
+main()
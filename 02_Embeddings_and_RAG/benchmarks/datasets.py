@@ -0,0 +1,156 @@
+"""
+Seeded synthetic corpora for vector search benchmarks.
+Everything is generated locally from a seed, so runs are reproducible and
+need no network access.
+"""
+
+import numpy as np
+from typing import Any, Dict, List, Tuple
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def random_unit_vectors(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    """Uniformly distributed unit vectors (isotropic Gaussian, normalized)."""
+    rng = np.random.RandomState(seed)
+    return _normalize(rng.standard_normal((n, dim)).astype(np.float32))
+
+
+def clustered_unit_vectors(
+    n: int,
+    dim: int,
+    n_clusters: int = 64,
+    spread: float = 0.35,
+    seed: int = 0,
+) -> np.ndarray:
+    """
+    Unit vectors drawn around random cluster centres.
+    Closer to real embedding corpora, where documents bunch by topic.
+    """
+    rng = np.random.RandomState(seed)
+    centres = _normalize(rng.standard_normal((n_clusters, dim)))
+    assignment = rng.randint(0, n_clusters, size=n)
+    noise = rng.standard_normal((n, dim)) * (spread / np.sqrt(dim))
+    return _normalize((centres[assignment] + noise).astype(np.float32))
+
+
+DATASETS = {
+    "random": random_unit_vectors,
+    "clustered": clustered_unit_vectors,
+}
+
+
+def make_dataset(name: str, n: int, dim: int, seed: int = 0) -> np.ndarray:
+    """
+    Generate a corpus by name.
+
+    Raises:
+        ValueError: If the dataset name is not recognized
+    """
+    if name not in DATASETS:
+        available = ", ".join(DATASETS.keys())
+        raise ValueError(f"Unknown dataset: {name}. Available datasets: {available}")
+
+    return DATASETS[name](n, dim, seed=seed)
+
+
+def make_queries(corpus: np.ndarray, n_queries: int, seed: int = 0) -> np.ndarray:
+    """Queries are perturbed corpus rows, so each has real near neighbours."""
+    rng = np.random.RandomState(seed + 1)
+    rows = corpus[rng.randint(0, len(corpus), size=n_queries)]
+    noise = rng.standard_normal(rows.shape).astype(np.float32) * (0.1 / np.sqrt(corpus.shape[1]))
+    return _normalize(rows + noise)
+
+
+def make_metadata(n: int, n_sources: int = 10, seed: int = 0) -> List[Dict[str, Any]]:
+    """Metadata with a `source` field of roughly 1 / n_sources selectivity."""
+    rng = np.random.RandomState(seed + 2)
+    sources = rng.randint(0, n_sources, size=n)
+    return [{"source": f"source_{s}", "chunk_id": i} for i, s in enumerate(sources)]
+
+
+def make_keys(n: int) -> List[str]:
+    return [f"doc_{i}" for i in range(n)]
+
+
+def exact_scores(corpus: np.ndarray, query: np.ndarray, metric: str) -> np.ndarray:
+    """
+    Vectorized scores for every corpus row, matching aimakerspace.distance_metrics
+    (higher is more similar).
+    """
+    corpus = corpus.astype(np.float64)
+    query = query.astype(np.float64)
+
+    if metric == "cosine":
+        norms = np.linalg.norm(corpus, axis=1) * np.linalg.norm(query)
+        norms[norms == 0] = 1.0
+        return corpus @ query / norms
+    if metric == "dot_product":
+        return corpus @ query
+    if metric == "euclidean":
+        return -np.linalg.norm(corpus - query, axis=1)
+    if metric == "manhattan":
+        return -np.abs(corpus - query).sum(axis=1)
+    if metric == "minkowski":
+        return -(np.abs(corpus - query) ** 3).sum(axis=1) ** (1 / 3)
+    if metric == "chebyshev":
+        return -np.abs(corpus - query).max(axis=1)
+    if metric == "correlation":
+        centred = corpus - corpus.mean(axis=1, keepdims=True)
+        q = query - query.mean()
+        norms = np.linalg.norm(centred, axis=1) * np.linalg.norm(q)
+        norms[norms == 0] = 1.0
+        return centred @ q / norms
+    if metric == "jaccard":
+        a = corpus > 0.5
+        b = query > 0.5
+        union = (a | b).sum(axis=1)
+        return np.where(union == 0, 0.0, (a & b).sum(axis=1) / np.maximum(union, 1))
+
+    raise ValueError(f"No exact scorer for metric: {metric}")
+
+
+def ground_truth(
+    corpus: np.ndarray,
+    queries: np.ndarray,
+    k: int,
+    metric: str,
+    mask: np.ndarray = None,
+) -> List[Tuple[float, int]]:
+    """
+    Exact k-th best score and number of eligible rows per query.
+    Recall is measured against the k-th score rather than a list of ids,
+    so ties (common for jaccard on dense vectors) are not penalized.
+    """
+    truth = []
+    for query in queries:
+        scores = exact_scores(corpus, query, metric)
+        if mask is not None:
+            scores = scores[mask]
+        eligible = min(k, len(scores))
+        kth = float(np.partition(-scores, eligible - 1)[eligible - 1] * -1) if eligible else float("inf")
+        truth.append((kth, eligible))
+    return truth
+
+
+def recall_at_k(
+    corpus: np.ndarray,
+    query: np.ndarray,
+    returned_rows: List[int],
+    truth: Tuple[float, int],
+    metric: str,
+    tolerance: float = 1e-5,
+) -> float:
+    """Fraction of the k slots filled with a result as good as the exact k-th best."""
+    kth, eligible = truth
+    if eligible == 0:
+        return 1.0
+    if not returned_rows:
+        return 0.0
+    scores = exact_scores(corpus[returned_rows], query, metric)
+    hits = int(np.sum(scores >= kth - tolerance * max(1.0, abs(kth))))
+    return min(hits, eligible) / eligible
@@ -0,0 +1,279 @@
+"""
+End-to-end ingest and query throughput against the local OpenAI stub.
+
+Starts benchmarks.openai_stub in a background thread, points EmbeddingModel
+and ChatOpenAI at it through base_url, and measures building the vector
+databases from a text corpus, RAG queries (retrieve + generate) and,
+optionally, the course website's Lambda handler.
+
+Usage:
+    python -m benchmarks.end_to_end --latency lognormal:0.05,0.4 --rate-limit-probability 0.02 --output e2e.json
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import platform
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from aimakerspace.text_utils import TextFileLoader, CharacterTextSplitter
+from aimakerspace.vectordatabase import VectorDatabase
+from aimakerspace.enhanced_vectordatabase import EnhancedVectorDatabase
+from aimakerspace.openai_utils.embedding import EmbeddingModel
+from aimakerspace.openai_utils.chatmodel import ChatOpenAI
+from aimakerspace.openai_utils.clients import pool_statistics
+from aimakerspace.openai_utils.prompts import SystemRolePrompt, UserRolePrompt
+from benchmarks.openai_stub import OpenAIStubServer, StubConfig
+from benchmarks.vector_search import latency_summary
+
+
+STUB_API_KEY = "sk-stub"
+
+RAG_SYSTEM_TEMPLATE = """You are a knowledgeable assistant that answers questions based strictly on provided context.
+Only use the provided context. Do not use external knowledge."""
+
+RAG_USER_TEMPLATE = """Context Information:
+{context}
+
+Question: {user_query}
+
+Please provide your answer based solely on the context above."""
+
+QUESTIONS = [
+    "What is the Michael Eisner Memorial Weak Executive Problem?",
+    "What advice does Marc give about hiring executives?",
+    "What are the key points about startups mentioned in the guide?",
+    "How should a startup think about product market fit?",
+]
+
+
+def load_chunks(path: str, max_chunks: Optional[int] = None) -> List[str]:
+    documents = TextFileLoader(path).load_documents()
+    chunks = CharacterTextSplitter().split_texts(documents)
+    return chunks[:max_chunks] if max_chunks else chunks
+
+
+def rag_query(vector_db, llm: ChatOpenAI, question: str, k: int = 3, stream: bool = False) -> Dict[str, float]:
+    """One retrieve-then-generate round trip, timed per stage (plus first token when streaming)."""
+    start = time.perf_counter()
+    # Both databases key vectors by chunk text
+    contexts = [result[0] for result in vector_db.search_by_text(question, k=k)]
+    retrieved = time.perf_counter()
+
+    context_prompt = "\n\n".join(f"[Source {i}]: {text}" for i, text in enumerate(contexts, 1))
+    messages = [
+        SystemRolePrompt(RAG_SYSTEM_TEMPLATE).create_message(),
+        UserRolePrompt(RAG_USER_TEMPLATE).create_message(context=context_prompt, user_query=question),
+    ]
+    timings: Dict[str, float] = {}
+    if stream:
+        response = llm.stream(messages)
+        for _ in response:
+            pass
+        stats = response.statistics.as_dict()
+        timings["first_token"] = retrieved - start + (stats["time_to_first_token"] or 0.0)
+        timings["tokens_per_second"] = stats["tokens_per_second"] or 0.0
+    else:
+        llm.run(messages)
+    finished = time.perf_counter()
+    return {"retrieve": retrieved - start, "generate": finished - retrieved, "total": finished - start, **timings}
+
+
+def run_queries(vector_db, llm: ChatOpenAI, n_queries: int, concurrency: int, stream: bool = False) -> Dict[str, Any]:
+    questions = [QUESTIONS[i % len(QUESTIONS)] for i in range(n_queries)]
+    errors = 0
+    timings = []
+
+    def timed(question):
+        nonlocal errors
+        try:
+            timings.append(rag_query(vector_db, llm, question, stream=stream))
+        except Exception:
+            errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(timed, questions))
+    wall = time.perf_counter() - start
+
+    summary = {
+        "queries": n_queries,
+        "concurrency": concurrency,
+        "errors": errors,
+        "wall_seconds": wall,
+        "throughput_qps": (n_queries - errors) / wall if wall > 0 else 0.0,
+    }
+    if timings:
+        summary["latency"] = latency_summary([t["total"] for t in timings])
+        summary["retrieve_mean_ms"] = float(np.mean([t["retrieve"] for t in timings]) * 1000)
+        summary["generate_mean_ms"] = float(np.mean([t["generate"] for t in timings]) * 1000)
+        if stream:
+            # What a user waits for before anything shows up
+            summary["first_token_latency"] = latency_summary([t["first_token"] for t in timings])
+            summary["tokens_per_second_mean"] = float(np.mean([t["tokens_per_second"] for t in timings]))
+    return summary
+
+
+def run_ingest(database: str, chunks: List[str], embedding_model: EmbeddingModel, streaming: bool):
+    """Build a database from chunks and return it with ingest throughput."""
+    db = VectorDatabase(embedding_model) if database == "VectorDatabase" else EnhancedVectorDatabase(embedding_model)
+
+    start = time.perf_counter()
+    if streaming:
+        asyncio.run(db.abuild_from_iter(chunks))
+    else:
+        asyncio.run(db.abuild_from_list(chunks))
+    seconds = time.perf_counter() - start
+
+    return db, {
+        "database": database,
+        "mode": "abuild_from_iter" if streaming else "abuild_from_list",
+        "chunks": len(chunks),
+        "seconds": seconds,
+        "chunks_per_second": len(chunks) / seconds if seconds > 0 else 0.0,
+    }
+
+
+def run_lambda(handler_path: str, base_url: str, n_requests: int) -> Dict[str, Any]:
+    """Invoke the Lambda handler in-process with its OpenAI client pointed at the stub."""
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ.setdefault("OPENAI_API_KEY", STUB_API_KEY)
+    try:
+        spec = importlib.util.spec_from_file_location("lambda_function", handler_path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    except ImportError as e:
+        return {"skipped": f"Could not import Lambda handler: {e}"}
+
+    latencies, statuses = [], {}
+    for i in range(n_requests):
+        event = {"httpMethod": "POST", "body": json.dumps({"action": "query", "query": QUESTIONS[i % len(QUESTIONS)]})}
+        start = time.perf_counter()
+        response = module.lambda_handler(event, None)
+        latencies.append(time.perf_counter() - start)
+        statuses[response["statusCode"]] = statuses.get(response["statusCode"], 0) + 1
+
+    return {"requests": n_requests, "status_codes": statuses, **latency_summary(latencies)}
+
+
+def run_end_to_end(
+    corpus: str,
+    config: StubConfig,
+    databases: List[str],
+    max_chunks: Optional[int] = None,
+    n_queries: int = 20,
+    concurrency: List[int] = (1, 4),
+    lambda_handler: Optional[str] = None,
+    stream: bool = False,
+    log=print,
+) -> Dict[str, Any]:
+    """
+    Run ingest and query benchmarks against a fresh stub server.
+
+    Returns:
+        JSON-serializable report
+    """
+    chunks = load_chunks(corpus, max_chunks)
+    report: Dict[str, Any] = {"ingest": [], "query": []}
+
+    with OpenAIStubServer(config) as server:
+        log(f"Stub listening on {server.base_url}; {len(chunks)} chunks from {corpus}")
+        embedding_model = EmbeddingModel(base_url=server.base_url, api_key=STUB_API_KEY)
+        llm = ChatOpenAI(base_url=server.base_url, api_key=STUB_API_KEY)
+
+        for database in databases:
+            for streaming in (False, True):
+                db, ingest = run_ingest(database, chunks, embedding_model, streaming)
+                report["ingest"].append(ingest)
+                log(f"ingest {database:22s} {ingest['mode']:17s} {ingest['chunks_per_second']:9.1f} chunks/s")
+
+            for workers in concurrency:
+                query = {"database": database, "stream": stream, **run_queries(db, llm, n_queries, workers, stream)}
+                report["query"].append(query)
+                log(
+                    f"query  {database:22s} concurrency={workers:<3d} {query['throughput_qps']:7.2f} q/s "
+                    f"errors={query['errors']}"
+                    + (f" first_token_p50={query['first_token_latency']['p50_ms']:.0f}ms"
+                       f" total_p50={query['latency']['p50_ms']:.0f}ms" if stream and "latency" in query else "")
+                )
+
+        if lambda_handler:
+            report["lambda"] = run_lambda(lambda_handler, server.base_url, n_queries)
+            log(f"lambda {report['lambda']}")
+
+        report["stub"] = dict(server.statistics)
+        report["scheduler"] = embedding_model.scheduler.get_statistics()
+        report["embedding_model"] = embedding_model.get_statistics()
+        report["connection_pools"] = pool_statistics()
+
+    report.update({
+        "timestamp": datetime.now().isoformat(),
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "config": {
+            "corpus": corpus,
+            "chunks": len(chunks),
+            "latency": f"{config.latency.kind}:{','.join(map(str, config.latency.params))}",
+            "per_item_latency": config.per_item_latency,
+            "token_latency": config.token_latency,
+            "rate_limit_probability": config.rate_limit_probability,
+            "requests_per_minute": config.requests_per_minute,
+            "queries": n_queries,
+            "concurrency": list(concurrency),
+            "stream": stream,
+        },
+    })
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="End-to-end RAG throughput against the OpenAI stub")
+    parser.add_argument("--corpus", default="data/PMarcaBlogs.txt")
+    parser.add_argument("--max-chunks", type=int, default=None)
+    parser.add_argument(
+        "--databases",
+        nargs="+",
+        default=["VectorDatabase", "EnhancedVectorDatabase"],
+        choices=["VectorDatabase", "EnhancedVectorDatabase"],
+    )
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--latency", default="fixed:0.02")
+    parser.add_argument("--per-item-latency", type=float, default=0.0)
+    parser.add_argument("--token-latency", type=float, default=0.0)
+    parser.add_argument("--rate-limit-probability", type=float, default=0.0)
+    parser.add_argument("--requests-per-minute", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--lambda-handler", default=None, help="Path to lambda_function.py to load-test as well")
+    parser.add_argument("--stream", action="store_true", help="Stream completions and report time to first token")
+    parser.add_argument("--output", default="end_to_end_results.json")
+    args = parser.parse_args(argv)
+
+    config = StubConfig(
+        latency=args.latency,
+        per_item_latency=args.per_item_latency,
+        token_latency=args.token_latency,
+        rate_limit_probability=args.rate_limit_probability,
+        requests_per_minute=args.requests_per_minute,
+        retry_after=0.1,
+        seed=args.seed,
+    )
+    report = run_end_to_end(
+        args.corpus, config, args.databases,
+        max_chunks=args.max_chunks, n_queries=args.queries,
+        concurrency=args.concurrency, lambda_handler=args.lambda_handler, stream=args.stream,
+    )
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote report to {args.output}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,424 @@
+"""
+Local OpenAI-compatible stub server for latency and load testing.
+
+Implements the /v1/embeddings and /v1/chat/completions request and
+response shapes (including base64 embeddings and streamed chat chunks) on
+top of asyncio, with configurable latency distributions, rate-limit (429)
+injection and deterministic outputs. Point clients at it with
+base_url="http://127.0.0.1:<port>/v1".
+
+Usage:
+    python -m benchmarks.openai_stub --port 8089 --latency lognormal:0.08,0.4 --rate-limit-probability 0.05
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from aimakerspace.embedding_backends import HashingEmbeddingModel
+
+
+# Default output sizes of the models we stand in for
+MODEL_DIMENSIONS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+}
+
+_STUB_VOCABULARY = (
+    "the context suggests that startups should focus on hiring strong executives "
+    "retrieval augmented generation combines search with language models to ground answers "
+    "according to the provided sources the key point is product market fit"
+).split()
+
+
+class LatencyModel:
+    """
+    Seeded latency distribution in seconds.
+
+    Spec strings:
+        "fixed:0.05"              always 50ms
+        "uniform:0.02,0.1"        uniform between 20ms and 100ms
+        "lognormal:0.08,0.4"      median 80ms, sigma 0.4
+        "exponential:0.05"        mean 50ms
+    """
+
+    def __init__(self, spec: str = "fixed:0", seed: int = 0):
+        kind, _, params = spec.partition(":")
+        self.kind = kind
+        self.params = [float(p) for p in params.split(",")] if params else []
+        self._rng = np.random.RandomState(seed)
+        if kind not in ("fixed", "uniform", "lognormal", "exponential"):
+            raise ValueError(f"Unknown latency distribution: {kind}")
+
+    def sample(self) -> float:
+        if self.kind == "fixed":
+            return self.params[0] if self.params else 0.0
+        if self.kind == "uniform":
+            return float(self._rng.uniform(self.params[0], self.params[1]))
+        if self.kind == "lognormal":
+            return float(self.params[0] * np.exp(self._rng.normal(0.0, self.params[1])))
+        return float(self._rng.exponential(self.params[0]))
+
+
+class StubConfig:
+    """Behaviour of the stub server."""
+
+    def __init__(
+        self,
+        latency: str = "fixed:0",
+        per_item_latency: float = 0.0,
+        token_latency: float = 0.0,
+        rate_limit_probability: float = 0.0,
+        requests_per_minute: Optional[int] = None,
+        retry_after: float = 1.0,
+        completion_tokens: int = 32,
+        seed: int = 0,
+    ):
+        """
+        Args:
+            latency: Base per-request latency spec (see LatencyModel)
+            per_item_latency: Extra seconds per embedding input
+            token_latency: Seconds between streamed chat tokens
+            rate_limit_probability: Chance of answering any request with 429
+            requests_per_minute: Hard request rate above which requests get 429
+            retry_after: Value of the Retry-After header on 429s
+            completion_tokens: Words in each chat completion
+            seed: Seed for latencies and 429 injection
+        """
+        self.latency = LatencyModel(latency, seed)
+        self.per_item_latency = per_item_latency
+        self.token_latency = token_latency
+        self.rate_limit_probability = rate_limit_probability
+        self.requests_per_minute = requests_per_minute
+        self.retry_after = retry_after
+        self.completion_tokens = completion_tokens
+        self.seed = seed
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _completion_text(messages: List[Dict[str, Any]], n_words: int) -> str:
+    """Deterministic answer derived from the conversation."""
+    prompt = json.dumps(messages, sort_keys=True)
+    rng = np.random.RandomState(zlib.crc32(prompt.encode("utf-8")))
+    return " ".join(_STUB_VOCABULARY[i] for i in rng.randint(0, len(_STUB_VOCABULARY), size=n_words))
+
+
+class OpenAIStubServer:
+    """Minimal HTTP/1.1 server speaking the OpenAI REST shapes."""
+
+    def __init__(self, config: Optional[StubConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or StubConfig()
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: set = set()
+        self._models: Dict[int, HashingEmbeddingModel] = {}
+        self._rng = np.random.RandomState(self.config.seed + 1)
+        self._window_start = time.monotonic()
+        self._window_requests = 0
+        self.statistics = {"requests": 0, "rate_limited": 0, "embedding_inputs": 0, "completions": 0}
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    async def start(self) -> "OpenAIStubServer":
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            # Keep-alive connections would otherwise hold wait_closed open
+            for task in list(self._connections):
+                task.cancel()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+            await self._server.wait_closed()
+
+    def start_in_thread(self) -> "OpenAIStubServer":
+        """Serve from a background event loop, for use with sync clients."""
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.start())
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop_thread(self) -> None:
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def __enter__(self) -> "OpenAIStubServer":
+        return self.start_in_thread()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop_thread()
+
+    def _embedding_model(self, dimensions: int) -> HashingEmbeddingModel:
+        if dimensions not in self._models:
+            self._models[dimensions] = HashingEmbeddingModel(dimensions=dimensions, seed=self.config.seed)
+        return self._models[dimensions]
+
+    def _rate_limited(self) -> bool:
+        config = self.config
+        if config.rate_limit_probability and self._rng.random_sample() < config.rate_limit_probability:
+            return True
+        if config.requests_per_minute:
+            now = time.monotonic()
+            if now - self._window_start >= 60:
+                self._window_start, self._window_requests = now, 0
+            self._window_requests += 1
+            return self._window_requests > config.requests_per_minute
+        return False
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                await self._dispatch(method, path, body, writer)
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        method, path, _ = request_line.decode("latin-1").split(" ", 2)
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        body = await reader.readexactly(int(headers.get("content-length", 0)))
+        return method, path, headers, body
+
+    async def _dispatch(self, method: str, path: str, body: bytes, writer: asyncio.StreamWriter) -> None:
+        self.statistics["requests"] += 1
+        path = path.split("?", 1)[0].rstrip("/")
+
+        if self._rate_limited():
+            self.statistics["rate_limited"] += 1
+            await self._send_json(writer, 429, {
+                "error": {
+                    "message": "Rate limit reached (stub)",
+                    "type": "requests",
+                    "code": "rate_limit_exceeded",
+                }
+            }, {"Retry-After": f"{self.config.retry_after:g}"})
+            return
+
+        try:
+            payload = json.loads(body or b"{}")
+        except json.JSONDecodeError:
+            await self._send_json(writer, 400, {"error": {"message": "Invalid JSON", "type": "invalid_request_error"}})
+            return
+
+        if method == "POST" and path.endswith("/embeddings"):
+            await self._embeddings(payload, writer)
+        elif method == "POST" and path.endswith("/chat/completions"):
+            await self._chat_completions(payload, writer)
+        else:
+            await self._send_json(writer, 404, {"error": {"message": f"No route for {method} {path}", "type": "invalid_request_error"}})
+
+    async def _embeddings(self, payload: Dict[str, Any], writer: asyncio.StreamWriter) -> None:
+        inputs = payload.get("input", [])
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        texts = [text if isinstance(text, str) else " ".join(map(str, text)) for text in inputs]
+        if not texts or not all(texts):
+            # Like the real API, an empty input rejects the whole request
+            await self._send_json(writer, 400, {"error": {"message": "'$.input' is invalid", "type": "invalid_request_error"}})
+            return
+        model = payload.get("model", "text-embedding-3-small")
+        dimensions = payload.get("dimensions") or MODEL_DIMENSIONS.get(model, 1536)
+
+        await asyncio.sleep(self.config.latency.sample() + self.config.per_item_latency * len(texts))
+
+        vectors = self._embedding_model(dimensions).embed(texts)
+        use_base64 = payload.get("encoding_format") == "base64"
+        data = [
+            {
+                "object": "embedding",
+                "index": i,
+                "embedding": (
+                    base64.b64encode(vector.astype("<f4").tobytes()).decode("ascii")
+                    if use_base64 else vector.tolist()
+                ),
+            }
+            for i, vector in enumerate(vectors)
+        ]
+        tokens = sum(_estimate_tokens(text) for text in texts)
+        self.statistics["embedding_inputs"] += len(texts)
+        await self._send_json(writer, 200, {
+            "object": "list",
+            "data": data,
+            "model": model,
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        })
+
+    async def _chat_completions(self, payload: Dict[str, Any], writer: asyncio.StreamWriter) -> None:
+        messages = payload.get("messages", [])
+        model = payload.get("model", "gpt-4o-mini")
+        content = _completion_text(messages, self.config.completion_tokens)
+        prompt_tokens = sum(_estimate_tokens(str(m.get("content", ""))) for m in messages)
+        completion_id = f"chatcmpl-stub-{zlib.crc32(content.encode('utf-8')):08x}"
+        created = int(time.time())
+        self.statistics["completions"] += 1
+
+        await asyncio.sleep(self.config.latency.sample())
+
+        if not payload.get("stream"):
+            await asyncio.sleep(self.config.token_latency * self.config.completion_tokens)
+            await self._send_json(writer, 200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": self.config.completion_tokens,
+                    "total_tokens": prompt_tokens + self.config.completion_tokens,
+                },
+            })
+            return
+
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream\r\n"
+            b"Transfer-Encoding: chunked\r\n"
+            b"Cache-Control: no-cache\r\n\r\n"
+        )
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> Dict[str, Any]:
+            return {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+
+        await self._send_event(writer, chunk({"role": "assistant", "content": ""}))
+        for i, word in enumerate(content.split(" ")):
+            await asyncio.sleep(self.config.token_latency)
+            await self._send_event(writer, chunk({"content": word if i == 0 else " " + word}))
+        await self._send_event(writer, chunk({}, "stop"))
+        if (payload.get("stream_options") or {}).get("include_usage"):
+            await self._send_event(writer, {
+                **chunk({}),
+                "choices": [],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": self.config.completion_tokens,
+                    "total_tokens": prompt_tokens + self.config.completion_tokens,
+                },
+            })
+        await self._send_chunk(writer, b"data: [DONE]\n\n")
+        await self._send_chunk(writer, b"")
+
+    async def _send_chunk(self, writer: asyncio.StreamWriter, data: bytes) -> None:
+        writer.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        await writer.drain()
+
+    async def _send_event(self, writer: asyncio.StreamWriter, payload: Dict[str, Any]) -> None:
+        await self._send_chunk(writer, f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+
+    async def _send_json(
+        self,
+        writer: asyncio.StreamWriter,
+        status: int,
+        payload: Dict[str, Any],
+        extra_headers: Optional[Dict[str, str]] = None,
+    ) -> None:
+        reasons = {200: "OK", 400: "Bad Request", 404: "Not Found", 429: "Too Many Requests"}
+        body = json.dumps(payload).encode("utf-8")
+        headers = {
+            "Content-Type": "application/json",
+            "Content-Length": str(len(body)),
+            **(extra_headers or {}),
+        }
+        head = f"HTTP/1.1 {status} {reasons.get(status, 'Error')}\r\n"
+        head += "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+        writer.write(head.encode("latin-1") + b"\r\n" + body)
+        await writer.drain()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", default="fixed:0", help="e.g. fixed:0.05, uniform:0.02,0.1, lognormal:0.08,0.4")
+    parser.add_argument("--per-item-latency", type=float, default=0.0)
+    parser.add_argument("--token-latency", type=float, default=0.0)
+    parser.add_argument("--rate-limit-probability", type=float, default=0.0)
+    parser.add_argument("--requests-per-minute", type=int, default=None)
+    parser.add_argument("--completion-tokens", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    config = StubConfig(
+        latency=args.latency,
+        per_item_latency=args.per_item_latency,
+        token_latency=args.token_latency,
+        rate_limit_probability=args.rate_limit_probability,
+        requests_per_minute=args.requests_per_minute,
+        completion_tokens=args.completion_tokens,
+        seed=args.seed,
+    )
+
+    async def serve():
+        server = await OpenAIStubServer(config, args.host, args.port).start()
+        print(f"OpenAI stub listening on {server.base_url}")
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Semantic answer cache benchmark.
+Replays a seeded stream of questions, a share of them paraphrases of
+earlier ones, through SemanticCache in front of a simulated LLM, and
+reports hit rate, wrong-answer hits and LLM latency saved per similarity
+threshold. Runs offline with the hashing embedding backend.
+"""
+
+import argparse
+import json
+import platform
+import random
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from aimakerspace.embedding_backends import HashingEmbeddingModel
+from aimakerspace.semantic_cache import SemanticCache
+
+
+TOPICS = [
+    "the Michael Eisner Memorial Weak Executive Problem",
+    "hiring executives at a startup",
+    "raising venture capital",
+    "product market fit",
+    "when to sell a company",
+    "retaining key employees",
+    "big company versus startup careers",
+    "the role of a board of directors",
+    "evaluating a market before building",
+    "how to pick cofounders",
+]
+
+TEMPLATES = [
+    "What is {topic}?",
+    "Can you explain {topic}?",
+    "What does Marc say about {topic}?",
+    "Give me advice on {topic}.",
+]
+
+# Surface rewrites a real user might make to the same question
+REWRITES = [
+    lambda q: q.lower(),
+    lambda q: q.rstrip("?."),
+    lambda q: "Please, " + q[0].lower() + q[1:],
+    lambda q: q.replace("What", "So what", 1),
+    lambda q: q + " Thanks!",
+    lambda q: "Quick question: " + q,
+]
+
+
+def make_workload(n_questions: int, paraphrase_rate: float, seed: int = 0) -> List[Tuple[str, str]]:
+    """(question, intent) pairs; repeats of an intent are rewritten paraphrases."""
+    rng = random.Random(seed)
+    intents = [template.format(topic=topic) for topic in TOPICS for template in TEMPLATES]
+    seen: List[str] = []
+    workload = []
+    for _ in range(n_questions):
+        if seen and rng.random() < paraphrase_rate:
+            intent = rng.choice(seen)
+            workload.append((rng.choice(REWRITES)(intent), intent))
+        else:
+            intent = rng.choice(intents)
+            seen.append(intent)
+            workload.append((intent, intent))
+    return workload
+
+
+def run_threshold(
+    workload: List[Tuple[str, str]],
+    threshold: float,
+    llm_latency: float,
+    ttl_seconds: Optional[float],
+    max_entries: int,
+    dimensions: int,
+) -> Dict[str, Any]:
+    cache = SemanticCache(
+        HashingEmbeddingModel(dimensions=dimensions),
+        similarity_threshold=threshold,
+        ttl_seconds=ttl_seconds,
+        max_entries=max_entries,
+    )
+    wrong_hits = 0
+    started = time.perf_counter()
+    for question, intent in workload:
+        def generate(_question, intent=intent):
+            time.sleep(llm_latency)
+            # The answer records which intent it was generated for
+            return intent
+
+        if cache.answer(question, generate) != intent:
+            wrong_hits += 1
+    seconds = time.perf_counter() - started
+
+    stats = cache.get_statistics()
+    return {
+        "threshold": threshold,
+        "hit_rate": stats["hit_rate"],
+        "hits": stats["hits"],
+        "wrong_hits": wrong_hits,
+        "saved_seconds": stats["saved_seconds"],
+        "evicted": stats["evicted"],
+        "expired": stats["expired"],
+        "wall_seconds": seconds,
+        "uncached_seconds": len(workload) * llm_latency,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Semantic answer cache hit rates")
+    parser.add_argument("--questions", type=int, default=500)
+    parser.add_argument("--paraphrase-rate", type=float, default=0.5)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.8, 0.85, 0.9, 0.95])
+    parser.add_argument("--llm-latency", type=float, default=0.01, help="Simulated seconds per LLM call")
+    parser.add_argument("--ttl", type=float, default=None)
+    parser.add_argument("--max-entries", type=int, default=1000)
+    parser.add_argument("--dimensions", type=int, default=512)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="semantic_cache_results.json")
+    args = parser.parse_args(argv)
+
+    workload = make_workload(args.questions, args.paraphrase_rate, args.seed)
+    results = []
+    for threshold in args.thresholds:
+        result = run_threshold(workload, threshold, args.llm_latency, args.ttl, args.max_entries, args.dimensions)
+        results.append(result)
+        print(
+            f"threshold={threshold:.2f} hit_rate={result['hit_rate']:.1%} wrong_hits={result['wrong_hits']} "
+            f"saved={result['saved_seconds']:.2f}s of {result['uncached_seconds']:.2f}s"
+        )
+
+    report = {
+        "results": results,
+        "timestamp": datetime.now().isoformat(),
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "config": vars(args),
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote report to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+Vector search benchmark for VectorDatabase and EnhancedVectorDatabase.
+
+Runs every metric in DISTANCE_METRICS over seeded synthetic corpora, with
+and without metadata filters, and reports QPS, latency percentiles, build
+time, resident memory and recall@k against exact ground truth.
+
+Usage:
+    python -m benchmarks --rows 10000 --dims 384 1536 --output results.json
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from aimakerspace.distance_metrics import DISTANCE_METRICS
+from aimakerspace.vectordatabase import VectorDatabase
+from aimakerspace.enhanced_vectordatabase import EnhancedVectorDatabase
+from benchmarks.datasets import (
+    DATASETS,
+    make_dataset,
+    make_queries,
+    make_metadata,
+    make_keys,
+    ground_truth,
+    recall_at_k,
+)
+
+
+class _NoEmbeddingModel:
+    """Benchmarks search by vector; any attempt to embed text is a bug."""
+
+    def get_embedding(self, text: str):
+        raise RuntimeError("Benchmarks must not call the embedding API")
+
+    async def async_get_embeddings(self, list_of_text: List[str]):
+        raise RuntimeError("Benchmarks must not call the embedding API")
+
+
+def resident_memory_bytes() -> int:
+    """Current resident set size, falling back to the peak where /proc is missing."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and kilobytes on Linux
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    latencies_ms = np.array(latencies) * 1000
+    total = float(np.sum(latencies))
+    return {
+        "qps": len(latencies) / total if total > 0 else 0.0,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p95_ms": float(np.percentile(latencies_ms, 95)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+        "mean_ms": float(np.mean(latencies_ms)),
+    }
+
+
+def build_database(database: str, metric: str, keys: List[str], corpus: np.ndarray, metadata: List[Dict[str, Any]]):
+    """Build a database and return it with build time and memory growth."""
+    rss_before = resident_memory_bytes()
+    start = time.perf_counter()
+
+    if database == "VectorDatabase":
+        db = VectorDatabase(_NoEmbeddingModel())
+        db.insert_many(zip(keys, corpus))
+    else:
+        db = EnhancedVectorDatabase(_NoEmbeddingModel(), distance_metric=metric)
+        db.insert_many(zip(keys, corpus, metadata))
+
+    build_seconds = time.perf_counter() - start
+    return db, build_seconds, resident_memory_bytes() - rss_before
+
+
+def run_searches(
+    db,
+    database: str,
+    metric: str,
+    queries: np.ndarray,
+    k: int,
+    metadata_filter: Optional[Dict[str, Any]],
+    coarse_dims: Optional[int] = None,
+):
+    """Time each query and return (latencies, returned row indices per query)."""
+    latencies, returned = [], []
+    measure = DISTANCE_METRICS[metric]
+
+    for query in queries:
+        start = time.perf_counter()
+        if database == "VectorDatabase":
+            results = db.search(query, k, distance_measure=measure, coarse_dims=coarse_dims)
+        else:
+            results = db.search(query, k, metadata_filter=metadata_filter, coarse_dims=coarse_dims)
+        latencies.append(time.perf_counter() - start)
+        returned.append([int(result[0].split("_")[1]) for result in results])
+
+    return latencies, returned
+
+
+def run_benchmark(
+    rows: List[int],
+    dims: List[int],
+    datasets: List[str],
+    metrics: List[str],
+    databases: List[str],
+    n_queries: int = 20,
+    k: int = 10,
+    seed: int = 0,
+    coarse_dims: Optional[int] = None,
+    log=print,
+) -> Dict[str, Any]:
+    """
+    Run the full benchmark matrix.
+
+    Returns:
+        JSON-serializable report with one entry per configuration
+    """
+    results = []
+
+    for dataset in datasets:
+        for n in rows:
+            for dim in dims:
+                corpus = make_dataset(dataset, n, dim, seed)
+                queries = make_queries(corpus, n_queries, seed)
+                metadata = make_metadata(n, seed=seed)
+                keys = make_keys(n)
+                filter_value = metadata[0]["source"]
+                filter_mask = np.array([m["source"] == filter_value for m in metadata])
+
+                for metric in metrics:
+                    for database in databases:
+                        db, build_seconds, build_rss = build_database(database, metric, keys, corpus, metadata)
+
+                        # VectorDatabase has no metadata filtering
+                        filters = [None] if database == "VectorDatabase" else [None, {"source": filter_value}]
+                        modes = [None] if coarse_dims is None else [None, coarse_dims]
+                        for metadata_filter, mode in itertools.product(filters, modes):
+                            mask = filter_mask if metadata_filter else None
+                            truth = ground_truth(corpus, queries, k, metric, mask)
+                            latencies, returned = run_searches(db, database, metric, queries, k, metadata_filter, mode)
+                            recall = np.mean([
+                                recall_at_k(corpus, query, rows_, t, metric)
+                                for query, rows_, t in zip(queries, returned, truth)
+                            ])
+
+                            entry = {
+                                "dataset": dataset,
+                                "rows": n,
+                                "dims": dim,
+                                "database": database,
+                                "metric": metric,
+                                "filtered": metadata_filter is not None,
+                                "coarse_dims": mode,
+                                "k": k,
+                                "queries": n_queries,
+                                "build_seconds": build_seconds,
+                                "build_rss_bytes": build_rss,
+                                "rss_bytes": resident_memory_bytes(),
+                                f"recall_at_{k}": float(recall),
+                                **latency_summary(latencies),
+                            }
+                            results.append(entry)
+                            log(
+                                f"{dataset:9s} n={n:<8d} d={dim:<5d} {database:22s} {metric:11s} "
+                                f"filtered={entry['filtered']!s:5s} coarse={mode or '-'!s:5s} qps={entry['qps']:8.1f} "
+                                f"p99={entry['p99_ms']:8.2f}ms recall={recall:.3f}"
+                            )
+                        del db
+
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+        },
+        "config": {
+            "rows": rows,
+            "dims": dims,
+            "datasets": datasets,
+            "metrics": metrics,
+            "databases": databases,
+            "queries": n_queries,
+            "k": k,
+            "seed": seed,
+            "coarse_dims": coarse_dims,
+        },
+        "results": results,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="Benchmark aimakerspace vector search")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000], help="Corpus sizes (e.g. 10000 100000)")
+    parser.add_argument("--dims", type=int, nargs="+", default=[384], help="Vector dimensions (e.g. 384 1536 3072)")
+    parser.add_argument("--datasets", nargs="+", default=list(DATASETS), choices=list(DATASETS))
+    parser.add_argument("--metrics", nargs="+", default=list(DISTANCE_METRICS), choices=list(DISTANCE_METRICS))
+    parser.add_argument(
+        "--databases",
+        nargs="+",
+        default=["VectorDatabase", "EnhancedVectorDatabase"],
+        choices=["VectorDatabase", "EnhancedVectorDatabase"],
+    )
+    parser.add_argument("--queries", type=int, default=20, help="Queries per configuration")
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--coarse-dims", type=int, default=None, help="Also run coarse-to-fine search with this prefix")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write the JSON report")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(
+        args.rows, args.dims, args.datasets, args.metrics, args.databases,
+        n_queries=args.queries, k=args.k, seed=args.seed, coarse_dims=args.coarse_dims,
+    )
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {len(report['results'])} results to {args.output}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
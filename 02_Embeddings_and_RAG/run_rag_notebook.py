@@ -6,6 +6,7 @@ This script allows you to execute the notebook step by step from the command lin
 
 import os
 import sys
+import time
 from typing import List, Tuple
 import numpy as np
 from getpass import getpass
@@ -38,7 +39,6 @@ print(split_documents[0][:200] + "...")
 print("\nTask 3: Setting up embeddings and vector database...")
 
 # Get OpenAI API Key
-import openai
 from dotenv import load_dotenv
 
 # Try to load from .env file
@@ -52,7 +52,7 @@ if "OPENAI_API_KEY" not in os.environ:
     print("3. Pass it when running: OPENAI_API_KEY=your_key_here python run_rag_notebook.py")
     sys.exit(1)
 else:
-    openai.api_key = os.environ["OPENAI_API_KEY"]
+    # EmbeddingModel and ChatOpenAI read the key from the environment on first use
     print("✓ OpenAI API key loaded from environment")
 
 # Create vector database
@@ -80,6 +80,9 @@ from aimakerspace.openai_utils.prompts import (
     AssistantRolePrompt,
 )
 from aimakerspace.openai_utils.chatmodel import ChatOpenAI
+from aimakerspace.context_packing import ContextBuilder
+from aimakerspace.compression import SentenceCompressor
+from aimakerspace.semantic_cache import SemanticCache
 
 # Initialize chat model
 chat_openai = ChatOpenAI()
@@ -103,13 +106,22 @@ Please provide your answer based solely on the context above."""
 
 # Create RAG pipeline class
 class SimpleRAGPipeline:
-    def __init__(self, llm, vector_db):
+    def __init__(self, llm, vector_db, cache=None, context_builder=None, compressor=None):
         self.llm = llm
         self.vector_db = vector_db
+        # Drops weak matches, merges overlapping neighbours, enforces the token budget
+        self.context_builder = context_builder or ContextBuilder()
+        # Optional SentenceCompressor; keeps only the sentences relevant to the question
+        self.compressor = compressor
+        # Optional SemanticCache; paraphrased questions reuse earlier answers
+        self.cache = cache
         
-    def query(self, question: str, k: int = 3) -> str:
-        # Retrieve relevant contexts
-        context_list = self.vector_db.search_by_text(question, k=k)
+    def _messages(self, question: str, k: int = 3) -> list:
+        # Retrieve relevant contexts and pack them into the prompt budget
+        query_vector = self.vector_db.embedding_model.get_embedding(question)
+        context_list = self.context_builder.build(self.vector_db.search(query_vector, k=k)).contexts
+        if self.compressor is not None:
+            context_list = self.compressor.compress(query_vector, context_list).contexts
         
         # Format context
         context_prompt = ""
@@ -127,12 +139,64 @@ class SimpleRAGPipeline:
                 user_query=question
             )
         ]
+        return messages
         
+    def query(self, question: str, k: int = 3) -> str:
         # Get response
-        return self.llm.run(messages)
+        if self.cache is None:
+            return self.llm.run(self._messages(question, k))
+        return self.cache.answer(question, lambda q: self.llm.run(self._messages(q, k)))
+    
+    def stream_query(self, question: str, k: int = 3):
+        # Yields the answer as it is generated; timings in .statistics
+        return self.llm.stream(self._messages(question, k))
+    
+    def query_many(self, questions: List[str], k: int = 3) -> list:
+        # Answers all questions concurrently, in order; a failed one holds its exception.
+        # Cached answers are reused and new ones are cached.
+        if self.cache is None:
+            return asyncio.run(self.llm.abatch([self._messages(question, k) for question in questions]))
+        
+        answers = [None] * len(questions)
+        misses = []
+        # One embedding call for the whole batch, reused by lookup and store
+        vectors = self.cache.embed(questions)
+        for i, question in enumerate(questions):
+            entry = self.cache.lookup(question, vectors[i])
+            if entry is not None:
+                answers[i] = entry.answer
+            else:
+                misses.append(i)
+        
+        if misses:
+            started = time.perf_counter()
+            generated = asyncio.run(self.llm.abatch([self._messages(questions[i], k) for i in misses]))
+            # Concurrent answers share one wall-clock time, recorded as each one's latency
+            latency = time.perf_counter() - started
+            for i, answer in zip(misses, generated):
+                answers[i] = answer
+                if not isinstance(answer, Exception):
+                    self.cache.store(questions[i], answer, latency, vectors[i])
+        return answers
+
 
-# Create pipeline
-rag_pipeline = SimpleRAGPipeline(chat_openai, vector_db)
+def print_streamed_answer(stream) -> None:
+    print("\nAnswer: ", end="", flush=True)
+    for delta in stream:
+        print(delta, end="", flush=True)
+    stats = stream.statistics.as_dict()
+    if stats["time_to_first_token"] is not None:
+        print(
+            f"\n\n[first token after {stats['time_to_first_token'] * 1000:.0f} ms, "
+            f"{stats['completion_tokens']} tokens at {stats['tokens_per_second'] or 0:.1f} tokens/s]"
+        )
+    print()
+
+# Create pipeline; cached answers are dropped if the documents change
+answer_cache = SemanticCache(vector_db.embedding_model, documents=vector_db)
+context_builder = ContextBuilder.for_splitter(text_splitter, max_tokens=1500, min_score=0.2)
+compressor = SentenceCompressor(vector_db.embedding_model, max_sentences=6, neighbours=1)
+rag_pipeline = SimpleRAGPipeline(chat_openai, vector_db, cache=answer_cache, context_builder=context_builder, compressor=compressor)
 
 # Test with example queries
 print("\nRAG Pipeline ready! Testing with example queries...\n")
@@ -143,12 +207,27 @@ example_queries = [
     "What are the key points about startups mentioned in the guide?"
 ]
 
-for i, question in enumerate(example_queries, 1):
+# All questions are answered concurrently
+print("Searching for relevant context and generating responses...\n")
+answers = rag_pipeline.query_many(example_queries)
+for i, (question, answer) in enumerate(zip(example_queries, answers), 1):
     print(f"Question {i}: {question}")
-    print("\nSearching for relevant context and generating response...")
-    response = rag_pipeline.query(question)
-    print(f"\nAnswer: {response}\n")
+    if isinstance(answer, Exception):
+        print(f"\nError: {answer}\n")
+    else:
+        print(f"\nAnswer: {answer}\n")
     print("-" * 80)
+
+packing = context_builder.statistics
+print(
+    f"\nContext packing: {packing['tokens_out']} of {packing['tokens_in']} retrieved tokens sent "
+    f"({packing['tokens_saved']} saved over {packing['builds']} prompts)"
+)
+compression = compressor.get_statistics()
+print(
+    f"Sentence compression: {compression['tokens_in']} -> {compression['tokens_out']} tokens "
+    f"({compression['compression_ratio']:.1f}x, {compression['cache_hits']} cached sentence embeddings reused)"
+)
     
 # For interactive mode, you can run this script in a terminal with:
 # python run_rag_notebook.py --interactive
@@ -160,11 +239,22 @@ if len(sys.argv) > 1 and sys.argv[1] == "--interactive":
             if question.lower() == 'exit':
                 break
             
-            print("\nSearching for relevant context and generating response...")
-            response = rag_pipeline.query(question)
-            print(f"\nAnswer: {response}\n")
+            cached = answer_cache.lookup(question)
+            if cached is not None:
+                print(f"\nAnswer (cached): {cached.answer}\n")
+            else:
+                print("\nSearching for relevant context and generating response...")
+                stream = rag_pipeline.stream_query(question)
+                print_streamed_answer(stream)
+                answer_cache.store(question, stream.text, stream.statistics.as_dict()["duration"])
             print("-" * 80)
         except EOFError:
             break
 
+stats = answer_cache.get_statistics()
+print(
+    f"\nAnswer cache: {stats['hits']}/{stats['lookups']} hits ({stats['hit_rate']:.0%}), "
+    f"{stats['saved_seconds']:.1f}s of LLM time saved"
+)
+
 print("\nThank you for using the RAG system!")
\ No newline at end of file
@@ -68,7 +68,6 @@ if split_documents:
 print("\nTask 3: Setting up embeddings and vector database...")
 
 # Get OpenAI API Key
-import openai
 
 # Try to load from .env file
 load_dotenv()
@@ -81,7 +80,7 @@ if "OPENAI_API_KEY" not in os.environ:
     print("3. Pass it when running: OPENAI_API_KEY=your_key_here python run_rag_pdf.py")
     sys.exit(1)
 else:
-    openai.api_key = os.environ["OPENAI_API_KEY"]
+    # EmbeddingModel and ChatOpenAI read the key from the environment on first use
     print("✓ OpenAI API key loaded from environment")
 
 # Create vector database
@@ -105,6 +104,8 @@ from aimakerspace.openai_utils.prompts import (
     SystemRolePrompt,
 )
 from aimakerspace.openai_utils.chatmodel import ChatOpenAI
+from aimakerspace.context_packing import ContextBuilder
+from aimakerspace.compression import SentenceCompressor
 
 # Initialize chat model
 chat_openai = ChatOpenAI()
@@ -128,13 +129,20 @@ Please provide your answer based solely on the context above."""
 
 # Create RAG pipeline class
 class SimpleRAGPipeline:
-    def __init__(self, llm, vector_db):
+    def __init__(self, llm, vector_db, context_builder=None, compressor=None):
         self.llm = llm
         self.vector_db = vector_db
+        # Drops weak matches, merges overlapping neighbours, enforces the token budget
+        self.context_builder = context_builder or ContextBuilder()
+        # Optional SentenceCompressor; keeps only the sentences relevant to the question
+        self.compressor = compressor
         
-    def query(self, question: str, k: int = 3) -> str:
-        # Retrieve relevant contexts
-        context_list = self.vector_db.search_by_text(question, k=k)
+    def _messages(self, question: str, k: int = 3) -> list:
+        # Retrieve relevant contexts and pack them into the prompt budget
+        query_vector = self.vector_db.embedding_model.get_embedding(question)
+        context_list = self.context_builder.build(self.vector_db.search(query_vector, k=k)).contexts
+        if self.compressor is not None:
+            context_list = self.compressor.compress(query_vector, context_list).contexts
         
         # Format context
         context_prompt = ""
@@ -152,12 +160,20 @@ class SimpleRAGPipeline:
                 user_query=question
             )
         ]
+        return messages
         
+    def query(self, question: str, k: int = 3) -> str:
         # Get response
-        return self.llm.run(messages)
+        return self.llm.run(self._messages(question, k))
+    
+    def query_many(self, questions: List[str], k: int = 3) -> list:
+        # Answers all questions concurrently, in order; a failed one holds its exception
+        return asyncio.run(self.llm.abatch([self._messages(question, k) for question in questions]))
 
 # Create pipeline
-rag_pipeline = SimpleRAGPipeline(chat_openai, vector_db)
+context_builder = ContextBuilder.for_splitter(text_splitter, max_tokens=1500, min_score=0.2)
+compressor = SentenceCompressor(vector_db.embedding_model, max_sentences=6, neighbours=1)
+rag_pipeline = SimpleRAGPipeline(chat_openai, vector_db, context_builder=context_builder, compressor=compressor)
 
 # Test with example queries
 print("\nRAG Pipeline ready! Testing with example queries...\n")
@@ -176,14 +192,29 @@ else:
         "What are the key points about startups mentioned in the guide?"
     ]
 
-# Only run first 2 queries to save time
-for i, question in enumerate(example_queries[:2], 1):
+# Only run first 2 queries to save time; they are answered concurrently
+example_queries = example_queries[:2]
+print("Searching for relevant context and generating responses...\n")
+answers = rag_pipeline.query_many(example_queries)
+for i, (question, answer) in enumerate(zip(example_queries, answers), 1):
     print(f"Question {i}: {question}")
-    print("\nSearching for relevant context and generating response...")
-    response = rag_pipeline.query(question)
-    print(f"\nAnswer: {response}\n")
+    if isinstance(answer, Exception):
+        print(f"\nError: {answer}\n")
+    else:
+        print(f"\nAnswer: {answer}\n")
     print("-" * 80)
 
+packing = context_builder.statistics
+print(
+    f"\nContext packing: {packing['tokens_out']} of {packing['tokens_in']} retrieved tokens sent "
+    f"({packing['tokens_saved']} saved over {packing['builds']} prompts)"
+)
+compression = compressor.get_statistics()
+print(
+    f"Sentence compression: {compression['tokens_in']} -> {compression['tokens_out']} tokens "
+    f"({compression['compression_ratio']:.1f}x, {compression['cache_hits']} cached sentence embeddings reused)"
+)
+
 print("\n✅ PDF support successfully added to the RAG system!")
 print("\nUsage examples:")
 print("  python run_rag_pdf.py data/PMarcaBlogs.txt  # Process text file")
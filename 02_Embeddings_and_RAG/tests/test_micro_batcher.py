@@ -0,0 +1,76 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from aimakerspace.openai_utils.batching import MicroBatcher
+from aimakerspace.openai_utils.embedding import EmbeddingModel
+
+
+def test_poisoned_item_fails_only_its_caller():
+    calls = []
+
+    async def process_batch(items):
+        calls.append(list(items))
+        if "poison" in items:
+            raise RuntimeError("400: invalid input")
+        return [item.upper() for item in items]
+
+    async def main():
+        batcher = MicroBatcher(process_batch, max_batch_size=8, max_wait_ms=50)
+        items = ["a", "b", "poison", "c"]
+        return batcher, await asyncio.gather(*[batcher.submit(item) for item in items], return_exceptions=True)
+
+    batcher, results = asyncio.run(main())
+    assert results[:2] == ["A", "B"] and results[3] == "C"
+    assert isinstance(results[2], RuntimeError)
+    # One coalesced call, then one call per item
+    assert len(calls[0]) == 4 and len(calls) == 5
+    assert batcher.statistics["isolated_batches"] == 1
+
+
+def test_shared_failure_is_not_retried_per_item():
+    calls = []
+
+    async def process_batch(items):
+        calls.append(list(items))
+        raise ConnectionError("down")
+
+    async def main():
+        batcher = MicroBatcher(process_batch, max_batch_size=8, max_wait_ms=50, is_shared_failure=lambda e: True)
+        return await asyncio.gather(*[batcher.submit(item) for item in "abc"], return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ConnectionError) for result in results)
+    assert len(calls) == 1
+
+
+def test_embedding_inputs_validated_before_batching():
+    model = EmbeddingModel(api_key="x", oversized_inputs="error", max_input_tokens=10)
+
+    async def main():
+        for text in ["", "word " * 50]:
+            with pytest.raises(ValueError):
+                await model.async_get_embedding(text)
+
+    asyncio.run(main())
+
+
+def test_embedding_poisoned_input_with_stub():
+    import openai
+
+    from benchmarks.openai_stub import OpenAIStubServer, StubConfig
+
+    with OpenAIStubServer(StubConfig()) as server:
+        model = EmbeddingModel(api_key="x", base_url=server.base_url, micro_batch_wait_ms=50)
+        # Let the empty string through so the stub rejects the shared request
+        model.micro_batcher.validate = None
+
+        async def main():
+            texts = ["one", "two", "", "three"]
+            return await asyncio.gather(*[model.async_get_embedding(t) for t in texts], return_exceptions=True)
+
+        results = asyncio.run(main())
+    assert isinstance(results[2], openai.BadRequestError)
+    assert all(isinstance(results[i], np.ndarray) for i in (0, 1, 3))
+    assert model.micro_batcher.statistics["isolated_batches"] == 1
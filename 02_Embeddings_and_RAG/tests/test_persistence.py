@@ -0,0 +1,27 @@
+import os
+
+import numpy as np
+import pytest
+
+from aimakerspace.embedding_backends import HashingEmbeddingModel
+from aimakerspace.enhanced_vectordatabase import EnhancedVectorDatabase
+from aimakerspace.vectordatabase import VectorDatabase
+
+
+@pytest.mark.parametrize("cls", [VectorDatabase, EnhancedVectorDatabase])
+def test_resave_over_memory_mapped_store_keeps_vectors(tmp_path, cls):
+    directory = str(tmp_path / "store")
+    rng = np.random.default_rng(0)
+    expected = rng.standard_normal((5, 8)).astype(np.float32)
+    db = cls(HashingEmbeddingModel(dimensions=8))
+    for row, vector in enumerate(expected):
+        db.insert(f"text {row}", vector)
+    db.save_binary(directory)
+
+    # The loaded database still maps vectors.npy while it is being replaced
+    loaded = cls.load_binary(directory, HashingEmbeddingModel(dimensions=8))
+    loaded.save_binary(directory)
+
+    np.testing.assert_array_equal(np.load(os.path.join(directory, "vectors.npy")), expected)
+    np.testing.assert_array_equal(loaded.snapshot().vectors["text 3"], expected[3])
+    assert sorted(os.listdir(directory)) == ["index.json", "vectors.npy"]